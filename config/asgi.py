@@ -0,0 +1,13 @@
+"""
+ASGI config for config project.
+
+Запуск: uvicorn config.asgi:application (или daphne / gunicorn -k uvicorn.workers.UvicornWorker)
+"""
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+os.environ.setdefault('ASYNC_API', 'True')
+
+application = get_asgi_application()
@@ -2,7 +2,7 @@
 Django settings for config project.
 """
 from pathlib import Path
-from decouple import config
+from decouple import Csv, config
 from django.core.management.utils import get_random_secret_key
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,21 +25,41 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.instrumentation.InstrumentationMiddleware',
+    'core.middleware.db_routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.pipelines.NamespacePipelineMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'core.middleware.jwt_middleware.JWTAuthenticationMiddleware',
 ]
 
+# Цепочки middleware по префиксу пути; '' - цепочка по умолчанию (HTML и админка)
+MIDDLEWARE_PIPELINES = {
+    '/api/': [
+        'core.middleware.jwt_middleware.JWTAuthenticationMiddleware',
+    ],
+    '': [
+        'django.contrib.sessions.middleware.SessionMiddleware',
+        'django.middleware.csrf.CsrfViewMiddleware',
+        'django.contrib.auth.middleware.AuthenticationMiddleware',
+        'django.contrib.messages.middleware.MessageMiddleware',
+    ],
+}
+
+# Session/Auth/Message middleware подключены через MIDDLEWARE_PIPELINES,
+# проверки админки ищут их только в MIDDLEWARE
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 ROOT_URLCONF = 'config.urls'
+ASGI_APPLICATION = 'config.asgi.application'
+
+# Async-версии API view; включается в config/asgi.py
+ASYNC_API = config('ASYNC_API', default=False, cast=bool)
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # DjangoTemplates с замером времени рендеринга (Server-Timing: tpl)
+        'BACKEND': 'core.instrumentation.TimedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -53,13 +73,50 @@ TEMPLATES = [
     },
 ]
 
+# Постоянные соединения: сколько секунд соединение переиспользуется между запросами (0 - новое на каждый запрос).
+# Перед повторным использованием соединение проверяется (CONN_HEALTH_CHECKS), мертвое открывается заново.
+DB_CONN_MAX_AGE = config('DB_CONN_MAX_AGE', default=60, cast=int)
+DB_CONN_HEALTH_CHECKS = config('DB_CONN_HEALTH_CHECKS', default=True, cast=bool)
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
     }
 }
 
+# PRAGMA каждого соединения SQLite (core.db_connections): WAL не блокирует чтение на время записи,
+# synchronous=NORMAL в WAL не теряет целостность, busy_timeout (мс) - ожидание занятой записи вместо ошибки
+SQLITE_JOURNAL_MODE = config('SQLITE_JOURNAL_MODE', default='WAL')
+SQLITE_SYNCHRONOUS = config('SQLITE_SYNCHRONOUS', default='NORMAL')
+SQLITE_BUSY_TIMEOUT = config('SQLITE_BUSY_TIMEOUT', default=5000, cast=int)
+
+# Реплики для чтения (алиасы DATABASES). Локально реплика - второй файл SQLite,
+# например копия db.sqlite3: SQLITE_REPLICA=db.replica.sqlite3
+DATABASE_REPLICAS = []
+if config('SQLITE_REPLICA', default=''):
+    DATABASES['replica'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / config('SQLITE_REPLICA'),
+        'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+        'CONN_HEALTH_CHECKS': DB_CONN_HEALTH_CHECKS,
+        # В тестах реплика - то же соединение, что и default
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS = ['replica']
+DATABASE_ROUTERS = ['core.db_routing.PrimaryReplicaRouter']
+# С реплик читают только GET/HEAD/OPTIONS по этим префиксам; админка всегда работает с primary
+DATABASE_REPLICA_PATHS = config(
+    'DATABASE_REPLICA_PATHS', default='/api/,/home/,/profile/,/products/,/orders/', cast=Csv()
+)
+# Сколько секунд после записи чтения пользователя идут в primary
+DATABASE_PIN_SECONDS = config('DATABASE_PIN_SECONDS', default=5, cast=int)
+# Реплика с большим отставанием, секунд, не используется; 0 - не проверять
+DATABASE_REPLICA_MAX_LAG = config('DATABASE_REPLICA_MAX_LAG', default=2, cast=float)
+DATABASE_REPLICA_LAG_CHECK_INTERVAL = config('DATABASE_REPLICA_LAG_CHECK_INTERVAL', default=1, cast=float)
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
@@ -77,13 +134,79 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Custom user model
 AUTH_USER_MODEL = 'core.User'
+# Пользователь сессии загружается вместе с ролью. ModelBackend остается для сессий,
+# созданных до RoleModelBackend: в них сохранен его путь
+AUTHENTICATION_BACKENDS = ['core.backends.RoleModelBackend', 'django.contrib.auth.backends.ModelBackend']
+
+# Общий кэш: через него воркеры узнают о смене версии матрицы прав.
+# В production нужен бэкенд, разделяемый между процессами (файловый, memcached, redis).
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='auth-system'),
+    }
+}
+
+# Сессии HTML-страниц: в кэше, в БД - только при изменении и не чаще раза в SESSION_WRITE_BEHIND_INTERVAL.
+# Несохраненные изменения живут в кэше, поэтому при нескольких процессах нужен общий CACHE_BACKEND.
+SESSION_ENGINE = config('SESSION_ENGINE', default='core.sessions')
+SESSION_WRITE_BEHIND_INTERVAL = config('SESSION_WRITE_BEHIND_INTERVAL', default=60, cast=int)
+# expire_date в БД обновляется, только если сдвинулся на столько секунд
+SESSION_EXPIRY_REFRESH_INTERVAL = config('SESSION_EXPIRY_REFRESH_INTERVAL', default=3600, cast=int)
+
+# Кэш HTML-страниц товаров и заказов по роли и версиям прав и данных, секунд; 0 - выключен
+PAGE_CACHE_TIMEOUT = config('PAGE_CACHE_TIMEOUT', default=600, cast=int)
 
 # DRF settings
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': [],
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'core.api.authentication.JWTMiddlewareAuthentication',
+    ],
     'DEFAULT_PERMISSION_CLASSES': [],
 }
 
 # JWT settings
 JWT_SECRET_KEY = config('JWT_SECRET_KEY', default=SECRET_KEY)
-JWT_ALGORITHM = 'HS256'
\ No newline at end of file
+JWT_ALGORITHM = 'HS256'
+# Ожидаемое число одновременно отозванных токенов (размер фильтра Блума)
+JWT_REVOCATION_CAPACITY = config('JWT_REVOCATION_CAPACITY', default=100000, cast=int)
+# Сколько секунд ждать запись журнала отзывов, номер которой уже выдан, прежде чем пропустить ее
+JWT_REVOCATION_GAP_TIMEOUT = config('JWT_REVOCATION_GAP_TIMEOUT', default=5, cast=int)
+# Раз в столько отзывов в кэш пишется снимок, с которого новый воркер читает журнал
+JWT_REVOCATION_SNAPSHOT_INTERVAL = config('JWT_REVOCATION_SNAPSHOT_INTERVAL', default=1000, cast=int)
+# Снимок прав (роль и маски по элементам) в claim 'perm' для проверки в других сервисах
+JWT_PERMISSION_CLAIMS = config('JWT_PERMISSION_CLAIMS', default=False, cast=bool)
+# GET /api/permissions/version отдает смены ролей пользователей только с Authorization: Bearer <токен>;
+# без токена - только в DEBUG
+PERMISSION_VERSION_TOKEN = config('PERMISSION_VERSION_TOKEN', default='')
+# Размер LRU уже проверенных токенов
+JWT_TOKEN_CACHE_SIZE = config('JWT_TOKEN_CACHE_SIZE', default=10000, cast=int)
+
+# Кэш пользователей в JWTAuthenticationMiddleware
+PRINCIPAL_CACHE_TTL = config('PRINCIPAL_CACHE_TTL', default=60, cast=int)
+PRINCIPAL_CACHE_MAX_SIZE = config('PRINCIPAL_CACHE_MAX_SIZE', default=10000, cast=int)
+
+# Пул для хэширования паролей; 0 - по числу CPU
+PASSWORD_HASHING_WORKERS = config('PASSWORD_HASHING_WORKERS', default=0, cast=int)
+PASSWORD_HASHING_QUEUE_DEPTH = config('PASSWORD_HASHING_QUEUE_DEPTH', default=32, cast=int)
+PASSWORD_HASHING_TIMEOUT = config('PASSWORD_HASHING_TIMEOUT', default=10, cast=int)
+
+# Server-Timing и /metrics: время middleware, view, SQL, шаблонов и хэширования паролей
+INSTRUMENTATION_ENABLED = config('INSTRUMENTATION_ENABLED', default=True, cast=bool)
+# Заголовок Server-Timing в ответах. Фазы выдают ход обработки (например, hash при входе
+# только для существующего email), поэтому по умолчанию он есть только в DEBUG
+SERVER_TIMING = config('SERVER_TIMING', default=DEBUG, cast=bool)
+# /metrics отдается только с Authorization: Bearer <METRICS_TOKEN>; без токена - только в DEBUG
+METRICS_TOKEN = config('METRICS_TOKEN', default='')
+
+# Ограничение попыток входа (token bucket) до поиска пользователя и хэширования пароля.
+# По имени маршрута: '5/min' - 5 попыток подряд, дальше по одной раз в 12 секунд; 429 и Retry-After.
+LOGIN_THROTTLE_RATES = {
+    'api_login': {'email': '5/min', 'ip': '30/min'},
+    'simple_login': {'email': '5/min', 'ip': '30/min'},
+}
+# local - в памяти процесса, cache - общий для воркеров через CACHES
+LOGIN_THROTTLE_BACKEND = config('LOGIN_THROTTLE_BACKEND', default='local')
+LOGIN_THROTTLE_MAX_KEYS = config('LOGIN_THROTTLE_MAX_KEYS', default=100000, cast=int)
+# Сколько прокси (балансировщиков) перед приложением дописывают X-Forwarded-For; 0 - брать REMOTE_ADDR
+LOGIN_THROTTLE_NUM_PROXIES = config('LOGIN_THROTTLE_NUM_PROXIES', default=0, cast=int)
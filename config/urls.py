@@ -1,11 +1,20 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path
 from django.shortcuts import redirect
 
 from core.web.views import SimpleHomeView, SimpleLoginView, SimpleRegisterView, SimpleProfileView
-from core.web.views import SimpleProductsView, SimpleOrdersView, SimpleLogoutView
+from core.web.views import SimpleProductsView, SimpleOrdersView, SimpleLogoutView, MetricsView
 from core.api.views import HomePageView, LoginView, RegisterView, LogoutView, UserProfileView, UserDeleteView
-from core.api.views import MockProductsView, MockOrdersView, AccessRuleListView, AccessRuleUpdateView
+from core.api.views import TokenRefreshView, PermissionVersionView
+from core.api.views import MockProductsView, MockOrdersView, PermissionCheckView, AccessRuleListView, AccessRuleUpdateView
+
+if settings.ASYNC_API:
+    # ASGI: те же URL обслуживают async-версии view
+    from core.api.views.async_views import AsyncLoginView as LoginView, AsyncUserProfileView as UserProfileView
+    from core.api.views.async_views import AsyncMockProductsView as MockProductsView, AsyncMockOrdersView as MockOrdersView
+    from core.api.views.async_views import AsyncPermissionCheckView as PermissionCheckView
+    from core.api.views.async_views import AsyncAccessRuleListView as AccessRuleListView
 
 def root_redirect(request):
     return redirect('home_page')
@@ -26,13 +35,19 @@ urlpatterns = [
     path('api/login/', LoginView.as_view(), name='api_login'),
     path('api/register/', RegisterView.as_view(), name='api_register'),
     path('api/logout/', LogoutView.as_view(), name='api_logout'),
+    path('api/token/refresh/', TokenRefreshView.as_view(), name='api_token_refresh'),
     path('api/profile/', UserProfileView.as_view(), name='api_profile'),
     path('api/delete-account/', UserDeleteView.as_view(), name='api_delete_account'),
     path('api/products/', MockProductsView.as_view(), name='api_products'),
     path('api/orders/', MockOrdersView.as_view(), name='api_orders'),
+    path('api/permissions/check', PermissionCheckView.as_view(), name='api_permissions_check'),
+    path('api/permissions/version', PermissionVersionView.as_view(), name='api_permissions_version'),
     path('api/admin/access-rules/', AccessRuleListView.as_view(), name='api_access_rules_list'),
     path('api/admin/access-rules/<int:pk>/', AccessRuleUpdateView.as_view(), name='api_access_rules_update'),
     
+    # 📈 Метрики Prometheus
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    
     # ⚙️ АДМИНКА Django
     path('admin/', admin.site.urls),
 ]
\ No newline at end of file
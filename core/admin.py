@@ -1,8 +1,10 @@
+from django import forms
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.utils.translation import gettext_lazy as _
-from .models import User, Role, BusinessElement, AccessRule
+from .hierarchy import creates_cycle
+from .models import User, Role, BusinessElement, AccessRule, EffectivePermission, Product, Order
 
 class CustomUserCreationForm(UserCreationForm):
     class Meta:
@@ -38,10 +40,23 @@ class UserAdmin(BaseUserAdmin):
         }),
     )
 
+class RoleForm(forms.ModelForm):
+    class Meta:
+        model = Role
+        fields = '__all__'
+    
+    def clean_parents(self):
+        parents = self.cleaned_data['parents']
+        if self.instance.pk and creates_cycle(self.instance.pk, {parent.pk for parent in parents}):
+            raise forms.ValidationError('Роль не может наследовать сама от себя')
+        return parents
+
 @admin.register(Role)
 class RoleAdmin(admin.ModelAdmin):
+    form = RoleForm
     list_display = ('name', 'description')
     search_fields = ('name',)
+    filter_horizontal = ('parents',)
 
 @admin.register(BusinessElement)
 class BusinessElementAdmin(admin.ModelAdmin):
@@ -52,4 +67,36 @@ class BusinessElementAdmin(admin.ModelAdmin):
 class AccessRuleAdmin(admin.ModelAdmin):
     list_display = ('role', 'element', 'read_permission', 'create_permission', 'update_permission', 'delete_permission')
     list_filter = ('role', 'element')
-    list_editable = ('read_permission', 'create_permission', 'update_permission', 'delete_permission')
\ No newline at end of file
+    list_editable = ('read_permission', 'create_permission', 'update_permission', 'delete_permission')
+    # Флаги - биты колонки permissions, сортировать по ним в SQL нельзя
+    sortable_by = ('role', 'element')
+
+# Итоговые права считаются из правил и иерархии ролей, вручную не редактируются
+@admin.register(EffectivePermission)
+class EffectivePermissionAdmin(admin.ModelAdmin):
+    list_display = ('role', 'element', 'mask')
+    list_filter = ('role', 'element')
+    list_select_related = ('role', 'element')
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+@admin.register(Product)
+class ProductAdmin(admin.ModelAdmin):
+    list_display = ('name', 'category', 'price', 'owner', 'created_at')
+    list_filter = ('category',)
+    search_fields = ('name',)
+    raw_id_fields = ('owner',)
+
+@admin.register(Order)
+class OrderAdmin(admin.ModelAdmin):
+    list_display = ('id', 'product', 'status', 'amount', 'owner', 'created_at')
+    list_filter = ('status',)
+    list_select_related = ('product', 'owner')
+    raw_id_fields = ('product', 'owner')
\ No newline at end of file
@@ -0,0 +1,11 @@
+from rest_framework.authentication import BaseAuthentication
+
+
+class JWTMiddlewareAuthentication(BaseAuthentication):
+    """Отдает DRF пользователя, которого уже установил JWTAuthenticationMiddleware."""
+
+    def authenticate(self, request):
+        user = getattr(request._request, 'user', None)
+        if user is None or not user.is_authenticated:
+            return None
+        return (user, None)
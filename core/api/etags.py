@@ -0,0 +1,42 @@
+import hashlib
+
+from django.utils.cache import quote_etag
+
+from core import permissions
+
+# ETag считаются по версиям (строки пользователя и матрицы прав), без сериализации ответа.
+# Функции подходят как etag_func для django.views.decorators.http.condition.
+
+def _digest(*parts):
+    return hashlib.blake2b(':'.join(map(str, parts)).encode(), digest_size=8).hexdigest()
+
+def _profile_etag(user, version):
+    if not user or not user.is_authenticated:
+        return None
+    # Имя роли и права в ответе зависят от матрицы прав
+    return _digest('profile', user.id, user.updated_at.timestamp(), user.role_id, version)
+
+def profile_etag(request, *args, **kwargs):
+    return _profile_etag(request.user, permissions.current_version())
+
+async def aprofile_etag(request):
+    return _profile_etag(request.user, await permissions.acurrent_version())
+
+def rules_etag(version):
+    return f'rules-{version}'
+
+def _access_rules_etag(user, version):
+    if not user.is_superuser:
+        return None
+    return rules_etag(version)
+
+def access_rules_etag(request, *args, **kwargs):
+    return _access_rules_etag(request.user, permissions.current_version())
+
+async def aaccess_rules_etag(request):
+    return _access_rules_etag(request.user, await permissions.acurrent_version())
+
+def set_etag(response, etag):
+    if etag:
+        response['ETag'] = quote_etag(etag)
+    return response
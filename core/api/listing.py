@@ -0,0 +1,192 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+
+STREAM_CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json',
+}
+
+
+class InvalidListParams(Exception):
+    pass
+
+
+class KeysetListing:
+    """Фильтрация, сортировка и keyset-пагинация списков по индексированным колонкам.
+
+    Курсор - base64 от [sort, значение колонки сортировки, id] последней строки страницы,
+    поэтому каждая следующая страница - это WHERE (col, id) > (v, id) ... LIMIT n без OFFSET.
+    fields: ключ в ответе -> lookup для values()
+    filters: параметр запроса -> (lookup, приведение типа)
+    """
+
+    def __init__(self, fields, sort_fields, filters, default_sort='id', page_size=50, max_page_size=500,
+                 chunk_size=2000):
+        self.fields = fields
+        self.sort_fields = sort_fields
+        self.filters = filters
+        self.default_sort = default_sort
+        self.page_size = page_size
+        self.max_page_size = max_page_size
+        self.chunk_size = chunk_size
+
+    def encode_cursor(self, sort, row):
+        value = row[sort.lstrip('-')]
+        if hasattr(value, 'isoformat'):
+            # DjangoJSONEncoder обрезает микросекунды, а курсору нужно точное значение
+            value = value.isoformat()
+        payload = json.dumps([sort, value, row['id']])
+        return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, sort, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            cursor_sort, value, last_id = json.loads(base64.urlsafe_b64decode(padded))
+        except (ValueError, TypeError):
+            raise InvalidListParams('Некорректный курсор')
+        if cursor_sort != sort:
+            raise InvalidListParams('Курсор получен для другой сортировки')
+        # Курсор приходит от клиента: id - целое, значение колонки - строка или число
+        if type(last_id) is not int or type(value) not in (str, int, float):
+            raise InvalidListParams('Некорректный курсор')
+        return value, last_id
+
+    def get_sort(self, params):
+        sort = params.get('sort') or self.default_sort
+        if sort.lstrip('-') not in self.sort_fields:
+            raise InvalidListParams(f'Сортировка возможна только по полям: {", ".join(self.sort_fields)}')
+        return sort
+
+    def get_limit(self, params):
+        try:
+            limit = int(params.get('limit') or self.page_size)
+        except ValueError:
+            raise InvalidListParams('Некорректный limit')
+        return max(1, min(limit, self.max_page_size))
+
+    def filter(self, queryset, params):
+        lookups = {}
+        for param, (lookup, cast) in self.filters.items():
+            value = params.get(param)
+            if value in (None, ''):
+                continue
+            try:
+                lookups[lookup] = cast(value)
+            except ValueError:
+                raise InvalidListParams(f'Некорректное значение фильтра {param}')
+        return queryset.filter(**lookups)
+
+    def order(self, queryset, params):
+        sort = self.get_sort(params)
+        field = sort.lstrip('-')
+        descending = sort.startswith('-')
+
+        cursor = params.get('cursor')
+        if cursor:
+            value, last_id = self.decode_cursor(sort, cursor)
+            op = 'lt' if descending else 'gt'
+            try:
+                if field == 'id':
+                    queryset = queryset.filter(**{f'id__{op}': last_id})
+                else:
+                    queryset = queryset.filter(
+                        Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': last_id})
+                    )
+            except (ValueError, ValidationError):
+                # Значение не приводится к типу колонки: строка вместо цены, не дата
+                raise InvalidListParams('Некорректный курсор')
+
+        id_order = '-id' if descending else 'id'
+        ordering = [id_order] if field == 'id' else [sort, id_order]
+        return queryset.order_by(*ordering), sort
+
+    def serialize(self, row):
+        return {key: row[lookup] for key, lookup in self.fields.items()}
+
+    def prepare(self, queryset, params):
+        queryset = self.filter(queryset, params)
+        queryset, sort = self.order(queryset, params)
+        # Для курсора нужны колонка сортировки и id даже если их нет в ответе
+        lookups = set(self.fields.values()) | {sort.lstrip('-'), 'id'}
+        return queryset.values(*lookups), sort
+
+    def page(self, queryset, params):
+        queryset, sort = self.prepare(queryset, params)
+        limit = self.get_limit(params)
+        rows = list(queryset[:limit + 1])
+        return self._finish_page(rows, sort, limit)
+
+    async def apage(self, queryset, params):
+        queryset, sort = self.prepare(queryset, params)
+        limit = self.get_limit(params)
+        rows = [row async for row in queryset[:limit + 1]]
+        return self._finish_page(rows, sort, limit)
+
+    def _finish_page(self, rows, sort, limit):
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self.encode_cursor(sort, rows[-1])
+        return [self.serialize(row) for row in rows], next_cursor
+
+    def get_stream_format(self, params):
+        stream = params.get('stream')
+        if stream and stream not in STREAM_CONTENT_TYPES:
+            raise InvalidListParams('stream может быть только ndjson или json')
+        return stream
+
+    def _encode(self, row):
+        return json.dumps(self.serialize(row), cls=DjangoJSONEncoder, ensure_ascii=False)
+
+    def stream(self, queryset, params, stream_format):
+        # Параметры проверяются сразу, до начала отдачи ответа
+        queryset, _ = self.prepare(queryset, params)
+        return self._iter_stream(queryset, stream_format)
+
+    def astream(self, queryset, params, stream_format):
+        queryset, _ = self.prepare(queryset, params)
+        return self._aiter_stream(queryset, stream_format)
+
+    def _iter_stream(self, queryset, stream_format):
+        # iterator() читает строки порциями (на PostgreSQL - серверным курсором)
+        rows = queryset.iterator(chunk_size=self.chunk_size)
+        if stream_format == 'ndjson':
+            for row in rows:
+                yield self._encode(row) + '\n'
+            return
+
+        yield '['
+        for index, row in enumerate(rows):
+            yield (',\n' if index else '') + self._encode(row)
+        yield ']\n'
+
+    async def _aiter_stream(self, queryset, stream_format):
+        rows = queryset.aiterator(chunk_size=self.chunk_size)
+        if stream_format == 'ndjson':
+            async for row in rows:
+                yield self._encode(row) + '\n'
+            return
+
+        yield '['
+        first = True
+        async for row in rows:
+            yield ('' if first else ',\n') + self._encode(row)
+            first = False
+        yield ']\n'
+
+
+def next_url(request, cursor):
+    # Сортировка и фильтры сохраняются, меняется только курсор
+    if not cursor:
+        return None
+    params = request.GET.copy()
+    params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}'
+
+
+def next_link(request, cursor):
+    return f'<{next_url(request, cursor)}>; rel="next"'
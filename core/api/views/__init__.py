@@ -1,3 +1,3 @@
-from .auth_views import RegisterView, LoginView, LogoutView, UserProfileView, UserDeleteView, HomePageView
-from .business_views import MockProductsView, MockOrdersView
+from .auth_views import RegisterView, LoginView, LogoutView, TokenRefreshView, PermissionVersionView, UserProfileView, UserDeleteView, HomePageView
+from .business_views import MockProductsView, MockOrdersView, PermissionCheckView
 from .admin_views import AccessRuleListView, AccessRuleUpdateView
\ No newline at end of file
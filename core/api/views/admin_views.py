@@ -1,28 +1,83 @@
+from django.db import transaction
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from core import hierarchy, permissions
+from core.api.etags import access_rules_etag, rules_etag, set_etag
 from core.models import AccessRule, BusinessElement
+from core.query_budget import QueryBudget
 
-class AccessRuleSerializer:
-    def __init__(self, instance=None, data=None):
-        self.instance = instance
-        self.data = data
-    
-    def is_valid(self):
-        return bool(self.data)
+PERMISSION_FIELDS = tuple(permissions.PERMISSION_FIELDS.values())
+# Список правил строится прямо из маски, без моделей и булевых полей
+RULE_COLUMNS = ('id', 'role__name', 'element__name', 'permissions')
+
+def serialize_rule(rule_id, role_name, element_name, mask):
+    return {
+        'id': rule_id,
+        'role': role_name,
+        'element': element_name,
+        'mask': mask,
+        'permissions': permissions.mask_actions(mask)
+    }
+
+def validate_rule_deltas(data):
+    # [{'id': 1, 'read_permission': true, ...}, ...] или {'rules': [...]};
+    # вместо булевых полей можно передать маску целиком: {'id': 1, 'permissions': 9}
+    if isinstance(data, dict):
+        data = data.get('rules')
+    if not isinstance(data, list) or not data:
+        return None, 'Ожидается непустой список правил'
     
-    def save(self):
-        if self.instance:
-            for attr, value in self.data.items():
-                if hasattr(self.instance, attr):
-                    setattr(self.instance, attr, value)
-            self.instance.save()
-            return self.instance
+    deltas = {}
+    for item in data:
+        if not isinstance(item, dict) or type(item.get('id')) is not int:
+            return None, 'Каждое правило должно содержать числовой id'
+        changes = {key: value for key, value in item.items() if key != 'id'}
+        unknown = set(changes) - set(PERMISSION_FIELDS) - {'permissions'}
+        if unknown:
+            return None, f'Неизвестные поля: {", ".join(sorted(unknown))}'
+        mask = changes.pop('permissions', None)
+        if mask is not None and (type(mask) is not int or not 0 <= mask <= permissions.ALL_PERMISSIONS):
+            return None, f'permissions - целое от 0 до {permissions.ALL_PERMISSIONS}'
+        if not all(isinstance(value, bool) for value in changes.values()):
+            return None, 'Значения прав должны быть true/false'
+        if mask is not None:
+            # Маска применяется первой, отдельные поля - поверх нее
+            changes = {'permissions': mask, **changes}
+        deltas.setdefault(item['id'], {}).update(changes)
+    return deltas, None
+
+def apply_rule_deltas(deltas):
+    with transaction.atomic():
+        rules = AccessRule.objects.select_for_update().in_bulk(list(deltas))
+        missing = sorted(set(deltas) - set(rules))
+        if missing:
+            return 0, missing, None
+        
+        for rule_id, changes in deltas.items():
+            # Булевы поля - биты маски, в БД пишется только permissions
+            for field, value in changes.items():
+                setattr(rules[rule_id], field, value)
+        
+        if any(deltas.values()):
+            AccessRule.objects.bulk_update(list(rules.values()), ['permissions'])
+            # bulk_update не шлет сигналы - итоговые права затронутых ролей пересчитываем сами
+            hierarchy.refresh_effective(
+                {rule.role_id for rule in rules.values()},
+                {rule.element_id for rule in rules.values()}
+            )
     
-    @property
-    def errors(self):
-        return {}
+    # bulk_update не шлет сигналы - матрицу инвалидируем один раз на весь пакет
+    version = permissions.bump_version()
+    return len(rules), [], version
 
+# ETag списка правил - версия матрицы прав; ее же ждут в If-Match при изменении правил
+@method_decorator(condition(etag_func=access_rules_etag), name='get')
+@method_decorator(condition(etag_func=access_rules_etag), name='patch')
 class AccessRuleListView(APIView):
+    # Изменение правил пересчитывает EffectivePermission: иерархия, правила, текущие маски, запись
+    query_budget = {'get': QueryBudget(3), 'patch': QueryBudget(7)}
     def get(self, request):
         if not request.user.is_superuser:
             return Response(
@@ -30,26 +85,38 @@ class AccessRuleListView(APIView):
                 status=403
             )
         
-        rules = AccessRule.objects.select_related('role', 'element').all()
-        data = []
-        for rule in rules:
-            data.append({
-                'id': rule.id,
-                'role': rule.role.name,
-                'element': rule.element.name,
-                'permissions': {
-                    'read': rule.read_permission,
-                    'read_all': rule.read_all_permission,
-                    'create': rule.create_permission,
-                    'update': rule.update_permission,
-                    'update_all': rule.update_all_permission,
-                    'delete': rule.delete_permission,
-                    'delete_all': rule.delete_all_permission,
-                }
-            })
+        data = [serialize_rule(*row) for row in AccessRule.objects.values_list(*RULE_COLUMNS)]
         return Response(data)
+    
+    def patch(self, request):
+        if not request.user.is_superuser:
+            return Response(
+                {'error': 'Требуются права администратора'}, 
+                status=403
+            )
+        
+        deltas, error = validate_rule_deltas(request.data)
+        if error:
+            return Response({'error': error}, status=400)
+        
+        updated, missing, version = apply_rule_deltas(deltas)
+        if missing:
+            return Response(
+                {'error': 'Rule not found', 'ids': missing}, 
+                status=404
+            )
+        
+        response = Response({
+            'message': 'Rules updated successfully',
+            'updated': updated,
+            'version': version
+        })
+        return set_etag(response, rules_etag(version))
 
+@method_decorator(condition(etag_func=access_rules_etag), name='put')
 class AccessRuleUpdateView(APIView):
+    # То же изменение, что PATCH списка, для одного правила
+    query_budget = {'put': QueryBudget(7)}
     def put(self, request, pk):
         if not request.user.is_superuser:
             return Response(
@@ -57,17 +124,23 @@ class AccessRuleUpdateView(APIView):
                 status=403
             )
         
-        try:
-            rule = AccessRule.objects.get(pk=pk)
-        except AccessRule.DoesNotExist:
+        data = request.data
+        if hasattr(data, 'dict'):
+            # Форма: QueryDict -> {поле: значение}
+            data = data.dict()
+        if not isinstance(data, dict) or not data:
+            return Response({'error': 'Invalid data'}, status=400)
+        
+        deltas, error = validate_rule_deltas([{**data, 'id': pk}])
+        if error:
+            return Response({'error': error}, status=400)
+        
+        _, missing, version = apply_rule_deltas(deltas)
+        if missing:
             return Response(
                 {'error': 'Rule not found'}, 
                 status=404
             )
         
-        serializer = AccessRuleSerializer(instance=rule, data=request.data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response({'message': 'Rule updated successfully'})
-        
-        return Response({'error': 'Invalid data'}, status=400)
\ No newline at end of file
+        response = Response({'message': 'Rule updated successfully'})
+        return set_etag(response, rules_etag(version))
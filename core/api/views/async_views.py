@@ -0,0 +1,232 @@
+import json
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, quote_etag
+from django.views import View
+
+from core import hashing, permissions
+from core.hashing import POOL_SATURATED_ERROR
+from core.api.etags import aaccess_rules_etag, aprofile_etag, rules_etag, set_etag
+from core.api.listing import STREAM_CONTENT_TYPES, InvalidListParams, next_link
+from core.models import AccessRule, Order, Product, User
+from core.query_budget import QueryBudget
+from core.scoping import ascope_queryset
+from core.throttling import login_throttle
+from .admin_views import RULE_COLUMNS, apply_rule_deltas, serialize_rule, validate_rule_deltas
+from .auth_views import THROTTLED_ERROR, UserSerializer, acreate_jwt_token
+from .business_views import ORDER_LISTING, PRODUCT_LISTING, permission_check_results, validate_permission_checks
+
+# Async-версии view для ASGI (settings.ASYNC_API). URL и формат ответов те же, что у DRF-версий.
+
+def json_response(data, status=200):
+    return JsonResponse(data, status=status, safe=False, json_dumps_params={'ensure_ascii': False})
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+def conditional_response(request, etag):
+    # 304 на If-None-Match или 412 на If-Match, как django.views.decorators.http.condition
+    if etag is None:
+        return None
+    return get_conditional_response(request, etag=quote_etag(etag))
+
+async def list_response(request, listing, queryset):
+    params = request.GET
+    try:
+        stream_format = listing.get_stream_format(params)
+        if stream_format:
+            return StreamingHttpResponse(
+                listing.astream(queryset, params, stream_format),
+                content_type=STREAM_CONTENT_TYPES[stream_format]
+            )
+        items, next_cursor = await listing.apage(queryset, params)
+    except InvalidListParams as exc:
+        return json_response({'error': str(exc)}, status=400)
+
+    response = json_response(items)
+    if next_cursor:
+        response['Link'] = next_link(request, next_cursor)
+    return response
+
+class AsyncAPIView(View):
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # API аутентифицируется по JWT, CSRF не нужен (как у DRF APIView)
+        view.csrf_exempt = True
+        return view
+
+class AsyncLoginView(AsyncAPIView):
+    query_budget = {'post': QueryBudget(1)}
+    async def post(self, request):
+        data = parse_body(request)
+        if data is None:
+            return json_response({'detail': 'JSON parse error'}, status=400)
+
+        email = data.get('email')
+        password = data.get('password')
+
+        if not email or not password:
+            return json_response({'error': 'Необходимо указать email и пароль'}, status=400)
+
+        retry_after = await login_throttle.acheck(request.resolver_match.url_name, request, email)
+        if retry_after:
+            response = json_response({'error': THROTTLED_ERROR}, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+
+        try:
+            user = await User.objects.select_related('role').aget(email=email, is_active=True)
+        except User.DoesNotExist:
+            return json_response({'error': 'Неверные учетные данные'}, status=401)
+
+        try:
+            password_valid = await hashing.acheck_password(user, password)
+        except hashing.HashingPoolSaturated:
+            return json_response({'error': POOL_SATURATED_ERROR}, status=503)
+
+        if not password_valid:
+            return json_response({'error': 'Неверные учетные данные'}, status=401)
+
+        token = await acreate_jwt_token(user)
+        return json_response({
+            'token': token,
+            'user': {
+                'id': user.id,
+                'email': user.email,
+                'first_name': user.first_name,
+                'last_name': user.last_name,
+                'role': user.role.name if user.role else None
+            }
+        })
+
+class AsyncUserProfileView(AsyncAPIView):
+    query_budget = {'get': QueryBudget(1), 'put': QueryBudget(2)}
+    async def get(self, request):
+        user = request.user
+        if not user.is_authenticated:
+            return json_response({'error': 'Требуется авторизация'}, status=401)
+
+        etag = await aprofile_etag(request)
+        response = conditional_response(request, etag)
+        if response is not None:
+            return response
+
+        # Роль уже загружена кэшем пользователей через select_related
+        response = json_response({
+            'id': user.id,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'patronymic': user.patronymic,
+            'role': user.role.name if user.role else None,
+            'permissions': permissions.permission_bitmap(user, await permissions.aget_matrix())
+        })
+        return set_etag(response, etag)
+
+    async def put(self, request):
+        if not request.user.is_authenticated:
+            return json_response({'error': 'Требуется авторизация'}, status=401)
+
+        response = conditional_response(request, await aprofile_etag(request))
+        if response is not None:
+            return response
+
+        serializer = UserSerializer(instance=request.user, data=parse_body(request))
+        if not serializer.is_valid():
+            return json_response({'error': 'Invalid data'}, status=400)
+
+        await sync_to_async(serializer.save)()
+        user = request.user
+        response = json_response({
+            'id': user.id,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'patronymic': user.patronymic
+        })
+        return set_etag(response, await aprofile_etag(request))
+
+class AsyncMockProductsView(AsyncAPIView):
+    query_budget = {'get': QueryBudget(3)}
+    async def get(self, request):
+        if not await permissions.ahas_permission(request.user, 'products', 'read'):
+            return json_response({'error': 'Доступ запрещен'}, status=403)
+        products = await ascope_queryset(Product.objects.all(), request.user, 'products')
+        return await list_response(request, PRODUCT_LISTING, products)
+
+class AsyncMockOrdersView(AsyncAPIView):
+    query_budget = {'get': QueryBudget(3)}
+    async def get(self, request):
+        if not await permissions.ahas_permission(request.user, 'orders', 'read'):
+            return json_response({'error': 'Доступ запрещен'}, status=403)
+        orders = await ascope_queryset(Order.objects.all(), request.user, 'orders')
+        return await list_response(request, ORDER_LISTING, orders)
+
+class AsyncPermissionCheckView(AsyncAPIView):
+    query_budget = {'post': QueryBudget(1)}
+    async def post(self, request):
+        if not request.user.is_authenticated:
+            return json_response({'error': 'Требуется авторизация'}, status=401)
+        
+        try:
+            data = json.loads(request.body or b'null')
+        except ValueError:
+            return json_response({'detail': 'JSON parse error'}, status=400)
+        
+        checks, error = validate_permission_checks(data)
+        if error:
+            return json_response({'error': error}, status=400)
+        
+        return json_response(permission_check_results(request.user, await permissions.aget_matrix(), checks))
+
+class AsyncAccessRuleListView(AsyncAPIView):
+    # Изменение правил пересчитывает EffectivePermission: иерархия, правила, текущие маски, запись
+    query_budget = {'get': QueryBudget(3), 'patch': QueryBudget(7)}
+    async def get(self, request):
+        if not request.user.is_superuser:
+            return json_response({'error': 'Требуются права администратора'}, status=403)
+
+        etag = await aaccess_rules_etag(request)
+        response = conditional_response(request, etag)
+        if response is not None:
+            return response
+
+        data = [serialize_rule(*row) async for row in AccessRule.objects.values_list(*RULE_COLUMNS)]
+        return set_etag(json_response(data), etag)
+
+    async def patch(self, request):
+        if not request.user.is_superuser:
+            return json_response({'error': 'Требуются права администратора'}, status=403)
+
+        response = conditional_response(request, await aaccess_rules_etag(request))
+        if response is not None:
+            return response
+
+        try:
+            data = json.loads(request.body or b'null')
+        except ValueError:
+            return json_response({'detail': 'JSON parse error'}, status=400)
+
+        deltas, error = validate_rule_deltas(data)
+        if error:
+            return json_response({'error': error}, status=400)
+
+        # Транзакции в async ORM нет, пакет применяется синхронно в отдельном потоке
+        updated, missing, version = await sync_to_async(apply_rule_deltas)(deltas)
+        if missing:
+            return json_response({'error': 'Rule not found', 'ids': missing}, status=404)
+
+        response = json_response({
+            'message': 'Rules updated successfully',
+            'updated': updated,
+            'version': version
+        })
+        return set_etag(response, rules_etag(version))
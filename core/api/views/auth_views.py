@@ -1,3 +1,5 @@
+import uuid
+
 import jwt
 from django.utils import timezone
 from rest_framework import status
@@ -6,18 +8,48 @@ from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from django.conf import settings
+from django.utils.crypto import constant_time_compare
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+
+from core import hashing, permissions
+from core.hashing import POOL_SATURATED_ERROR
+from core.api.etags import profile_etag, set_etag
+from core.revocation import revocation_store
+from core.token_verifier import SNAPSHOT_CLAIM
+from core.throttling import login_throttle
+from core.models import User
+from core.registration import DUPLICATE_EMAIL_ERROR, DuplicateEmail, email_taken, register_user
+from core.query_budget import QueryBudget
 
-from core.models import User, Role
+THROTTLED_ERROR = 'Слишком много попыток входа, повторите позже'
+TOKEN_LIFETIME = timezone.timedelta(days=1)
 
-def create_jwt_token(user):
+def throttled_response(retry_after):
+    response = Response({'error': THROTTLED_ERROR}, status=status.HTTP_429_TOO_MANY_REQUESTS)
+    response['Retry-After'] = str(retry_after)
+    return response
+
+def encode_jwt_token(user, matrix=None):
     payload = {
+        'jti': uuid.uuid4().hex,
         'user_id': user.id,
         'email': user.email,
-        'exp': timezone.now() + timezone.timedelta(days=1),
+        'exp': timezone.now() + TOKEN_LIFETIME,
         'iat': timezone.now()
     }
+    if matrix is not None:
+        payload[SNAPSHOT_CLAIM] = permissions.token_snapshot(user, matrix)
     return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
+def create_jwt_token(user, request=None):
+    matrix = permissions.get_matrix(request) if settings.JWT_PERMISSION_CLAIMS else None
+    return encode_jwt_token(user, matrix)
+
+async def acreate_jwt_token(user):
+    matrix = await permissions.aget_matrix() if settings.JWT_PERMISSION_CLAIMS else None
+    return encode_jwt_token(user, matrix)
+
 class UserSerializer:
     def __init__(self, instance=None, data=None):
         self.instance = instance
@@ -44,6 +76,7 @@ class UserSerializer:
 
 @permission_classes([AllowAny])
 class RegisterView(APIView):
+    query_budget = {'post': QueryBudget(3)}
     def post(self, request):
         serializer = UserSerializer(data=request.data)
         if not serializer.is_valid():
@@ -52,32 +85,43 @@ class RegisterView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if User.objects.filter(email=request.data.get('email')).exists():
+        if request.data.get('password') != request.data.get('password_confirm'):
             return Response(
-                {'error': 'Пользователь с таким email уже существует'}, 
+                {'error': 'Пароли не совпадают'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        if request.data.get('password') != request.data.get('password_confirm'):
+        if email_taken(request.data['email']):
             return Response(
-                {'error': 'Пароли не совпадают'}, 
+                {'error': DUPLICATE_EMAIL_ERROR}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        try:
+            password_hash = hashing.make_password(request.data['password'])
+        except hashing.HashingPoolSaturated:
+            return Response(
+                {'error': POOL_SATURATED_ERROR}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
         user_data = {
             'email': request.data['email'],
             'first_name': request.data['first_name'],
             'last_name': request.data['last_name'],
             'patronymic': request.data.get('patronymic', ''),
-            'password': request.data['password']
+            'password_hash': password_hash
         }
         
-        user = User.objects.create_user(**user_data)
-        user_role, _ = Role.objects.get_or_create(name='user')
-        user.role = user_role
-        user.save()
+        try:
+            user = register_user(**user_data)
+        except DuplicateEmail:
+            return Response(
+                {'error': DUPLICATE_EMAIL_ERROR}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        token = create_jwt_token(user)
+        token = create_jwt_token(user, request=request)
         return Response({
             'token': token,
             'user': {
@@ -90,6 +134,7 @@ class RegisterView(APIView):
 
 @permission_classes([AllowAny])
 class LoginView(APIView):
+    query_budget = {'post': QueryBudget(1)}
     def post(self, request):
         email = request.data.get('email')
         password = request.data.get('password')
@@ -100,21 +145,34 @@ class LoginView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
+        # До поиска пользователя и PBKDF2
+        retry_after = login_throttle.check(request.resolver_match.url_name, request, email)
+        if retry_after:
+            return throttled_response(retry_after)
+        
         try:
-            user = User.objects.get(email=email, is_active=True)
+            user = User.objects.select_related('role').get(email=email, is_active=True)
         except User.DoesNotExist:
             return Response(
                 {'error': 'Неверные учетные данные'}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        if not user.check_password(password):
+        try:
+            password_valid = hashing.check_password(user, password)
+        except hashing.HashingPoolSaturated:
+            return Response(
+                {'error': POOL_SATURATED_ERROR}, 
+                status=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        
+        if not password_valid:
             return Response(
                 {'error': 'Неверные учетные данные'}, 
                 status=status.HTTP_401_UNAUTHORIZED
             )
         
-        token = create_jwt_token(user)
+        token = create_jwt_token(user, request=request)
         return Response({
             'token': token,
             'user': {
@@ -126,11 +184,49 @@ class LoginView(APIView):
             }
         })
 
+def revoke_request_token(request):
+    payload = getattr(request, 'jwt_payload', None)
+    if payload and payload.get('jti'):
+        revocation_store.revoke(payload['jti'], payload['exp'])
+
+class TokenRefreshView(APIView):
+    query_budget = {'post': QueryBudget(1)}
+    def post(self, request):
+        # Новый токен со свежим снимком прав, старый отзывается
+        if not request.user.is_authenticated:
+            return Response({'error': 'Требуется авторизация'}, status=status.HTTP_401_UNAUTHORIZED)
+        
+        token = create_jwt_token(request.user, request=request)
+        revoke_request_token(request)
+        return Response({'token': token})
+
+@permission_classes([AllowAny])
+class PermissionVersionView(APIView):
+    query_budget = {'get': QueryBudget(1)}
+    def get(self, request):
+        # Для core.token_verifier.VersionPoller: снимки прав старше этой версии устарели.
+        # users - пользователи со сменой роли за время жизни токена, только с PERMISSION_VERSION_TOKEN
+        data = {'version': permissions.current_version()}
+        token = settings.PERMISSION_VERSION_TOKEN
+        if token:
+            allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+        else:
+            allowed = settings.DEBUG
+        if allowed:
+            data['users'] = permissions.recent_access_versions(TOKEN_LIFETIME.total_seconds())
+        return Response(data)
+
 class LogoutView(APIView):
+    query_budget = {'post': QueryBudget(1)}
     def post(self, request):
+        revoke_request_token(request)
         return Response({'message': 'Successfully logged out'})
 
+# If-None-Match -> 304 без сборки ответа, If-Match на PUT -> 412 при устаревшей версии
+@method_decorator(condition(etag_func=profile_etag), name='get')
+@method_decorator(condition(etag_func=profile_etag), name='put')
 class UserProfileView(APIView):
+    query_budget = {'get': QueryBudget(1), 'put': QueryBudget(2)}
     def get(self, request):
         return Response({
             'id': request.user.id,
@@ -138,29 +234,34 @@ class UserProfileView(APIView):
             'first_name': request.user.first_name,
             'last_name': request.user.last_name,
             'patronymic': request.user.patronymic,
-            'role': request.user.role.name if request.user.role else None
+            'role': request.user.role.name if request.user.role else None,
+            'permissions': permissions.permission_bitmap(request.user, permissions.get_matrix(request))
         })
     
     def put(self, request):
         serializer = UserSerializer(instance=request.user, data=request.data)
         if serializer.is_valid():
             serializer.save()
-            return Response({
+            response = Response({
                 'id': request.user.id,
                 'email': request.user.email,
                 'first_name': request.user.first_name,
                 'last_name': request.user.last_name,
                 'patronymic': request.user.patronymic
             })
+            return set_etag(response, profile_etag(request))
         return Response({'error': 'Invalid data'}, status=status.HTTP_400_BAD_REQUEST)
 
 class UserDeleteView(APIView):
+    query_budget = {'post': QueryBudget(2)}
     def post(self, request):
         request.user.delete()
+        revoke_request_token(request)
         return Response({'message': 'Account deleted successfully'})
 
 @permission_classes([AllowAny])
 class HomePageView(APIView):
+    query_budget = {'get': QueryBudget(0)}
     def get(self, request):
         return Response({
             "message": "Добро пожаловать в систему аутентификации!",
@@ -169,16 +270,20 @@ class HomePageView(APIView):
                     "login": "POST /api/login/",
                     "register": "POST /api/register/", 
                     "logout": "POST /api/logout/",
+                    "token_refresh": "POST /api/token/refresh/",
                     "profile": "GET /api/profile/",
                     "delete_account": "POST /api/delete-account/"
                 },
                 "business_objects": {
                     "products": "GET /api/products/",
-                    "orders": "GET /api/orders/"
+                    "orders": "GET /api/orders/",
+                    "permissions_check": "POST /api/permissions/check",
+                    "permissions_version": "GET /api/permissions/version"
                 },
                 "admin": {
                     "access_rules": "GET /api/admin/access-rules/",
-                    "update_rule": "PUT /api/admin/access-rules/{id}/"
+                    "update_rule": "PUT /api/admin/access-rules/{id}/",
+                    "update_rules": "PATCH /api/admin/access-rules/"
                 }
             },
             "documentation": "Используйте токен авторизации в заголовке: Authorization: Bearer <your_token>"
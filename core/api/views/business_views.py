@@ -1,6 +1,11 @@
+from django.http import StreamingHttpResponse
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from core.models import BusinessElement, AccessRule
+from core import permissions
+from core.scoping import scope_queryset
+from core.api.listing import STREAM_CONTENT_TYPES, InvalidListParams, KeysetListing, next_link
+from core.models import Order, Product
+from core.query_budget import QueryBudget
 
 class HasPermission:
     def __init__(self, element_name, action):
@@ -8,34 +13,96 @@ class HasPermission:
         self.action = action
     
     def has_permission(self, request, view):
-        if not request.user or not request.user.is_authenticated:
-            return False
-        
-        if request.user.is_superuser:
-            return True
-        
-        try:
-            element = BusinessElement.objects.get(name=self.element_name)
-            access_rule = AccessRule.objects.get(
-                role=request.user.role, 
-                element=element
+        # Проверка идет по матрице прав в памяти процесса, без запросов к БД
+        return permissions.has_permission(request.user, self.element_name, self.action, request=request)
+
+MAX_PERMISSION_CHECKS = 100
+
+def validate_permission_checks(data):
+    # [{'element': 'orders', 'action': 'read'}, ...], пары [['orders', 'read'], ...] или {'checks': [...]}
+    if isinstance(data, dict):
+        data = data.get('checks')
+    if not isinstance(data, list) or not data:
+        return None, 'Ожидается непустой список проверок'
+    if len(data) > MAX_PERMISSION_CHECKS:
+        return None, f'Не больше {MAX_PERMISSION_CHECKS} проверок за запрос'
+    
+    checks = []
+    for item in data:
+        if isinstance(item, dict):
+            item = (item.get('element'), item.get('action'))
+        if not isinstance(item, (list, tuple)) or len(item) != 2 or not all(isinstance(value, str) for value in item):
+            return None, 'Каждая проверка - {"element": ..., "action": ...} или пара [элемент, действие]'
+        if item[1] not in permissions.PERMISSION_BITS:
+            return None, f'Неизвестное действие: {item[1]}'
+        checks.append(tuple(item))
+    return checks, None
+
+def permission_check_results(user, matrix, checks):
+    # Маски пользователя берутся из матрицы один раз на весь список
+    allowed = permissions.check_all(user, permissions.user_masks(user, matrix), checks)
+    return {
+        'version': matrix.version,
+        'results': [
+            {'element': element_name, 'action': action, 'allowed': result}
+            for (element_name, action), result in zip(checks, allowed)
+        ]
+    }
+
+PRODUCT_LISTING = KeysetListing(
+    fields={
+        'id': 'id',
+        'name': 'name',
+        'price': 'price',
+        'description': 'description',
+        'category': 'category',
+    },
+    sort_fields=('id', 'price', 'created_at', 'name'),
+    filters={
+        'category': ('category', str),
+        'price_min': ('price__gte', int),
+        'price_max': ('price__lte', int),
+    },
+)
+
+ORDER_LISTING = KeysetListing(
+    fields={
+        'id': 'id',
+        'product': 'product__name',
+        'status': 'status',
+        'amount': 'amount',
+        'date': 'created_at',
+    },
+    sort_fields=('id', 'created_at', 'amount'),
+    filters={
+        'status': ('status', str),
+        'product_id': ('product_id', int),
+        'amount_min': ('amount__gte', int),
+        'amount_max': ('amount__lte', int),
+    },
+)
+
+def list_response(request, listing, queryset):
+    # ?stream=ndjson|json - потоковая отдача всего результата, иначе страница с курсором в заголовке Link
+    params = request.query_params
+    try:
+        stream_format = listing.get_stream_format(params)
+        if stream_format:
+            return StreamingHttpResponse(
+                listing.stream(queryset, params, stream_format),
+                content_type=STREAM_CONTENT_TYPES[stream_format]
             )
-            
-            permission_map = {
-                'read': 'read_permission',
-                'read_all': 'read_all_permission',
-                'create': 'create_permission',
-                'update': 'update_permission',
-                'update_all': 'update_all_permission',
-                'delete': 'delete_permission',
-                'delete_all': 'delete_all_permission',
-            }
-            
-            return getattr(access_rule, permission_map.get(self.action, 'read_permission'), False)
-        except (BusinessElement.DoesNotExist, AccessRule.DoesNotExist):
-            return False
+        items, next_cursor = listing.page(queryset, params)
+    except InvalidListParams as exc:
+        return Response({'error': str(exc)}, status=400)
+    
+    response = Response(items)
+    if next_cursor:
+        response['Link'] = next_link(request, next_cursor)
+    return response
 
 class MockProductsView(APIView):
+    query_budget = {'get': QueryBudget(3)}
     def get(self, request):
         if not HasPermission('products', 'read').has_permission(request, self):
             return Response(
@@ -43,14 +110,11 @@ class MockProductsView(APIView):
                 status=403
             )
         
-        mock_products = [
-            {'id': 1, 'name': 'Product 1', 'price': 100},
-            {'id': 2, 'name': 'Product 2', 'price': 200},
-            {'id': 3, 'name': 'Product 3', 'price': 300},
-        ]
-        return Response(mock_products)
+        products = scope_queryset(Product.objects.all(), request.user, 'products', request=request)
+        return list_response(request, PRODUCT_LISTING, products)
 
 class MockOrdersView(APIView):
+    query_budget = {'get': QueryBudget(3)}
     def get(self, request):
         if not HasPermission('orders', 'read').has_permission(request, self):
             return Response(
@@ -58,8 +122,17 @@ class MockOrdersView(APIView):
                 status=403
             )
         
-        mock_orders = [
-            {'id': 1, 'product': 'Product 1', 'status': 'completed'},
-            {'id': 2, 'product': 'Product 2', 'status': 'pending'},
-        ]
-        return Response(mock_orders)
\ No newline at end of file
+        orders = scope_queryset(Order.objects.all(), request.user, 'orders', request=request)
+        return list_response(request, ORDER_LISTING, orders)
+
+class PermissionCheckView(APIView):
+    query_budget = {'post': QueryBudget(1)}
+    def post(self, request):
+        if not request.user.is_authenticated:
+            return Response({'error': 'Требуется авторизация'}, status=401)
+        
+        checks, error = validate_permission_checks(request.data)
+        if error:
+            return Response({'error': error}, status=400)
+        
+        return Response(permission_check_results(request.user, permissions.get_matrix(request), checks))
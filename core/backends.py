@@ -0,0 +1,17 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from core import db_routing
+
+UserModel = get_user_model()
+
+
+class RoleModelBackend(ModelBackend):
+    # Профиль и шаблоны читают user.role - без select_related это лишний запрос на каждую страницу
+    def get_user(self, user_id):
+        db_routing.check_pin(user_id)
+        try:
+            user = UserModel._default_manager.select_related('role').get(pk=user_id)
+        except UserModel.DoesNotExist:
+            return None
+        return user if self.user_can_authenticate(user) else None
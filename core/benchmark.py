@@ -0,0 +1,409 @@
+import importlib
+import itertools
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.db import close_old_connections, connection
+from django.test import Client
+from django.urls import clear_url_caches
+from django.test.utils import (
+    CaptureQueriesContext, override_settings, setup_databases, setup_test_environment, teardown_databases,
+    teardown_test_environment
+)
+from django.utils import timezone
+
+from core import hierarchy, permissions
+from core.api.views.auth_views import create_jwt_token
+from core.models import AccessRule, BusinessElement, Order, Product, Role, User
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+# /metrics без METRICS_TOKEN закрыт вне DEBUG, а тестовое окружение работает с DEBUG=False
+BENCHMARK_METRICS_TOKEN = 'benchmark-metrics'
+EMAIL_DOMAIN = 'bench.example.com'
+
+ALL_ACTIONS = tuple(permissions.PERMISSION_BITS)
+
+# Те же права, что в permissions.json
+BASE_RULES = {
+    'admin': {element: ALL_ACTIONS for element, _ in BusinessElement.ELEMENT_CHOICES},
+    'manager': {
+        'products': ('read', 'read_all', 'create', 'update', 'update_all'),
+        'orders': ('read', 'read_all', 'create', 'update', 'update_all'),
+    },
+    'user': {
+        'products': ('read',),
+        'orders': ('read',),
+    },
+}
+
+CATEGORIES = ('books', 'electronics', 'clothes', 'food', 'toys', 'garden')
+
+# Соединения до core.db_connections: новое на каждый запрос, журнал отката, synchronous=FULL,
+# ожидание блокировки - таймаут модуля sqlite3 по умолчанию
+LEGACY_CONNECTIONS = {
+    'CONN_MAX_AGE': 0,
+    'CONN_HEALTH_CHECKS': False,
+    'SQLITE_JOURNAL_MODE': 'DELETE',
+    'SQLITE_SYNCHRONOUS': 'FULL',
+    'SQLITE_BUSY_TIMEOUT': 5000,
+}
+
+
+@contextmanager
+def test_database(sqlite_file=None):
+    # Рабочая БД не трогается: все пишется во временную тестовую, как у manage.py test.
+    # sqlite_file - тестовая БД в файле вместо памяти (для WAL и параллельной записи)
+    test_settings = connection.settings_dict['TEST']
+    old_test_name = test_settings.get('NAME')
+    if sqlite_file and connection.vendor == 'sqlite':
+        test_settings['NAME'] = sqlite_file
+    setup_test_environment(debug=False)
+    try:
+        old_config = setup_databases(verbosity=0, interactive=False, aliases={'default'})
+        try:
+            with override_settings(METRICS_TOKEN=settings.METRICS_TOKEN or BENCHMARK_METRICS_TOKEN):
+                yield
+        finally:
+            teardown_databases(old_config, verbosity=0)
+    finally:
+        teardown_test_environment()
+        test_settings['NAME'] = old_test_name
+
+
+@contextmanager
+def url_set(async_api):
+    # Набор view в config.urls выбирается по ASYNC_API при импорте, поэтому модуль перезагружается
+    urlconf = importlib.import_module(settings.ROOT_URLCONF)
+    try:
+        with override_settings(ASYNC_API=async_api):
+            importlib.reload(urlconf)
+            clear_url_caches()
+            yield
+    finally:
+        importlib.reload(urlconf)
+        clear_url_caches()
+
+
+def current_connections():
+    return {
+        'CONN_MAX_AGE': connection.settings_dict['CONN_MAX_AGE'],
+        'CONN_HEALTH_CHECKS': connection.settings_dict['CONN_HEALTH_CHECKS'],
+        'SQLITE_JOURNAL_MODE': settings.SQLITE_JOURNAL_MODE,
+        'SQLITE_SYNCHRONOUS': settings.SQLITE_SYNCHRONOUS,
+        'SQLITE_BUSY_TIMEOUT': settings.SQLITE_BUSY_TIMEOUT,
+    }
+
+
+@contextmanager
+def connection_profile(profile):
+    # settings_dict общий для соединений всех потоков, SQLITE_* читаются при каждом подключении
+    database = connection.settings_dict
+    saved = {key: database[key] for key in ('CONN_MAX_AGE', 'CONN_HEALTH_CHECKS')}
+    connection.close()
+    database['CONN_MAX_AGE'] = profile['CONN_MAX_AGE']
+    database['CONN_HEALTH_CHECKS'] = profile['CONN_HEALTH_CHECKS']
+    try:
+        with override_settings(**{key: value for key, value in profile.items() if key.startswith('SQLITE_')}):
+            yield
+    finally:
+        connection.close()
+        database.update(saved)
+
+
+def build_dataset(users=200, products=2000, orders=2000, roles=3, seed=0):
+    """Синтетические роли, элементы, правила, пользователи, товары и заказы.
+
+    Все пользователи получают один хэш BENCHMARK_PASSWORD: хэшировать N паролей
+    долго, а вход все равно проверяет настоящий хэш.
+    """
+    rng = random.Random(seed)
+    now = timezone.now()
+
+    elements = {
+        name: BusinessElement.objects.get_or_create(name=name, defaults={'description': label})[0]
+        for name, label in BusinessElement.ELEMENT_CHOICES
+    }
+
+    role_rules = dict(BASE_RULES)
+    for n in range(roles):
+        role_rules[f'bench_role_{n}'] = {
+            element: tuple(action for action in ALL_ACTIONS if rng.random() < 0.5)
+            for element in elements
+        }
+    role_map = {name: Role.objects.get_or_create(name=name)[0] for name in role_rules}
+
+    AccessRule.objects.filter(role__in=role_map.values()).delete()
+    AccessRule.objects.bulk_create([
+        AccessRule(role=role_map[role_name], element=elements[element], permissions=permissions.actions_mask(actions))
+        for role_name, rules in role_rules.items()
+        for element, actions in rules.items()
+    ])
+    hierarchy.refresh_effective()
+
+    password_hash = make_password(BENCHMARK_PASSWORD)
+    admin = User.objects.create_user_with_hash(
+        f'admin@{EMAIL_DOMAIN}', password_hash, role=role_map['admin'],
+        is_staff=True, is_superuser=True, first_name='Bench', last_name='Admin'
+    )
+    user = User.objects.create_user_with_hash(
+        f'user@{EMAIL_DOMAIN}', password_hash, role=role_map['user'], first_name='Bench', last_name='User'
+    )
+
+    member_roles = [role for name, role in role_map.items() if name != 'admin']
+    User.objects.bulk_create([
+        User(
+            email=f'user{n}@{EMAIL_DOMAIN}',
+            password=password_hash,
+            first_name='Bench',
+            last_name=f'User{n}',
+            role=rng.choice(member_roles),
+        )
+        for n in range(users)
+    ], batch_size=1000)
+    owner_ids = list(
+        User.objects.filter(email__endswith=EMAIL_DOMAIN, is_superuser=False).values_list('id', flat=True)
+    )
+
+    Product.objects.bulk_create([
+        Product(
+            name=f'Товар {n}',
+            category=rng.choice(CATEGORIES),
+            price=rng.randint(1, 100000),
+            owner_id=rng.choice(owner_ids),
+            created_at=now - timezone.timedelta(seconds=rng.randint(0, 86400 * 365)),
+        )
+        for n in range(products)
+    ], batch_size=1000)
+    product_ids = list(Product.objects.values_list('id', flat=True))
+
+    if product_ids:
+        Order.objects.bulk_create([
+            Order(
+                product_id=rng.choice(product_ids),
+                owner_id=rng.choice(owner_ids),
+                status=rng.choice(Order.STATUS_CHOICES)[0],
+                amount=rng.randint(1, 100),
+                created_at=now - timezone.timedelta(seconds=rng.randint(0, 86400 * 365)),
+            )
+            for _ in range(orders)
+        ], batch_size=1000)
+
+    # bulk_create не шлет сигналы
+    permissions.bump_version()
+
+    return {
+        'admin': admin,
+        'user': user,
+        'password_hash': password_hash,
+        'rule_id': AccessRule.objects.get(role=role_map['manager'], element=elements['products']).id,
+        'victim_role': role_map['user'],
+        'sizes': {
+            'users': User.objects.count(),
+            'roles': len(role_map),
+            'elements': len(elements),
+            'rules': AccessRule.objects.count(),
+            'products': Product.objects.count(),
+            'orders': Order.objects.count(),
+        },
+    }
+
+
+class Scenario:
+    """Один маршрут из config/urls.py и способ к нему обратиться.
+
+    auth: None - аноним, 'user'/'admin' - один вход на клиента,
+    'once' - новый вход пользователя на каждый запрос (выход его тратит),
+    'victim' - новый пользователь на каждый запрос (удаление аккаунта).
+    session: вход через сессию (HTML и админка) вместо JWT.
+    writes: запрос пишет в БД; на SQLite такие маршруты гоняются в один поток.
+    """
+
+    def __init__(self, name, method, path, data=None, auth=None, session=False, writes=False, headers=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.auth = auth
+        self.session = session
+        self.writes = writes
+        self.headers = headers
+
+    def principal(self, dataset, index):
+        if self.auth == 'victim':
+            return User.objects.create_user_with_hash(
+                f'victim{index}@{EMAIL_DOMAIN}', dataset['password_hash'], role=dataset['victim_role']
+            )
+        return dataset['admin' if self.auth == 'admin' else 'user']
+
+    def login(self, client, user):
+        if self.session:
+            client.force_login(user)
+            return {}
+        return {'headers': {'Authorization': f'Bearer {create_jwt_token(user)}'}}
+
+    def client(self, dataset):
+        client = Client(raise_request_exception=False)
+        credentials = {'headers': self.headers()} if self.headers else {}
+        if self.auth in ('user', 'admin'):
+            credentials = self.login(client, self.principal(dataset, None))
+        return client, credentials
+
+    def prepare(self, client, dataset, index, credentials):
+        # Все, что не относится к измеряемому запросу, делается здесь
+        if self.auth in ('once', 'victim'):
+            credentials = self.login(client, self.principal(dataset, index))
+        kwargs = dict(credentials)
+        if self.data is not None:
+            data = self.data(dataset, index) if callable(self.data) else self.data
+            kwargs['data'] = data
+            if not self.session:
+                kwargs['content_type'] = 'application/json'
+        return kwargs
+
+    def send(self, client, dataset, kwargs):
+        return getattr(client, self.method)(self.path.format(**dataset), **kwargs)
+
+    def run(self, dataset, requests, concurrency):
+        counter = itertools.count()
+        samples = []
+        lock = threading.Lock()
+
+        def worker(client, credentials):
+            local = []
+            while True:
+                index = next(counter)
+                if index >= requests:
+                    break
+                kwargs = self.prepare(client, dataset, index, credentials)
+                with CaptureQueriesContext(connection) as queries:
+                    started = time.perf_counter()
+                    response = self.send(client, dataset, kwargs)
+                    # Как request_finished у настоящего сервера (test client его не шлет):
+                    # соединение закрывается, если CONN_MAX_AGE истек или оно неисправно
+                    close_old_connections()
+                    elapsed = time.perf_counter() - started
+                local.append((elapsed, len(queries), response.status_code))
+            connection.close()
+            with lock:
+                samples.extend(local)
+
+        # Test client не потокобезопасен - у каждого потока свой; входы делаются заранее и по очереди
+        clients = [self.client(dataset) for _ in range(concurrency)]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            for future in [pool.submit(worker, *args) for args in clients]:
+                future.result()
+        wall = time.perf_counter() - started
+
+        return summarize(self, samples, wall, concurrency)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize(scenario, samples, wall, concurrency):
+    latencies = [elapsed * 1000 for elapsed, _, _ in samples]
+    queries = [count for _, count, _ in samples]
+    statuses = {}
+    for _, _, status in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        'method': scenario.method.upper(),
+        'path': scenario.path,
+        'requests': len(samples),
+        'concurrency': concurrency,
+        'throughput_rps': round(len(samples) / wall, 2) if wall else None,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+            'max': round(max(latencies), 3),
+        },
+        'queries': {
+            'mean': round(sum(queries) / len(queries), 2),
+            'max': max(queries),
+        },
+        'status': dict(sorted(statuses.items())),
+    }
+
+
+def login_form(dataset, index):
+    return {'email': dataset['user'].email, 'password': BENCHMARK_PASSWORD}
+
+
+def register_form(prefix):
+    def build(dataset, index):
+        password = f'{BENCHMARK_PASSWORD}-{index}'
+        return {
+            'email': f'{prefix}{index}@{EMAIL_DOMAIN}',
+            'first_name': 'Bench',
+            'last_name': f'Registered{index}',
+            'password': password,
+            'password_confirm': password,
+        }
+    return build
+
+
+def profile_update(dataset, index):
+    return {'email': dataset['user'].email, 'first_name': 'Bench', 'last_name': f'User{index}'}
+
+
+def rule_toggle(dataset, index):
+    return {'delete_permission': bool(index % 2)}
+
+
+def rules_patch(dataset, index):
+    return [{'id': dataset['rule_id'], 'delete_permission': bool(index % 2)}]
+
+
+def permission_checks(dataset, index):
+    return {'checks': [{'element': element, 'action': action} for element in ('products', 'orders')
+                       for action in ('read', 'create', 'update', 'delete')]}
+
+
+def metrics_headers():
+    return {'Authorization': f'Bearer {settings.METRICS_TOKEN}'} if settings.METRICS_TOKEN else {}
+
+
+# Все маршруты config/urls.py; у маршрутов с несколькими методами - по сценарию на метод
+SCENARIOS = [
+    Scenario('root', 'get', '/'),
+    Scenario('home_page', 'get', '/home/'),
+    Scenario('simple_login', 'get', '/login/'),
+    Scenario('simple_login:post', 'post', '/login/', data=login_form, session=True, writes=True),
+    Scenario('simple_register', 'get', '/register/'),
+    Scenario('simple_register:post', 'post', '/register/', data=register_form('web'), session=True, writes=True),
+    Scenario('simple_profile', 'get', '/profile/', auth='user', session=True),
+    Scenario('simple_products', 'get', '/products/', auth='user', session=True),
+    Scenario('simple_orders', 'get', '/orders/', auth='user', session=True),
+    Scenario('simple_logout', 'get', '/logout/', auth='once', session=True, writes=True),
+    Scenario('api_home', 'get', '/api/'),
+    Scenario('api_login', 'post', '/api/login/', data=login_form),
+    Scenario('api_register', 'post', '/api/register/', data=register_form('api'), writes=True),
+    Scenario('api_logout', 'post', '/api/logout/', auth='once', writes=True),
+    Scenario('api_token_refresh', 'post', '/api/token/refresh/', auth='once', writes=True),
+    Scenario('api_profile', 'get', '/api/profile/', auth='user'),
+    Scenario('api_profile:put', 'put', '/api/profile/', data=profile_update, auth='user', writes=True),
+    Scenario('api_delete_account', 'post', '/api/delete-account/', auth='victim', writes=True),
+    Scenario('api_products', 'get', '/api/products/', auth='user'),
+    Scenario('api_orders', 'get', '/api/orders/', auth='user'),
+    Scenario('api_permissions_check', 'post', '/api/permissions/check', data=permission_checks, auth='user'),
+    Scenario('api_permissions_version', 'get', '/api/permissions/version'),
+    Scenario('api_access_rules_list', 'get', '/api/admin/access-rules/', auth='admin'),
+    Scenario('api_access_rules_list:patch', 'patch', '/api/admin/access-rules/', data=rules_patch,
+             auth='admin', writes=True),
+    Scenario('api_access_rules_update', 'put', '/api/admin/access-rules/{rule_id}/', data=rule_toggle,
+             auth='admin', writes=True),
+    Scenario('metrics', 'get', '/metrics', headers=metrics_headers),
+    Scenario('admin', 'get', '/admin/', auth='admin', session=True),
+]
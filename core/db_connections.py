@@ -0,0 +1,32 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+JOURNAL_MODES = ('DELETE', 'TRUNCATE', 'PERSIST', 'MEMORY', 'WAL', 'OFF')
+SYNCHRONOUS_MODES = ('OFF', 'NORMAL', 'FULL', 'EXTRA')
+
+
+def sqlite_pragmas():
+    """PRAGMA для нового соединения SQLite из SQLITE_* настроек; пустое значение - не менять."""
+    journal_mode = settings.SQLITE_JOURNAL_MODE.upper()
+    synchronous = settings.SQLITE_SYNCHRONOUS.upper()
+    if journal_mode and journal_mode not in JOURNAL_MODES:
+        raise ImproperlyConfigured(f'SQLITE_JOURNAL_MODE: ожидается одно из {", ".join(JOURNAL_MODES)}')
+    if synchronous and synchronous not in SYNCHRONOUS_MODES:
+        raise ImproperlyConfigured(f'SQLITE_SYNCHRONOUS: ожидается одно из {", ".join(SYNCHRONOUS_MODES)}')
+
+    pragmas = []
+    # busy_timeout первым: смена журнала сама ждет блокировку файла
+    if settings.SQLITE_BUSY_TIMEOUT is not None:
+        pragmas.append(f'PRAGMA busy_timeout = {int(settings.SQLITE_BUSY_TIMEOUT)}')
+    if journal_mode:
+        pragmas.append(f'PRAGMA journal_mode = {journal_mode}')
+    if synchronous:
+        pragmas.append(f'PRAGMA synchronous = {synchronous}')
+    return pragmas
+
+
+def configure_connection(connection):
+    # Выполняется на DB-API соединении в обход оберток: в счетчики SQL-запросов PRAGMA не попадают
+    if connection.vendor == 'sqlite':
+        for pragma in sqlite_pragmas():
+            connection.connection.execute(pragma)
@@ -0,0 +1,199 @@
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, close_old_connections, connections
+
+logger = logging.getLogger(__name__)
+
+PRIMARY = 'default'
+PIN_CACHE_KEY = 'core:db:pin:{}'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = ContextVar('db_routing_state', default=None)
+
+
+class RoutingState:
+    """Маршрутизация одного запроса: реплика выбирается один раз, после записи - только primary."""
+
+    def __init__(self):
+        self.replica = None
+        self.pinned = False
+        self.wrote = False
+
+
+def replicas():
+    return settings.DATABASE_REPLICAS
+
+
+def start(request):
+    # Без реплик состояния нет и роутер все отправляет в primary
+    if not replicas():
+        return None
+    state = RoutingState()
+    if request.method in SAFE_METHODS and request.path.startswith(tuple(settings.DATABASE_REPLICA_PATHS)):
+        healthy = [alias for alias in replicas() if replica_lag.healthy(alias)]
+        if healthy:
+            state.replica = random.choice(healthy)
+    return _state.set(state)
+
+
+def finish(token):
+    if token is None:
+        return None
+    state = _state.get()
+    _state.reset(token)
+    return state
+
+
+def pin_user(user_id):
+    """Чтения пользователя идут в primary DATABASE_PIN_SECONDS секунд: он увидит свою запись."""
+    if replicas() and user_id is not None and settings.DATABASE_PIN_SECONDS:
+        cache.set(PIN_CACHE_KEY.format(user_id), 1, timeout=settings.DATABASE_PIN_SECONDS)
+
+
+async def apin_user(user_id):
+    if replicas() and user_id is not None and settings.DATABASE_PIN_SECONDS:
+        await cache.aset(PIN_CACHE_KEY.format(user_id), 1, timeout=settings.DATABASE_PIN_SECONDS)
+
+
+def check_pin(user_id):
+    # Вызывается до загрузки пользователя (JWT middleware, RoleModelBackend)
+    state = _state.get()
+    if state is not None and state.replica and user_id is not None and cache.get(PIN_CACHE_KEY.format(user_id)):
+        state.pinned = True
+
+
+async def acheck_pin(user_id):
+    state = _state.get()
+    if state is not None and state.replica and user_id is not None and await cache.aget(PIN_CACHE_KEY.format(user_id)):
+        state.pinned = True
+
+
+def pin_if_recent(versions):
+    """Закрепляет запрос за primary, если одна из версий (time_ns штампа в общем кэше) моложе
+    DATABASE_REPLICA_MAX_LAG: реплика могла еще не получить изменение, которое ее сменило,
+    и данные, сохраненные под новой версией, были бы старыми до следующей смены.
+    """
+    state = _state.get()
+    if state is None or not state.replica or state.pinned:
+        return
+    max_lag = settings.DATABASE_REPLICA_MAX_LAG
+    # Без лимита отставания возраст версии ничего не гарантирует
+    if not max_lag or max(versions, default=0) > time.time_ns() - max_lag * 1e9:
+        state.pinned = True
+
+
+class ReplicaLag:
+    """Отставание реплик по штампам ReplicaHeartbeat.
+
+    У каждой реплики своя строка штампа в primary. Пока реплика не увидела последний
+    штамп, она отстает минимум на время с его записи; когда увидела - пишется новый.
+    Замеряет фоновый поток процесса раз в DATABASE_REPLICA_LAG_CHECK_INTERVAL, запрос
+    только читает последний замер: в нем нет ни запросов к БД, ни записи штампа, и
+    он не блокирует event loop под ASGI. Реплика с отставанием больше
+    DATABASE_REPLICA_MAX_LAG, с ошибкой или без свежего замера считается нездоровой.
+    """
+
+    # Замер старше стольких интервалов проверки считается устаревшим (поток завис на БД)
+    STALE_CHECKS = 3
+
+    def __init__(self):
+        self.lag = {}
+        self._measured_at = {}
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def measure(self, alias):
+        from core.models import ReplicaHeartbeat
+        stamp = ReplicaHeartbeat.objects.filter(alias=alias).values_list('stamp', flat=True)
+        primary_stamp = stamp.using(PRIMARY).first() or 0
+        replica_stamp = stamp.using(alias).first() or 0
+        now = time.time()
+        if replica_stamp < primary_stamp:
+            return max(0.0, now - primary_stamp / 1000)
+        ReplicaHeartbeat.objects.using(PRIMARY).update_or_create(alias=alias, defaults={'stamp': int(now * 1000)})
+        return 0.0
+
+    def check(self):
+        for alias in replicas():
+            try:
+                lag = self.measure(alias)
+            except DatabaseError:
+                lag = float('inf')
+            self.lag[alias] = lag
+            self._measured_at[alias] = time.monotonic()
+        # Соединения потока живут по тем же правилам CONN_MAX_AGE, что и у запросов
+        close_old_connections()
+
+    def run(self):
+        while True:
+            try:
+                self.check()
+            except Exception:
+                # Поток не должен умереть: без замеров реплики станут нездоровыми по STALE_CHECKS
+                logger.exception('Ошибка замера отставания реплик')
+            time.sleep(settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL)
+
+    def ensure_started(self):
+        # Поток по одному на процесс; после fork его нет и он запускается заново
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self.run, name='replica-lag', daemon=True)
+                self._thread.start()
+
+    def healthy(self, alias):
+        max_lag = settings.DATABASE_REPLICA_MAX_LAG
+        if not max_lag:
+            return True
+        self.ensure_started()
+        measured_at = self._measured_at.get(alias)
+        stale_after = settings.DATABASE_REPLICA_LAG_CHECK_INTERVAL * self.STALE_CHECKS
+        if measured_at is None or time.monotonic() - measured_at > stale_after:
+            return False
+        return self.lag.get(alias, float('inf')) <= max_lag
+
+
+replica_lag = ReplicaLag()
+
+
+class PrimaryReplicaRouter:
+    """Чтения безопасных запросов - с реплики из DATABASE_REPLICAS, все остальное - primary.
+
+    Запрос закрепляется за primary после первой записи, внутри транзакции
+    и если его пользователь недавно писал (pin_user).
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.replica or state.pinned:
+            return PRIMARY
+        if connections[PRIMARY].in_atomic_block:
+            return PRIMARY
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+            state.wrote = True
+        return PRIMARY
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики - копии primary, связи между объектами из них допустимы
+        databases = {PRIMARY, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Реплики получают схему репликацией
+        if db in replicas():
+            return False
+        return None
@@ -0,0 +1,93 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth import hashers
+
+from core.instrumentation import timed
+
+
+POOL_SATURATED_ERROR = 'Сервер перегружен, повторите попытку позже'
+
+
+class HashingPoolSaturated(Exception):
+    pass
+
+
+class HashingExecutor:
+    """Ограниченный пул потоков для PBKDF2.
+
+    hashlib отпускает GIL на время вычисления, поэтому хватает потоков.
+    Если заняты все воркеры и очередь, задача отклоняется сразу, а не ждет.
+    """
+
+    def __init__(self, max_workers, queue_depth, timeout):
+        self.max_workers = max_workers
+        self.queue_depth = queue_depth
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(max_workers + queue_depth)
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='password-hashing')
+
+    def submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HashingPoolSaturated()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    async def arun(self, fn, *args):
+        # В Server-Timing hash входит и ожидание в очереди пула
+        with timed('hash'):
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(self.submit(fn, *args)), self.timeout)
+            except asyncio.TimeoutError:
+                raise HashingPoolSaturated()
+
+    def run(self, fn, *args):
+        with timed('hash'):
+            try:
+                return self.submit(fn, *args).result(timeout=self.timeout)
+            except TimeoutError:
+                raise HashingPoolSaturated()
+
+
+executor = HashingExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS or os.cpu_count() or 1,
+    queue_depth=settings.PASSWORD_HASHING_QUEUE_DEPTH,
+    timeout=settings.PASSWORD_HASHING_TIMEOUT,
+)
+
+
+def _verify(raw_password, encoded):
+    # В пуле только вычисления: обновленный хэш сохраняет поток запроса
+    upgraded = []
+    valid = hashers.check_password(
+        raw_password, encoded, setter=lambda raw: upgraded.append(hashers.make_password(raw))
+    )
+    return valid, upgraded[0] if upgraded else None
+
+
+def check_password(user, raw_password):
+    valid, upgraded = executor.run(_verify, raw_password, user.password)
+    if valid and upgraded:
+        user.password = upgraded
+        user.save(update_fields=['password'])
+    return valid
+
+
+def make_password(raw_password):
+    return executor.run(hashers.make_password, raw_password)
+
+
+async def acheck_password(user, raw_password):
+    valid, upgraded = await executor.arun(_verify, raw_password, user.password)
+    if valid and upgraded:
+        user.password = upgraded
+        await user.asave(update_fields=['password'])
+    return valid
@@ -0,0 +1,128 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+
+from core.models import AccessRule, EffectivePermission, Role
+
+RoleParents = Role.parents.through
+
+_deferred = ContextVar('effective_refresh_deferred', default=False)
+
+
+class RoleCycleError(ValueError):
+    pass
+
+
+def load_edges():
+    """Ребра иерархии одним запросом: (родители роли, дети роли)."""
+    parents = defaultdict(set)
+    children = defaultdict(set)
+    for child_id, parent_id in RoleParents.objects.values_list('from_role_id', 'to_role_id'):
+        parents[child_id].add(parent_id)
+        children[parent_id].add(child_id)
+    return parents, children
+
+
+def reachable(start_ids, edges):
+    # Все роли, достижимые из start_ids по edges, включая сами start_ids
+    seen = set(start_ids)
+    stack = list(start_ids)
+    while stack:
+        for next_id in edges.get(stack.pop(), ()):
+            if next_id not in seen:
+                seen.add(next_id)
+                stack.append(next_id)
+    return seen
+
+
+def creates_cycle(role_id, parent_ids, children=None):
+    """Станет ли иерархия циклической, если дать роли role_id родителей parent_ids."""
+    if children is None:
+        _, children = load_edges()
+    return bool(reachable({role_id}, children) & set(parent_ids))
+
+
+@contextmanager
+def deferred_refresh():
+    """Для пакетных изменений: внутри блока пересчет отключен, после него - один полный."""
+    token = _deferred.set(True)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+    refresh_effective()
+
+
+def refresh_effective(role_ids=None, element_ids=None):
+    """Пересчитывает EffectivePermission для ролей role_ids и всех их потомков.
+
+    Правило роли влияет только на ее потомков и только на свой элемент, поэтому
+    при изменении правила достаточно передать его роль и элемент, при изменении
+    родителей роли - только роль. None - все роли (все элементы).
+    Записываются только отличия, вызывать внутри транзакции изменения. Строки
+    затронутых ролей блокируются (select_for_update), так что параллельные
+    пересчеты одних и тех же ролей выполняются по очереди.
+    """
+    if _deferred.get():
+        return
+    parents, children = load_edges()
+    if role_ids is None:
+        affected = set(Role.objects.values_list('id', flat=True))
+    else:
+        affected = reachable(set(role_ids), children)
+    if not affected:
+        return
+
+    with transaction.atomic():
+        # Порядок блокировок один для всех пересчетов - без взаимных блокировок
+        list(Role.objects.select_for_update().filter(id__in=affected).order_by('id').values_list('id', flat=True))
+        _write_effective(affected, parents, element_ids)
+
+
+def _write_effective(affected, parents, element_ids):
+    ancestors = {role_id: reachable({role_id}, parents) for role_id in affected}
+    sources = set().union(*ancestors.values())
+
+    rules = AccessRule.objects.filter(role_id__in=sources)
+    effective = EffectivePermission.objects.filter(role_id__in=affected)
+    if element_ids is not None:
+        rules = rules.filter(element_id__in=element_ids)
+        effective = effective.filter(element_id__in=element_ids)
+
+    own = defaultdict(dict)
+    for role_id, element_id, mask in rules.values_list('role_id', 'element_id', 'permissions'):
+        own[role_id][element_id] = mask
+
+    wanted = {}
+    for role_id in affected:
+        for source_id in ancestors[role_id]:
+            for element_id, mask in own[source_id].items():
+                key = (role_id, element_id)
+                wanted[key] = wanted.get(key, 0) | mask
+
+    current = {
+        (role_id, element_id): (pk, mask)
+        for pk, role_id, element_id, mask in effective.values_list('id', 'role_id', 'element_id', 'mask')
+    }
+    stale = [pk for key, (pk, mask) in current.items() if not wanted.get(key)]
+    changed = [
+        EffectivePermission(id=current[key][0], mask=mask)
+        for key, mask in wanted.items() if key in current and mask and current[key][1] != mask
+    ]
+    created = [
+        EffectivePermission(role_id=role_id, element_id=element_id, mask=mask)
+        for (role_id, element_id), mask in wanted.items() if mask and (role_id, element_id) not in current
+    ]
+
+    if stale:
+        EffectivePermission.objects.filter(id__in=stale).delete()
+    if changed:
+        EffectivePermission.objects.bulk_update(changed, ['mask'], batch_size=1000)
+    if created:
+        # Строку мог вставить пересчет, не видевший блокировки (SQLite ее не поддерживает)
+        EffectivePermission.objects.bulk_create(
+            created, batch_size=1000,
+            update_conflicts=True, unique_fields=['role', 'element'], update_fields=['mask'],
+        )
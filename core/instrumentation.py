@@ -0,0 +1,241 @@
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.template.backends.django import DjangoTemplates, Template
+
+# Границы корзин гистограмм, секунды
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Остальные методы пишутся в метрики как OTHER: метка не растет от произвольных глаголов
+METHODS = frozenset(('GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'))
+
+_current = ContextVar('request_timings', default=None)
+
+
+class RequestTimings:
+    """Время по фазам одного запроса: middleware, view, db, tpl, hash.
+
+    Для middleware считается собственное время без вложенных обработчиков,
+    db/tpl/hash входят во время view (и middleware, из которого вызваны).
+    """
+
+    def __init__(self):
+        self.phases = {}
+        self._children = [0.0]
+
+    def add(self, name, seconds, count=1):
+        phase = self.phases.get(name)
+        if phase is None:
+            self.phases[name] = [seconds, count]
+        else:
+            phase[0] += seconds
+            phase[1] += count
+
+    def enter(self):
+        self._children.append(0.0)
+
+    def leave(self, name, elapsed):
+        nested = self._children.pop()
+        self._children[-1] += elapsed
+        self.add(name, elapsed - nested)
+
+    def server_timing(self, total):
+        parts = []
+        for name, (seconds, count) in self.phases.items():
+            part = f'{name};dur={seconds * 1000:.3f}'
+            if name == 'db':
+                part += f';desc="{count} queries"'
+            parts.append(part)
+        parts.append(f'total;dur={total * 1000:.3f}')
+        return ', '.join(parts)
+
+
+def method_label(method):
+    return method if method in METHODS else 'OTHER'
+
+
+def current():
+    return _current.get()
+
+
+def start():
+    timings = RequestTimings()
+    return timings, _current.set(timings)
+
+
+def finish(token):
+    _current.reset(token)
+
+
+@contextmanager
+def timed(name):
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+
+def sql_timer(execute, sql, params, many, context):
+    # Ставится на каждое соединение (core.signals), вне запроса ничего не делает
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add('db', time.perf_counter() - started)
+
+
+class TimedHandler:
+    """Обертка звена цепочки middleware: пишет его собственное время под именем name."""
+
+    def __init__(self, handler, name, is_async):
+        self.handler = handler
+        self.name = name
+        if is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timings = _current.get()
+        if timings is None:
+            return self.handler(request)
+        timings.enter()
+        started = time.perf_counter()
+        try:
+            return self.handler(request)
+        finally:
+            timings.leave(self.name, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings = _current.get()
+        if timings is None:
+            return await self.handler(request)
+        timings.enter()
+        started = time.perf_counter()
+        try:
+            return await self.handler(request)
+        finally:
+            timings.leave(self.name, time.perf_counter() - started)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        with timed('tpl'):
+            return super().render(context, request)
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates, который пишет время рендеринга в фазу tpl."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code).template, self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(BUCKETS, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return '{' + ','.join(f'{key}="{escape_label(value)}"' for key, value in values.items()) + '}'
+
+
+class MetricsRegistry:
+    """Агрегаты по маршрутам для /metrics в текстовом формате Prometheus.
+
+    Метрики хранятся в процессе: при нескольких воркерах каждый отдает свои,
+    Prometheus собирает их по отдельности (или через sidecar/pushgateway).
+    Метки - шаблон маршрута из URLconf, поэтому число рядов ограничено.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.durations = {}
+        self.requests = {}
+        self.phases = {}
+        self.phase_calls = {}
+
+    def observe(self, route, method, status, seconds, timings):
+        with self._lock:
+            histogram = self.durations.get((route, method))
+            if histogram is None:
+                histogram = self.durations[(route, method)] = Histogram()
+            histogram.observe(seconds)
+            key = (route, method, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+            for name, (phase_seconds, count) in timings.phases.items():
+                key = (route, name)
+                histogram = self.phases.get(key)
+                if histogram is None:
+                    histogram = self.phases[key] = Histogram()
+                # В гистограмму фазы пишется время за запрос, число вызовов (запросов к БД) - отдельно
+                histogram.observe(phase_seconds)
+                self.phase_calls[key] = self.phase_calls.get(key, 0) + count
+
+    def render(self):
+        with self._lock:
+            lines = [
+                '# HELP http_request_duration_seconds Время обработки запроса.',
+                '# TYPE http_request_duration_seconds histogram',
+            ]
+            for (route, method), histogram in sorted(self.durations.items()):
+                lines.extend(self._histogram('http_request_duration_seconds', histogram, route=route, method=method))
+
+            lines += [
+                '# HELP http_requests_total Число запросов.',
+                '# TYPE http_requests_total counter',
+            ]
+            for (route, method, status), count in sorted(self.requests.items()):
+                lines.append(f'http_requests_total{labels(route=route, method=method, status=status)} {count}')
+
+            lines += [
+                '# HELP http_request_phase_seconds Время фазы запроса: mw.*, view, db, tpl, hash.',
+                '# TYPE http_request_phase_seconds histogram',
+            ]
+            for (route, phase), histogram in sorted(self.phases.items()):
+                lines.extend(self._histogram('http_request_phase_seconds', histogram, route=route, phase=phase))
+
+            lines += [
+                '# HELP http_request_phase_calls_total Число вызовов фазы (для db - число SQL-запросов).',
+                '# TYPE http_request_phase_calls_total counter',
+            ]
+            for (route, phase), count in sorted(self.phase_calls.items()):
+                lines.append(f'http_request_phase_calls_total{labels(route=route, phase=phase)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def _histogram(self, name, histogram, **label_values):
+        cumulative = 0
+        for bound, count in zip(BUCKETS + ('+Inf',), histogram.counts):
+            cumulative += count
+            yield f'{name}_bucket{labels(**label_values, le=bound)} {cumulative}'
+        yield f'{name}_sum{labels(**label_values)} {histogram.sum}'
+        yield f'{name}_count{labels(**label_values)} {histogram.count}'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,86 @@
+import json
+import sys
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.benchmark import SCENARIOS, build_dataset, test_database
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочный прогон всех маршрутов config/urls.py через test client: пропускная способность, '
+        'p50/p95/p99 и число SQL-запросов на запрос. Данные создаются во временной тестовой БД.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--orders', type=int, default=2000)
+        parser.add_argument('--roles', type=int, default=3, help='дополнительных ролей со случайными правами')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=100, help='запросов на маршрут')
+        parser.add_argument('--concurrency', type=int, default=8, help='одновременных клиентов')
+        parser.add_argument('--route', action='append', dest='routes', help='только указанные сценарии')
+        parser.add_argument('--keep-login-throttle', action='store_true',
+                            help='не отключать LOGIN_THROTTLE_RATES (иначе вход упрется в 429)')
+        parser.add_argument('--output', default='-', help='файл для JSON с результатами, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        scenarios = SCENARIOS
+        if options['routes']:
+            known = {scenario.name for scenario in SCENARIOS}
+            unknown = set(options['routes']) - known
+            if unknown:
+                raise CommandError(f'Неизвестные сценарии: {", ".join(sorted(unknown))}')
+            scenarios = [scenario for scenario in SCENARIOS if scenario.name in options['routes']]
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+
+        throttle_rates = settings.LOGIN_THROTTLE_RATES if options['keep_login_throttle'] else {}
+        with test_database(), override_settings(LOGIN_THROTTLE_RATES=throttle_rates):
+            dataset = build_dataset(
+                users=options['users'],
+                products=options['products'],
+                orders=options['orders'],
+                roles=options['roles'],
+                seed=options['seed'],
+            )
+            results = {}
+            for scenario in scenarios:
+                # SQLite не переносит параллельную запись (database is locked)
+                concurrency = options['concurrency']
+                if scenario.writes and connection.vendor == 'sqlite':
+                    concurrency = 1
+                results[scenario.name] = scenario.run(dataset, options['requests'], concurrency)
+                self.stderr.write(
+                    f'{scenario.name}: {results[scenario.name]["throughput_rps"]} rps, '
+                    f'p95 {results[scenario.name]["latency_ms"]["p95"]} ms'
+                )
+            report = {
+                'meta': {
+                    'generated_at': timezone.now().isoformat(),
+                    'django': django.get_version(),
+                    'python': sys.version.split()[0],
+                    'database': connection.vendor,
+                    'async_api': settings.ASYNC_API,
+                    'login_throttle': bool(throttle_rates),
+                    'requests': options['requests'],
+                    'concurrency': options['concurrency'],
+                    'seed': options['seed'],
+                    'dataset': dataset['sizes'],
+                },
+                'routes': results,
+            }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                target.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
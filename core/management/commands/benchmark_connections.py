@@ -0,0 +1,86 @@
+import json
+import os
+import sys
+import tempfile
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from core.benchmark import (
+    LEGACY_CONNECTIONS, SCENARIOS, build_dataset, connection_profile, current_connections, test_database
+)
+
+ROUTES = ('api_login', 'api_register')
+
+
+class Command(BaseCommand):
+    help = (
+        'Параллельные вход и регистрация до и после настройки соединений: новое соединение на запрос '
+        'и журнал отката SQLite против CONN_MAX_AGE, health checks и WAL из текущих настроек. '
+        'На SQLite тестовая БД создается в файле, запись идет параллельно.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200, help='запросов на маршрут')
+        parser.add_argument('--concurrency', type=int, default=8, help='одновременных клиентов')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--sqlite-file', default=os.path.join(tempfile.gettempdir(), 'auth_system_bench.sqlite3'),
+                            help='файл тестовой БД SQLite')
+        parser.add_argument('--fast-hashing', action='store_true',
+                            help='MD5 вместо PBKDF2, чтобы в замере осталась в основном работа с БД')
+        parser.add_argument('--output', default='-', help='файл для JSON с результатами, по умолчанию stdout')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name in ROUTES]
+        overrides = {'LOGIN_THROTTLE_RATES': {}}
+        if options['fast_hashing']:
+            overrides['PASSWORD_HASHERS'] = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+        profiles = {'before': LEGACY_CONNECTIONS, 'after': current_connections()}
+        results = {}
+        with override_settings(**overrides):
+            for name, profile in profiles.items():
+                results[name] = {}
+                with connection_profile(profile), test_database(sqlite_file=options['sqlite_file']):
+                    dataset = build_dataset(users=options['users'], products=0, orders=0, seed=options['seed'])
+                    for scenario in scenarios:
+                        result = scenario.run(dataset, options['requests'], options['concurrency'])
+                        results[name][scenario.name] = result
+                        self.stderr.write(
+                            f'{name} {scenario.name}: {result["throughput_rps"]} rps, '
+                            f'p95 {result["latency_ms"]["p95"]} ms, статусы {result["status"]}'
+                        )
+
+        speedup = {
+            route: round(results['after'][route]['throughput_rps'] / results['before'][route]['throughput_rps'], 2)
+            for route in ROUTES if results['before'][route]['throughput_rps']
+        }
+        report = {
+            'meta': {
+                'generated_at': timezone.now().isoformat(),
+                'django': django.get_version(),
+                'python': sys.version.split()[0],
+                'database': connection.vendor,
+                'requests': options['requests'],
+                'concurrency': options['concurrency'],
+                'fast_hashing': options['fast_hashing'],
+                'profiles': profiles,
+            },
+            'routes': results,
+            'speedup': speedup,
+        }
+
+        output = json.dumps(report, indent=2, ensure_ascii=False, sort_keys=True, default=str)
+        if options['output'] == '-':
+            self.stdout.write(output)
+        else:
+            with open(options['output'], 'w', encoding='utf-8') as target:
+                target.write(output + '\n')
+            self.stdout.write(self.style.SUCCESS(f'Результаты записаны в {options["output"]}'))
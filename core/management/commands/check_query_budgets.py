@@ -0,0 +1,110 @@
+import traceback
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import resolve
+
+from core import benchmark
+from core.benchmark import SCENARIOS, build_dataset, test_database, url_set
+from core.query_budget import QueryRecorder, get_budget
+
+
+class Command(BaseCommand):
+    help = (
+        'Проверка бюджетов SQL-запросов (query_budget) у view из core/api/views и core/web/views '
+        'для обоих наборов URL: синхронного и ASGI (ASYNC_API). '
+        'Каждый маршрут вызывается несколько раз, берется худший вызов; при превышении бюджета '
+        'команда завершается с ошибкой и печатает N+1 со стеками вызовов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=3, help='вызовов на маршрут (первый - с холодным кэшем)')
+        parser.add_argument('--route', action='append', dest='routes', help='только указанные сценарии')
+        parser.add_argument('--report', help='файл для отчета об N+1, по умолчанию stdout')
+        parser.add_argument('--url-set', action='append', dest='url_sets', choices=['sync', 'async'],
+                            help='только указанный набор URL, по умолчанию оба')
+        parser.add_argument('--users', type=int, default=20)
+        parser.add_argument('--products', type=int, default=200)
+        parser.add_argument('--orders', type=int, default=200)
+
+    def handle(self, *args, **options):
+        scenarios = [
+            scenario for scenario in SCENARIOS
+            if not options['routes'] or scenario.name in options['routes']
+        ]
+
+        with test_database():
+            dataset = build_dataset(users=options['users'], products=options['products'], orders=options['orders'])
+            failures, report, checked = self.check_budgets(
+                scenarios, dataset, options['repeat'], options['url_sets'] or ['sync', 'async']
+            )
+
+        self.write_report(report, options['report'])
+        if failures:
+            raise CommandError('Превышены бюджеты запросов:\n' + '\n'.join(failures))
+        self.stdout.write(self.style.SUCCESS(f'Бюджеты запросов соблюдены ({len(checked)} проверок view)'))
+
+    def check_budgets(self, scenarios, dataset, repeat, url_sets):
+        # БД с dataset готовит вызывающий: команда - временную тестовую, core.tests - свою
+        failures = []
+        report = []
+        checked = set()
+        for name in url_sets:
+            with url_set(async_api=name == 'async'):
+                for scenario in scenarios:
+                    self.check_scenario(scenario, dataset, repeat, checked, failures, report)
+        return failures, report, checked
+
+    def check_scenario(self, scenario, dataset, repeat, checked, failures, report):
+        view_class = getattr(resolve(scenario.path.format(**dataset)).func, 'view_class', None)
+        if view_class is None or not view_class.__module__.startswith('core.'):
+            # Редирект с корня и админка Django - не наши view
+            return
+        if (view_class, scenario.name) in checked:
+            # Синхронная view, общая для обоих наборов URL, уже проверена
+            return
+        checked.add((view_class, scenario.name))
+
+        recorder = self.worst_call(scenario, dataset, repeat)
+        label = f'{scenario.name} ({view_class.__name__}.{scenario.method})'
+        summary = f'{len(recorder)} запросов, {recorder.duplicate_count()} дубликатов'
+        budget = get_budget(view_class, scenario.method)
+        if budget is None:
+            failures.append(f'{label}: бюджет не объявлен ({summary})')
+        else:
+            errors = recorder.check(budget)
+            if errors:
+                failures.append(f'{label}: {"; ".join(errors)}')
+            self.stderr.write(f'{label}: {summary}, бюджет {budget.max_queries}/{budget.max_duplicates}')
+
+        if recorder.duplicates():
+            report.append(self.format_duplicates(label, recorder))
+
+    def worst_call(self, scenario, dataset, repeat):
+        client, credentials = scenario.client(dataset)
+        worst = None
+        for index in range(repeat):
+            kwargs = scenario.prepare(client, dataset, index, credentials)
+            recorder = QueryRecorder(skip_files=[benchmark.__file__])
+            with connection.execute_wrapper(recorder):
+                scenario.send(client, dataset, kwargs)
+            if worst is None or (len(recorder), recorder.duplicate_count()) > (len(worst), worst.duplicate_count()):
+                worst = recorder
+        return worst
+
+    def format_duplicates(self, label, recorder):
+        lines = [f'N+1: {label}']
+        for sql, count in sorted(recorder.duplicates().items(), key=lambda item: -item[1]):
+            lines.append(f'  {count}x {sql}')
+            for stack in recorder.stacks(sql):
+                lines.extend('    ' + line for line in ''.join(traceback.format_list(stack)).splitlines())
+                lines.append('')
+        return '\n'.join(lines)
+
+    def write_report(self, report, path):
+        text = '\n\n'.join(report) if report else 'N+1 не найдено'
+        if path:
+            with open(path, 'w', encoding='utf-8') as target:
+                target.write(text + '\n')
+        else:
+            self.stdout.write(text)
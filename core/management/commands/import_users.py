@@ -0,0 +1,126 @@
+import csv
+import json
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from core.models import Role, User
+from core.registration import DEFAULT_ROLE_NAME
+
+USER_FIELDS = ('first_name', 'last_name', 'patronymic')
+
+
+class Command(BaseCommand):
+    help = (
+        'Импорт пользователей из CSV или NDJSON: файл читается потоково, пароли хэшируются '
+        'параллельно, пользователи создаются через bulk_create порциями.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV с заголовком или NDJSON (по строке JSON на пользователя)')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='по умолчанию - по расширению файла')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=8, help='потоков для хэширования паролей')
+        parser.add_argument('--role', default=DEFAULT_ROLE_NAME, help='роль, если в строке не указана своя')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or ('csv' if path.endswith('.csv') else 'ndjson')
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError('--chunk-size должен быть положительным')
+
+        self.roles = {role.name: role.id for role in Role.objects.all()}
+        if options['role'] not in self.roles:
+            raise CommandError(f'Роль {options["role"]} не найдена')
+        self.default_role_id = self.roles[options['role']]
+
+        inserted = existing = skipped = 0
+        with open(path, newline='', encoding='utf-8') as source, \
+                ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            rows = self.read_rows(source, file_format)
+            while True:
+                chunk = list(islice(rows, chunk_size))
+                if not chunk:
+                    break
+                users, invalid, known = self.build_users(chunk, executor)
+                skipped += invalid
+                existing += known
+                emails = [user.email for user in users]
+                with transaction.atomic():
+                    # Email, появившиеся после проверки, пропускаются уникальным индексом
+                    before = User.objects.filter(email__in=emails).count()
+                    User.objects.bulk_create(users, batch_size=chunk_size, ignore_conflicts=True)
+                    added = User.objects.filter(email__in=emails).count() - before
+                inserted += added
+                existing += len(users) - added
+                self.stdout.write(f'Добавлено: {inserted}, уже были: {existing}, пропущено: {skipped}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Импорт завершен: добавлено {inserted}, уже были {existing}, пропущено {skipped}'
+        ))
+
+    def read_rows(self, source, file_format):
+        if file_format == 'csv':
+            yield from csv.DictReader(source)
+            return
+        for line_number, line in enumerate(source, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except ValueError:
+                self.stderr.write(f'Строка {line_number}: некорректный JSON')
+                yield None
+
+    def build_users(self, chunk, executor):
+        valid = []
+        invalid = 0
+        for row in chunk:
+            error = self.validate(row)
+            if error:
+                invalid += 1
+                if row is not None:
+                    self.stderr.write(f'{row.get("email") or "?"}: {error}')
+                continue
+            valid.append(row)
+
+        # Уже существующих пользователей не хэшируем; повтор email внутри порции - тоже
+        emails = {}
+        for row in valid:
+            emails.setdefault(User.objects.normalize_email(row['email']), row)
+        taken = set(User.objects.filter(email__in=list(emails)).values_list('email', flat=True))
+        valid = [row for email, row in emails.items() if email not in taken]
+        known = len(chunk) - invalid - len(valid)
+
+        # Готовые хэши (password_hash) переносятся как есть, остальные считаются в пуле
+        passwords = [row.get('password_hash') or row.get('password') for row in valid]
+        to_hash = [i for i, row in enumerate(valid) if not row.get('password_hash')]
+        for i, hashed in zip(to_hash, executor.map(make_password, [passwords[i] for i in to_hash])):
+            passwords[i] = hashed
+
+        users = [
+            User(
+                email=User.objects.normalize_email(row['email']),
+                password=password,
+                role_id=self.roles.get(row.get('role')) or self.default_role_id,
+                **{field: row.get(field) or '' for field in USER_FIELDS}
+            )
+            for row, password in zip(valid, passwords)
+        ]
+        return users, invalid, known
+
+    def validate(self, row):
+        if not isinstance(row, dict):
+            return 'некорректная строка'
+        if not row.get('email'):
+            return 'не указан email'
+        if not row.get('password') and not row.get('password_hash'):
+            return 'не указан пароль'
+        if row.get('role') and row['role'] not in self.roles:
+            return f'неизвестная роль {row["role"]}'
+        return None
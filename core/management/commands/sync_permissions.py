@@ -0,0 +1,60 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.policy import PolicyError, apply_diff, diff_policy, parse_policy
+
+
+def load_policy(path):
+    with open(path, encoding='utf-8') as source:
+        if path.endswith(('.yaml', '.yml')):
+            try:
+                import yaml
+            except ImportError:
+                raise CommandError('Для YAML-политики установите PyYAML (pip install pyyaml)')
+            try:
+                return yaml.safe_load(source)
+            except yaml.YAMLError as exc:
+                raise ValueError(str(exc))
+        return json.load(source)
+
+
+class Command(BaseCommand):
+    help = (
+        'Приводит роли, бизнес-элементы и правила доступа к файлу политики (JSON или YAML): '
+        'сравнивает его с БД и применяет только отличия одной транзакцией.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='файл политики, .json или .yaml/.yml')
+        parser.add_argument('--dry-run', action='store_true', help='только показать изменения')
+        parser.add_argument(
+            '--prune', action='store_true',
+            help='удалить роли и элементы, которых нет в политике (вместе с их правилами)',
+        )
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            data = load_policy(options['path'])
+        except (OSError, ValueError) as exc:
+            raise CommandError(f'Не удалось прочитать политику: {exc}')
+
+        try:
+            elements, roles, parents, rules = parse_policy(data)
+            diff = diff_policy(elements, roles, parents, rules, prune=options['prune'])
+        except PolicyError as exc:
+            raise CommandError(str(exc))
+
+        if not diff:
+            self.stdout.write(self.style.SUCCESS('Права совпадают с политикой, изменений нет'))
+            return
+
+        for line in diff.lines():
+            self.stdout.write(line)
+        if options['dry_run']:
+            self.stdout.write(f'Изменения не применены (--dry-run): {diff.summary()}')
+            return
+
+        apply_diff(diff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Политика применена: {diff.summary()}'))
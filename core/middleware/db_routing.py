@@ -0,0 +1,53 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import db_routing
+
+
+class ReplicaRoutingMiddleware:
+    """Открывает маршрутизацию запроса для PrimaryReplicaRouter.
+
+    После запроса с записью пользователь закрепляется за primary (db_routing.pin_user),
+    чтобы следующие чтения видели его изменения, пока реплика их догоняет.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.DATABASE_REPLICAS:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = db_routing.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_routing.finish(token)
+        self.pin_writer(request, state)
+        return response
+
+    async def __acall__(self, request):
+        token = db_routing.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            state = db_routing.finish(token)
+        if state is not None and state.wrote:
+            # Пользователь сессии загружается лениво, в async-контексте - только через auser()
+            user = await request.auser() if hasattr(request, 'auser') else getattr(request, 'user', None)
+            if user is not None and user.is_authenticated:
+                await db_routing.apin_user(user.pk)
+        return response
+
+    def pin_writer(self, request, state):
+        user = getattr(request, 'user', None)
+        if state is not None and state.wrote and user is not None and user.is_authenticated:
+            db_routing.pin_user(user.pk)
@@ -0,0 +1,60 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from core import instrumentation
+
+
+class InstrumentationMiddleware:
+    """Первый в MIDDLEWARE: открывает замер запроса, в конце пишет метрики маршрута и Server-Timing (SERVER_TIMING).
+
+    Звенья цепочек MIDDLEWARE_PIPELINES и view замеряет Pipeline, SQL - обертка
+    соединения, шаблоны - TimedDjangoTemplates, пароли - core.hashing.
+    Собственное время остальных middleware из MIDDLEWARE попадает в mw.base.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.INSTRUMENTATION_ENABLED:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        timings, token = instrumentation.start()
+        timings.enter()
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            instrumentation.finish(token)
+        return self.record(request, response, timings, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        timings, token = instrumentation.start()
+        timings.enter()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            instrumentation.finish(token)
+        return self.record(request, response, timings, time.perf_counter() - started)
+
+    def record(self, request, response, timings, elapsed):
+        timings.leave('mw.base', elapsed)
+        # Шаблон маршрута, а не путь: /api/admin/access-rules/<int:pk>/ - один ряд метрик
+        match = getattr(request, 'resolver_match', None)
+        route = '/' + match.route if match else 'unmatched'
+        method = instrumentation.method_label(request.method)
+        instrumentation.registry.observe(route, method, response.status_code, elapsed, timings)
+        if settings.SERVER_TIMING:
+            response['Server-Timing'] = timings.server_timing(elapsed)
+        return response
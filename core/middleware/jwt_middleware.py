@@ -1,42 +1,65 @@
 import jwt
-from django.conf import settings
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.contrib.auth.models import AnonymousUser
 from django.utils import timezone
 
+from core import db_routing
+from core.principals import principal_cache
+from core.revocation import revocation_store
+from core.token_cache import token_cache
+
 class JWTAuthenticationMiddleware:
+    sync_capable = True
+    async_capable = True
+    api_prefix = '/api/'
+
     def __init__(self, get_response):
         self.get_response = get_response
-    
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def get_payload(self, request):
+        auth_header = request.headers.get('Authorization', '')
+        if not auth_header.startswith('Bearer '):
+            return None
+
+        token = auth_header.split(' ')[1]
+        try:
+            return token_cache.decode(token)
+        except jwt.InvalidTokenError:
+            return None
+
     def __call__(self, request):
-        # Пропускаем для HTML страниц и admin (они используют сессии Django)
-        if (request.path.startswith('/admin/') or 
-            request.path.startswith('/home/') or
-            request.path.startswith('/login/') or
-            request.path.startswith('/register/') or
-            request.path.startswith('/profile/') or
-            request.path.startswith('/products/') or
-            request.path.startswith('/orders/') or
-            not request.path.startswith('/api/')):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        # HTML страницы и admin используют сессии Django
+        if not request.path.startswith(self.api_prefix):
             return self.get_response(request)
-        
+
         # Проверяем JWT только для API endpoints
-        auth_header = request.headers.get('Authorization', '')
-        if auth_header.startswith('Bearer '):
-            token = auth_header.split(' ')[1]
-            try:
-                payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
-                user_id = payload.get('user_id')
-                
-                from core.models import User
-                user = User.objects.filter(id=user_id, is_active=True).first()
-                if user:
-                    request.user = user
-                else:
-                    request.user = AnonymousUser()
-                    
-            except jwt.InvalidTokenError:
-                request.user = AnonymousUser()
-        else:
-            request.user = AnonymousUser()
-        
-        return self.get_response(request)
\ No newline at end of file
+        payload = self.get_payload(request)
+        if payload and payload.get('jti') and revocation_store.is_revoked(payload['jti']):
+            payload = None
+        if payload:
+            db_routing.check_pin(payload.get('user_id'))
+        user = principal_cache.get(payload.get('user_id')) if payload else None
+        request.jwt_payload = payload if user else None
+        request.user = user or AnonymousUser()
+
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        if not request.path.startswith(self.api_prefix):
+            return await self.get_response(request)
+
+        payload = self.get_payload(request)
+        if payload and payload.get('jti') and await revocation_store.ais_revoked(payload['jti']):
+            payload = None
+        if payload:
+            await db_routing.acheck_pin(payload.get('user_id'))
+        user = await principal_cache.aget(payload.get('user_id')) if payload else None
+        request.jwt_payload = payload if user else None
+        request.user = user or AnonymousUser()
+
+        return await self.get_response(request)
@@ -0,0 +1,129 @@
+import re
+
+from asgiref.sync import async_to_sync, iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.core.handlers.exception import convert_exception_to_response
+from django.utils.module_loading import import_string
+
+from core.instrumentation import TimedHandler
+
+
+def adapt_method_mode(is_async, method, method_is_async=None):
+    if method_is_async is None:
+        method_is_async = iscoroutinefunction(method)
+    if is_async and not method_is_async:
+        return sync_to_async(method, thread_sensitive=True)
+    if not is_async and method_is_async:
+        return async_to_sync(method)
+    return method
+
+
+class Pipeline:
+    """Цепочка middleware для одного пространства URL, собранная так же, как это делает BaseHandler."""
+
+    def __init__(self, middleware_paths, get_response, is_async=False):
+        self.view_middleware = []
+        self.template_response_middleware = []
+        self.exception_middleware = []
+
+        instrumented = settings.INSTRUMENTATION_ENABLED
+        handler = TimedHandler(get_response, 'view', is_async) if instrumented else get_response
+        handler_is_async = is_async
+        for middleware_path in reversed(middleware_paths):
+            middleware = import_string(middleware_path)
+            middleware_can_sync = getattr(middleware, 'sync_capable', True)
+            middleware_can_async = getattr(middleware, 'async_capable', False)
+            if not handler_is_async and middleware_can_sync:
+                middleware_is_async = False
+            else:
+                middleware_is_async = middleware_can_async
+            try:
+                adapted_handler = adapt_method_mode(middleware_is_async, handler, handler_is_async)
+                mw_instance = middleware(adapted_handler)
+            except MiddlewareNotUsed:
+                continue
+            if mw_instance is None:
+                raise ImproperlyConfigured(
+                    'Middleware factory %s returned None.' % middleware_path
+                )
+
+            # Хуки вызываются из синхронных методов NamespacePipelineMiddleware
+            if hasattr(mw_instance, 'process_view'):
+                self.view_middleware.insert(0, adapt_method_mode(False, mw_instance.process_view))
+            if hasattr(mw_instance, 'process_template_response'):
+                self.template_response_middleware.append(
+                    adapt_method_mode(False, mw_instance.process_template_response)
+                )
+            if hasattr(mw_instance, 'process_exception'):
+                self.exception_middleware.append(adapt_method_mode(False, mw_instance.process_exception))
+
+            if instrumented:
+                # Собственное время звена попадает в Server-Timing как mw.<класс>
+                mw_instance = TimedHandler(mw_instance, f'mw.{middleware.__name__}', middleware_is_async)
+            handler = convert_exception_to_response(mw_instance)
+            handler_is_async = middleware_is_async
+
+        self.handler = adapt_method_mode(is_async, handler, handler_is_async)
+
+
+class NamespacePipelineMiddleware:
+    """Выбирает цепочку middleware по префиксу пути (settings.MIDDLEWARE_PIPELINES).
+
+    API получает только JWT, HTML-страницы и админка - сессии, CSRF, auth и messages.
+    Префиксы компилируются в одно регулярное выражение при старте.
+    Под ASGI цепочки собираются в async-режиме.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        is_async = iscoroutinefunction(get_response)
+        if is_async:
+            markcoroutinefunction(self)
+        pipelines = settings.MIDDLEWARE_PIPELINES
+        if '' not in pipelines:
+            raise ImproperlyConfigured(
+                "MIDDLEWARE_PIPELINES must define a default pipeline under the '' prefix."
+            )
+
+        # Длинные префиксы проверяются первыми
+        prefixes = sorted((prefix for prefix in pipelines if prefix), key=len, reverse=True)
+        self._pipelines = [Pipeline(pipelines[prefix], get_response, is_async) for prefix in prefixes]
+        self._default = Pipeline(pipelines[''], get_response, is_async)
+        self._pattern = re.compile('|'.join('(%s)' % re.escape(prefix) for prefix in prefixes)) if prefixes else None
+
+    def select(self, path):
+        if self._pattern is not None:
+            match = self._pattern.match(path)
+            if match:
+                return self._pipelines[match.lastindex - 1]
+        return self._default
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.select(request.path_info).handler(request)
+
+    async def __acall__(self, request):
+        return await self.select(request.path_info).handler(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        for process_view in self.select(request.path_info).view_middleware:
+            response = process_view(request, view_func, view_args, view_kwargs)
+            if response:
+                return response
+        return None
+
+    def process_template_response(self, request, response):
+        for process_template_response in self.select(request.path_info).template_response_middleware:
+            response = process_template_response(request, response)
+        return response
+
+    def process_exception(self, request, exception):
+        for process_exception in self.select(request.path_info).exception_middleware:
+            response = process_exception(request, exception)
+            if response:
+                return response
+        return None
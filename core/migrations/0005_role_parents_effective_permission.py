@@ -0,0 +1,59 @@
+# Generated by Django 4.2.7 on 2026-10-18 17:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Биты прав на момент миграции (core.permissions.PERMISSION_BITS)
+PERMISSION_BITS = {
+    'read_permission': 1 << 0,
+    'read_all_permission': 1 << 1,
+    'create_permission': 1 << 2,
+    'update_permission': 1 << 3,
+    'update_all_permission': 1 << 4,
+    'delete_permission': 1 << 5,
+    'delete_all_permission': 1 << 6,
+}
+
+
+def fill_effective_permissions(apps, schema_editor):
+    # Родителей еще нет, поэтому итоговые права - это правила самой роли
+    AccessRule = apps.get_model('core', 'AccessRule')
+    EffectivePermission = apps.get_model('core', 'EffectivePermission')
+    effective = []
+    for row in AccessRule.objects.values('role_id', 'element_id', *PERMISSION_BITS):
+        mask = 0
+        for field, bit in PERMISSION_BITS.items():
+            if row[field]:
+                mask |= bit
+        if mask:
+            effective.append(EffectivePermission(role_id=row['role_id'], element_id=row['element_id'], mask=mask))
+    EffectivePermission.objects.bulk_create(effective, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_user_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='role',
+            name='parents',
+            field=models.ManyToManyField(blank=True, related_name='children', to='core.role'),
+        ),
+        migrations.CreateModel(
+            name='EffectivePermission',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mask', models.PositiveIntegerField(default=0)),
+                ('element', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.businesselement')),
+                ('role', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='effective_permissions', to='core.role')),
+            ],
+            options={
+                'db_table': 'effective_permission',
+                'unique_together': {('role', 'element')},
+            },
+        ),
+        migrations.RunPython(fill_effective_permissions, migrations.RunPython.noop),
+    ]
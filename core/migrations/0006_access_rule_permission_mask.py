@@ -0,0 +1,81 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:02
+
+import core.models
+from django.db import migrations
+
+# Биты прав на момент миграции (core.permissions.PERMISSION_BITS)
+PERMISSION_BITS = {
+    'read_permission': 1 << 0,
+    'read_all_permission': 1 << 1,
+    'create_permission': 1 << 2,
+    'update_permission': 1 << 3,
+    'update_all_permission': 1 << 4,
+    'delete_permission': 1 << 5,
+    'delete_all_permission': 1 << 6,
+}
+
+
+def pack_permissions(apps, schema_editor):
+    AccessRule = apps.get_model('core', 'AccessRule')
+    rules = list(AccessRule.objects.all())
+    for rule in rules:
+        rule.permissions = sum(bit for field, bit in PERMISSION_BITS.items() if getattr(rule, field))
+    AccessRule.objects.bulk_update(rules, ['permissions'], batch_size=1000)
+
+
+def unpack_permissions(apps, schema_editor):
+    AccessRule = apps.get_model('core', 'AccessRule')
+    rules = list(AccessRule.objects.all())
+    for rule in rules:
+        for field, bit in PERMISSION_BITS.items():
+            setattr(rule, field, bool(rule.permissions & bit))
+    AccessRule.objects.bulk_update(rules, list(PERMISSION_BITS), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_role_parents_effective_permission'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='accessrule',
+            name='permissions',
+            field=core.models.PermissionMaskField(default=0),
+        ),
+        migrations.RunPython(pack_permissions, unpack_permissions),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='create_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='delete_all_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='delete_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='read_all_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='read_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='update_all_permission',
+        ),
+        migrations.RemoveField(
+            model_name='accessrule',
+            name='update_permission',
+        ),
+        migrations.AlterField(
+            model_name='effectivepermission',
+            name='mask',
+            field=core.models.PermissionMaskField(default=0),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 18:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_replica_heartbeat'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='access_version',
+            field=models.BigIntegerField(db_index=True, default=0),
+        ),
+    ]
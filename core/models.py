@@ -1,7 +1,68 @@
+import time
+
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.utils import timezone
 
+from core.permissions import PERMISSION_BITS
+
+
+class PermissionMaskField(models.PositiveSmallIntegerField):
+    """Маска прав (биты core.permissions.PERMISSION_BITS) в одной колонке.
+
+    Фильтр по праву - lookup has_bits: filter(permissions__has_bits=PERMISSION_BITS['update']).
+    """
+
+
+@PermissionMaskField.register_lookup
+class HasBits(models.Lookup):
+    # (mask & bits) = bits: заданы все биты
+    lookup_name = 'has_bits'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'({lhs} & {rhs}) = {rhs}', lhs_params + rhs_params + rhs_params
+
+
+class PermissionFlag(models.BooleanField):
+    """Совместимость со старыми булевыми полями AccessRule: своей колонки нет,
+    значение - бит маски permissions. Работает в конструкторе модели, формах
+    и list_editable админки; в filter()/values() используйте permissions.
+    """
+
+    def __init__(self, action, *args, **kwargs):
+        self.action = action
+        self.bit = PERMISSION_BITS[action]
+        kwargs.setdefault('default', False)
+        super().__init__(*args, **kwargs)
+
+    def get_attname_column(self):
+        # Без колонки поле не попадает ни в SQL, ни в миграции
+        return self.get_attname(), None
+
+    def contribute_to_class(self, cls, name, private_only=False):
+        super().contribute_to_class(cls, name, private_only=True)
+        setattr(cls, self.attname, PermissionFlagDescriptor(self))
+
+
+class PermissionFlagDescriptor:
+    def __init__(self, field):
+        self.field = field
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        return bool(instance.permissions & self.field.bit)
+
+    def __set__(self, instance, value):
+        # Как у BooleanField при сохранении: '0'/'False' - False, 'false' или 'abc' - ValidationError
+        if self.field.to_python(value):
+            instance.permissions |= self.field.bit
+        else:
+            instance.permissions &= ~self.field.bit
+
+
 class UserManager(BaseUserManager):
     def create_user(self, email, password=None, **extra_fields):
         if not email:
@@ -12,6 +73,15 @@ class UserManager(BaseUserManager):
         user.save(using=self._db)
         return user
 
+    def create_user_with_hash(self, email, password_hash, **extra_fields):
+        # Пароль уже захэширован (например, в пуле core.hashing)
+        if not email:
+            raise ValueError('The Email field must be set')
+        email = self.normalize_email(email)
+        user = self.model(email=email, password=password_hash, **extra_fields)
+        user.save(using=self._db)
+        return user
+
     def create_superuser(self, email, password=None, **extra_fields):
         extra_fields.setdefault('is_staff', True)
         extra_fields.setdefault('is_superuser', True)
@@ -30,6 +100,11 @@ class User(AbstractBaseUser, PermissionsMixin):
     
     date_joined = models.DateTimeField(default=timezone.now)
     deleted_at = models.DateTimeField(null=True, blank=True)
+    # Версия строки для ETag профиля
+    updated_at = models.DateTimeField(auto_now=True)
+    # time_ns последней смены роли или is_superuser: снимки прав в JWT этого пользователя
+    # старше него устарели (core.token_verifier), остальных пользователей смена не касается
+    access_version = models.BigIntegerField(default=0, db_index=True)
     
     role = models.ForeignKey('Role', on_delete=models.SET_NULL, null=True, blank=True)
     
@@ -44,6 +119,23 @@ class User(AbstractBaseUser, PermissionsMixin):
     def __str__(self):
         return self.email
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        user = super().from_db(db, field_names, values)
+        # Права при загрузке: по ним save() узнает, что снимки прав в JWT устарели
+        user._loaded_access = (user.__dict__.get('role_id'), user.__dict__.get('is_superuser'))
+        return user
+    
+    def save(self, *args, **kwargs):
+        loaded = getattr(self, '_loaded_access', None)
+        access = (self.role_id, self.is_superuser)
+        if loaded is not None and loaded != access:
+            self.access_version = time.time_ns()
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'access_version'}
+        super().save(*args, **kwargs)
+        self._loaded_access = access
+    
     def delete(self, using=None, keep_parents=False):
         self.is_active = False
         self.deleted_at = timezone.now()
@@ -52,6 +144,8 @@ class User(AbstractBaseUser, PermissionsMixin):
 class Role(models.Model):
     name = models.CharField(max_length=50, unique=True)
     description = models.TextField(blank=True)
+    # Роль получает все права родителей (и их предков)
+    parents = models.ManyToManyField('self', symmetrical=False, related_name='children', blank=True)
     
     class Meta:
         db_table = 'auth_role'
@@ -80,17 +174,104 @@ class AccessRule(models.Model):
     role = models.ForeignKey(Role, on_delete=models.CASCADE)
     element = models.ForeignKey(BusinessElement, on_delete=models.CASCADE)
     
-    read_permission = models.BooleanField(default=False)
-    read_all_permission = models.BooleanField(default=False)
-    create_permission = models.BooleanField(default=False)
-    update_permission = models.BooleanField(default=False)
-    update_all_permission = models.BooleanField(default=False)
-    delete_permission = models.BooleanField(default=False)
-    delete_all_permission = models.BooleanField(default=False)
+    permissions = PermissionMaskField(default=0)
+    
+    # Булевы поля поверх битов permissions, для админки и старого кода
+    read_permission = PermissionFlag('read')
+    read_all_permission = PermissionFlag('read_all')
+    create_permission = PermissionFlag('create')
+    update_permission = PermissionFlag('update')
+    update_all_permission = PermissionFlag('update_all')
+    delete_permission = PermissionFlag('delete')
+    delete_all_permission = PermissionFlag('delete_all')
     
     class Meta:
         db_table = 'access_rule'
         unique_together = ['role', 'element']
     
     def __str__(self):
-        return f"{self.role.name} -> {self.element.name}"
\ No newline at end of file
+        return f"{self.role.name} -> {self.element.name}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        rule = super().from_db(db, field_names, values)
+        # Роль и элемент при загрузке: если правило перенесут, core.signals пересчитает и прежнее место
+        rule._loaded_target = (rule.__dict__.get('role_id'), rule.__dict__.get('element_id'))
+        return rule
+
+class EffectivePermission(models.Model):
+    # Итоговая маска прав роли на элемент: OR правил самой роли и всех ее предков.
+    # Поддерживается core.hierarchy при изменении правил и иерархии, из нее строится матрица прав.
+    role = models.ForeignKey(Role, on_delete=models.CASCADE, related_name='effective_permissions')
+    element = models.ForeignKey(BusinessElement, on_delete=models.CASCADE)
+    mask = PermissionMaskField(default=0)
+    
+    class Meta:
+        db_table = 'effective_permission'
+        unique_together = ['role', 'element']
+    
+    def __str__(self):
+        return f"{self.role.name} -> {self.element.name}: {self.mask}"
+
+class Product(models.Model):
+    name = models.CharField(max_length=200)
+    description = models.TextField(blank=True)
+    category = models.CharField(max_length=100, blank=True)
+    price = models.PositiveIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='products')
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'product'
+        # Индексы под keyset-пагинацию: (колонка сортировки, id)
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='product_created_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['name', 'id'], name='product_name_idx'),
+            models.Index(fields=['category', 'id'], name='product_category_idx'),
+            # Для выборки "только свои" (core.scoping): owner_id = ? ORDER BY ...
+            models.Index(fields=['owner', 'id'], name='product_owner_idx'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='product_owner_created_idx'),
+            models.Index(fields=['owner', 'price', 'id'], name='product_owner_price_idx'),
+        ]
+    
+    def __str__(self):
+        return self.name
+
+class Order(models.Model):
+    STATUS_CHOICES = [
+        ('pending', 'в обработке'),
+        ('completed', 'доставлен'),
+        ('cancelled', 'отменен'),
+    ]
+    
+    product = models.ForeignKey(Product, on_delete=models.PROTECT, related_name='orders')
+    owner = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='orders')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    amount = models.PositiveIntegerField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'order'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+            models.Index(fields=['amount', 'id'], name='order_amount_idx'),
+            models.Index(fields=['status', 'id'], name='order_status_idx'),
+            models.Index(fields=['owner', 'id'], name='order_owner_idx'),
+            models.Index(fields=['owner', 'created_at', 'id'], name='order_owner_created_idx'),
+            models.Index(fields=['owner', 'amount', 'id'], name='order_owner_amount_idx'),
+        ]
+    
+    def __str__(self):
+        return f"#{self.id} {self.product.name}"
+
+class ReplicaHeartbeat(models.Model):
+    # Строка на реплику: core.db_routing пишет штамп в primary и по его копии на реплике судит об отставании
+    alias = models.CharField(max_length=50, unique=True)
+    stamp = models.BigIntegerField(default=0)
+    
+    class Meta:
+        db_table = 'replica_heartbeat'
+    
+    def __str__(self):
+        return f"{self.alias}: {self.stamp}"
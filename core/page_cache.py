@@ -0,0 +1,85 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from core import db_routing, permissions
+
+DATA_VERSION_KEY = 'core:data:{}:version'
+PAGE_CACHE_KEY = 'core:page:{}'
+FRAGMENT_CACHE_KEY = 'core:fragment:{}'
+
+# Место шапки пользователя в закэшированной странице, подставляется на каждый запрос
+USER_HEADER_SLOT = mark_safe('<!--core:user-header-->')
+
+
+def data_version(name):
+    # Штамп данных ресурса в общем кэше, как версия матрицы прав
+    return cache.get_or_set(DATA_VERSION_KEY.format(name), time.time_ns(), timeout=None)
+
+
+def bump_data_version(name):
+    cache.set(DATA_VERSION_KEY.format(name), time.time_ns(), timeout=None)
+
+
+def digest(*parts):
+    return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def user_header(user):
+    """Шапка с именем и ролью пользователя, кэшируется как фрагмент.
+
+    В ключ входят сами выводимые поля, поэтому при их изменении ключ меняется
+    и сбрасывать ничего не нужно.
+    """
+    role = user.role.name if user.role_id else ''
+    key = FRAGMENT_CACHE_KEY.format(
+        'user_header:' + digest(user.pk, user.email, user.first_name, user.last_name, role, user.is_superuser)
+    )
+    html = cache.get(key)
+    if html is None:
+        html = render_to_string('user_header.html', {'user': user})
+        cache.set(key, html, settings.PAGE_CACHE_TIMEOUT)
+    return html
+
+
+def page_key(request, name, scope, versions):
+    user = request.user
+    # Содержимое страницы зависит от роли (права и область чтения), а при области 'own' - и от пользователя
+    principal = 'superuser' if user.is_superuser else f'role:{user.role_id}'
+    if scope == 'own':
+        principal += f':user:{user.pk}'
+    return PAGE_CACHE_KEY.format(digest(
+        name,
+        principal,
+        versions,
+        sorted(request.GET.lists()),
+    ))
+
+
+def cached_page(request, name, scope, data_names, render_page):
+    """Страница из кэша по (роль, версия матрицы прав, версии данных data_names, параметры запроса).
+
+    render_page() рендерит страницу с USER_HEADER_SLOT вместо шапки пользователя,
+    ничего другого о пользователе в ней быть не должно. Кэшируются только ответы 200.
+    Проверку права на чтение (scope) view делает до вызова.
+    """
+    timeout = settings.PAGE_CACHE_TIMEOUT
+    # Версия матрицы прав и версии данных data_names
+    versions = [permissions.request_version(request), *(data_version(data_name) for data_name in data_names)]
+    key = page_key(request, name, scope, versions) if timeout else None
+    content = cache.get(key) if key else None
+    if content is None:
+        # Страница ляжет в кэш под этими версиями - строки для нее не должны быть старше них
+        db_routing.pin_if_recent(versions)
+        response = render_page()
+        if response.status_code != 200:
+            return response
+        content = response.content.decode(response.charset)
+        if key:
+            cache.set(key, content, timeout)
+    return HttpResponse(content.replace(USER_HEADER_SLOT, user_header(request.user), 1))
@@ -0,0 +1,213 @@
+import threading
+import time
+
+from django.core.cache import cache
+
+from core.db_routing import PRIMARY
+
+# Действие -> бит в маске прав. Таблица строится один раз при импорте модуля.
+PERMISSION_BITS = {
+    'read': 1 << 0,
+    'read_all': 1 << 1,
+    'create': 1 << 2,
+    'update': 1 << 3,
+    'update_all': 1 << 4,
+    'delete': 1 << 5,
+    'delete_all': 1 << 6,
+}
+
+ALL_PERMISSIONS = sum(PERMISSION_BITS.values())
+
+# Действие -> булево поле AccessRule (бит маски permissions)
+PERMISSION_FIELDS = {action: f'{action}_permission' for action in PERMISSION_BITS}
+
+VERSION_CACHE_KEY = 'core:permissions:version'
+
+
+def current_version():
+    # Штамп версии хранится в общем кэше, поэтому его видят все воркеры.
+    # Если ключ пропал (перезапуск кэша), создаем новый - все воркеры перестроят матрицу.
+    return cache.get_or_set(VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+
+
+async def acurrent_version():
+    return await cache.aget_or_set(VERSION_CACHE_KEY, time.time_ns(), timeout=None)
+
+
+def bump_version():
+    version = time.time_ns()
+    cache.set(VERSION_CACHE_KEY, version, timeout=None)
+    return version
+
+
+def actions_mask(actions):
+    mask = 0
+    for action in actions:
+        mask |= PERMISSION_BITS[action]
+    return mask
+
+
+def mask_actions(mask):
+    # Маска -> {'read': True, 'read_all': False, ...} для ответов API
+    return {action: bool(mask & bit) for action, bit in PERMISSION_BITS.items()}
+
+
+class PermissionMatrix:
+    """Матрица прав (role_id, element_name) -> битовая маска, загруженная целиком в память процесса.
+
+    Маски берутся из EffectivePermission, где наследование ролей уже учтено,
+    поэтому проверка - один поиск в словаре при любой глубине иерархии.
+    """
+
+    def __init__(self):
+        self.version = None
+        self.rules = {}
+        # role_id -> {element_name: маска}, для выдачи всех прав роли сразу
+        self.roles = {}
+        self.elements = frozenset()
+        self._lock = threading.Lock()
+
+    def _queryset(self):
+        from core.models import EffectivePermission
+        # Матрица хранится под версией из общего кэша, а ее меняют сразу после коммита в primary:
+        # реплика в пределах допустимого отставания отдала бы права до изменения
+        return EffectivePermission.objects.using(PRIMARY).values_list('role_id', 'element__name', 'mask')
+
+    def _build(self, rows, version):
+        rules = {(role_id, element_name): mask for role_id, element_name, mask in rows}
+        roles = {}
+        for (role_id, element_name), mask in rules.items():
+            roles.setdefault(role_id, {})[element_name] = mask
+        self.rules = rules
+        self.roles = roles
+        self.elements = frozenset(element_name for _, element_name in rules)
+        self.version = version
+
+    def load(self, version):
+        self._build(self._queryset(), version)
+
+    async def aload(self, version):
+        self._build([row async for row in self._queryset()], version)
+
+    def ensure_fresh(self, version=None):
+        if version is None:
+            version = current_version()
+        if version != self.version:
+            with self._lock:
+                if version != self.version:
+                    self.load(version)
+        return self
+
+    async def aensure_fresh(self, version=None):
+        if version is None:
+            version = await acurrent_version()
+        if version != self.version:
+            # Перезагрузка идемпотентна, поэтому в async-режиме обходимся без блокировки
+            await self.aload(version)
+        return self
+
+    def get_mask(self, role_id, element_name):
+        return self.rules.get((role_id, element_name), 0)
+
+    def check(self, role_id, element_name, action):
+        bit = PERMISSION_BITS.get(action, PERMISSION_BITS['read'])
+        return bool(self.get_mask(role_id, element_name) & bit)
+
+
+matrix = PermissionMatrix()
+
+
+def request_version(request):
+    # В пределах одного запроса версию проверяем один раз
+    version = getattr(request, '_permission_version', None)
+    if version is None:
+        version = current_version()
+        request._permission_version = version
+    return version
+
+
+def get_matrix(request=None):
+    if request is not None:
+        return matrix.ensure_fresh(request_version(request))
+    return matrix.ensure_fresh()
+
+
+async def aget_matrix():
+    return await matrix.aensure_fresh()
+
+
+def user_masks(user, matrix):
+    """Итоговые маски пользователя по элементам: {'orders': 9, ...}. Суперпользователю - все права."""
+    if not user or not user.is_authenticated:
+        return {}
+    if user.is_superuser:
+        return dict.fromkeys(matrix.elements, ALL_PERMISSIONS)
+    return dict(matrix.roles.get(user.role_id, {}))
+
+
+def check_all(user, masks, checks):
+    # Ответы на пары (элемент, действие) по маскам из user_masks, без обращений к матрице
+    if user.is_superuser:
+        return [True] * len(checks)
+    return [bool(masks.get(element_name, 0) & PERMISSION_BITS[action]) for element_name, action in checks]
+
+
+def permission_bitmap(user, matrix):
+    """Права пользователя для клиента: маски по элементам, таблица битов и версия матрицы."""
+    return {
+        'version': matrix.version,
+        'bits': PERMISSION_BITS,
+        'elements': user_masks(user, matrix),
+    }
+
+
+def token_snapshot(user, matrix):
+    """Снимок прав для claim 'perm' в JWT, формат читает core.token_verifier."""
+    snapshot = {
+        'v': matrix.version,
+        'role': user.role.name if user.role else None,
+        'm': user_masks(user, matrix),
+        'u': user.access_version,
+    }
+    if user.is_superuser:
+        snapshot['su'] = True
+    return snapshot
+
+
+def recent_access_versions(lifetime):
+    """{user_id: access_version} пользователей, чья роль менялась за lifetime секунд.
+
+    Более старые смены не нужны: выданные до них токены уже истекли.
+    """
+    from core.models import User
+    since = time.time_ns() - int(lifetime * 1e9)
+    return dict(User.objects.filter(access_version__gte=since).values_list('id', 'access_version'))
+
+
+def roles_with_permission(element_name, action):
+    """Роли, у которых есть право на элемент с учетом наследования, одним запросом по маске."""
+    from core.models import Role
+    return Role.objects.filter(
+        effective_permissions__element__name=element_name,
+        effective_permissions__mask__has_bits=PERMISSION_BITS[action],
+    )
+
+
+def has_permission(user, element_name, action, request=None):
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    if user.role_id is None:
+        return False
+    return get_matrix(request).check(user.role_id, element_name, action)
+
+
+async def ahas_permission(user, element_name, action):
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    if user.role_id is None:
+        return False
+    return (await aget_matrix()).check(user.role_id, element_name, action)
@@ -0,0 +1,271 @@
+from collections import defaultdict
+
+from django.db import transaction
+
+from core import hierarchy, permissions
+from core.models import AccessRule, BusinessElement, Role
+from core.principals import principal_cache
+from core.registration import reset_default_role
+
+ACTIONS = tuple(permissions.PERMISSION_BITS)
+
+
+class PolicyError(Exception):
+    pass
+
+
+def parse_policy(data):
+    """Проверяет файл политики и возвращает (элементы, роли, родители, правила).
+
+    Формат:
+        {
+            "elements": {"products": "Товары", ...},
+            "roles": {
+                "user": {"description": "Пользователь", "rules": {"products": ["read"]}},
+                "manager": {"parents": ["user"], "rules": {"products": ["read_all", "update"], ...}},
+                "admin": {"rules": {"products": "*", ...}}
+            }
+        }
+    "*" - все действия, parents - роли, чьи права наследуются (должны быть в roles).
+    Родители - {роль: set(родители)}, правила - {(роль, элемент): маска прав}.
+    """
+    if not isinstance(data, dict):
+        raise PolicyError('Политика должна быть объектом с ключами elements и roles')
+    unknown = set(data) - {'elements', 'roles'}
+    if unknown:
+        raise PolicyError(f'Неизвестные ключи: {", ".join(sorted(unknown))}')
+
+    elements = data.get('elements') or {}
+    roles_data = data.get('roles') or {}
+    if not isinstance(elements, dict) or not isinstance(roles_data, dict):
+        raise PolicyError('elements и roles должны быть объектами')
+    for name, description in elements.items():
+        if not isinstance(description, str):
+            raise PolicyError(f'Элемент {name}: описание должно быть строкой')
+
+    roles = {}
+    parents = {}
+    rules = {}
+    for role_name, role_data in roles_data.items():
+        role_data = role_data or {}
+        if not isinstance(role_data, dict):
+            raise PolicyError(f'Роль {role_name}: ожидается объект')
+        role_parents = role_data.get('parents') or []
+        role_rules = role_data.get('rules') or {}
+        if not isinstance(role_parents, list) or not all(isinstance(name, str) for name in role_parents):
+            raise PolicyError(f'Роль {role_name}: parents должен быть списком ролей')
+        if not isinstance(role_rules, dict):
+            raise PolicyError(f'Роль {role_name}: rules должен быть объектом {{элемент: действия}}')
+        roles[role_name] = role_data.get('description', '')
+        parents[role_name] = set(role_parents)
+        for element_name, actions in role_rules.items():
+            if element_name not in elements:
+                raise PolicyError(f'Роль {role_name}: элемент {element_name} не объявлен в elements')
+            if actions == '*':
+                actions = ACTIONS
+            if not isinstance(actions, (list, tuple)) or not all(action in ACTIONS for action in actions):
+                raise PolicyError(
+                    f'Роль {role_name}, элемент {element_name}: ожидается "*" или список из {", ".join(ACTIONS)}'
+                )
+            rules[(role_name, element_name)] = permissions.actions_mask(actions)
+
+    for role_name, parent_names in parents.items():
+        unknown = parent_names - set(roles)
+        if unknown:
+            raise PolicyError(f'Роль {role_name}: родители {", ".join(sorted(unknown))} не объявлены в roles')
+    return elements, roles, parents, rules
+
+
+def format_actions(mask):
+    return ', '.join(action for action, granted in permissions.mask_actions(mask).items() if granted) or '-'
+
+
+class PolicyDiff:
+    """Изменения, которые нужно внести в Role/BusinessElement/AccessRule."""
+
+    def __init__(self):
+        self.roles = {'create': {}, 'update': {}, 'delete': {}}
+        self.elements = {'create': {}, 'update': {}, 'delete': {}}
+        # (роль, элемент) -> маска; для update и delete - еще id правила
+        self.rules = {'create': {}, 'update': {}, 'delete': {}}
+        # (роль, родитель); для delete - id связи
+        self.parents = {'create': set(), 'delete': {}}
+        self.current_rules = {}
+
+    def __bool__(self):
+        return any(
+            changes for diff in (self.roles, self.elements, self.parents, self.rules) for changes in diff.values()
+        )
+
+    def lines(self):
+        for label, diff in (('роль', self.roles), ('элемент', self.elements)):
+            for name in diff['create']:
+                yield f'+ {label} {name}'
+            for name, (_, description) in diff['update'].items():
+                yield f'~ {label} {name}: описание -> {description!r}'
+            for name in diff['delete']:
+                yield f'- {label} {name} (вместе с правилами)'
+        for role, parent in sorted(self.parents['create']):
+            yield f'+ роль {role} наследует {parent}'
+        for role, parent in self.parents['delete']:
+            yield f'- роль {role} больше не наследует {parent}'
+        for (role, element), mask in self.rules['create'].items():
+            yield f'+ правило {role}/{element}: {format_actions(mask)}'
+        for (role, element), (_, mask) in self.rules['update'].items():
+            old = self.current_rules[(role, element)][1]
+            changes = [
+                ('+' if mask & bit else '-') + action
+                for action, bit in permissions.PERMISSION_BITS.items()
+                if (mask ^ old) & bit
+            ]
+            yield f'~ правило {role}/{element}: {" ".join(changes)}'
+        for role, element in self.rules['delete']:
+            yield f'- правило {role}/{element}'
+
+    def summary(self):
+        parts = []
+        for label, diff in (('ролей', self.roles), ('элементов', self.elements), ('правил', self.rules)):
+            parts.append(f'{label} +{len(diff["create"])} ~{len(diff["update"])} -{len(diff["delete"])}')
+        parts.insert(2, f'наследований +{len(self.parents["create"])} -{len(self.parents["delete"])}')
+        return ', '.join(parts)
+
+
+def diff_named(current, wanted, diff, prune):
+    # current: name -> (id, description)
+    for name, description in wanted.items():
+        if name not in current:
+            diff['create'][name] = description
+        elif current[name][1] != description:
+            diff['update'][name] = (current[name][0], description)
+    if prune:
+        for name, (pk, _) in current.items():
+            if name not in wanted:
+                diff['delete'][name] = pk
+
+
+def diff_parents(current, wanted, diff, deleted_roles):
+    # current: (роль, родитель) -> id связи
+    for role, parent_names in wanted.items():
+        for parent in parent_names:
+            if (role, parent) not in current:
+                diff.parents['create'].add((role, parent))
+    for (role, parent), pk in current.items():
+        # Связи удаляемых ролей уйдут каскадом
+        if role in deleted_roles or parent in deleted_roles:
+            continue
+        if role in wanted and parent not in wanted[role]:
+            diff.parents['delete'][(role, parent)] = pk
+
+    edges = defaultdict(set)
+    for role, parent in set(current) - set(diff.parents['delete']) | diff.parents['create']:
+        if role not in deleted_roles and parent not in deleted_roles:
+            edges[role].add(parent)
+    for role in edges:
+        if role in hierarchy.reachable(edges[role], edges):
+            raise PolicyError(f'Роль {role} наследует сама от себя')
+
+
+def diff_policy(elements, roles, parents, rules, prune=False):
+    """Сравнивает политику с БД: четыре запроса, ничего не пишет.
+
+    Правила и родители ролей из политики приводятся к ней полностью (лишние удаляются).
+    Роли и элементы, которых нет в политике, удаляются только с prune, вместе с их правилами.
+    """
+    diff = PolicyDiff()
+    current_roles = {
+        row['name']: (row['id'], row['description'])
+        for row in Role.objects.values('id', 'name', 'description')
+    }
+    current_elements = {
+        row['name']: (row['id'], row['description'])
+        for row in BusinessElement.objects.values('id', 'name', 'description')
+    }
+    diff_named(current_roles, roles, diff.roles, prune)
+    diff_named(current_elements, elements, diff.elements, prune)
+
+    current_parents = {
+        (role, parent): pk
+        for pk, role, parent in hierarchy.RoleParents.objects.values_list('id', 'from_role__name', 'to_role__name')
+    }
+    diff_parents(current_parents, parents, diff, diff.roles['delete'])
+
+    diff.current_rules = {
+        (role, element): (pk, mask)
+        for pk, role, element, mask in AccessRule.objects.values_list('id', 'role__name', 'element__name', 'permissions')
+    }
+    for key, mask in rules.items():
+        current = diff.current_rules.get(key)
+        if current is None:
+            diff.rules['create'][key] = mask
+        elif current[1] != mask:
+            diff.rules['update'][key] = (current[0], mask)
+    for key, (pk, _) in diff.current_rules.items():
+        role, element = key
+        # Правила удаляемых ролей и элементов уйдут каскадом
+        if role in diff.roles['delete'] or element in diff.elements['delete']:
+            continue
+        if role in roles and key not in rules:
+            diff.rules['delete'][key] = pk
+    return diff
+
+
+def apply_named(model, diff, batch_size):
+    if diff['delete']:
+        model.objects.filter(id__in=diff['delete'].values()).delete()
+    if diff['update']:
+        model.objects.bulk_update(
+            [model(id=pk, description=description) for pk, description in diff['update'].values()],
+            ['description'],
+            batch_size=batch_size,
+        )
+    if diff['create']:
+        model.objects.bulk_create(
+            [model(name=name, description=description) for name, description in diff['create'].items()],
+            batch_size=batch_size,
+        )
+
+
+def apply_diff(diff, batch_size=1000):
+    # EffectivePermission пересчитывается один раз в конце, а не на каждое удаленное правило
+    with transaction.atomic(), hierarchy.deferred_refresh():
+        apply_named(Role, diff.roles, batch_size)
+        apply_named(BusinessElement, diff.elements, batch_size)
+
+        rules = diff.rules
+        if rules['delete']:
+            AccessRule.objects.filter(id__in=rules['delete'].values()).delete()
+        if rules['update']:
+            AccessRule.objects.bulk_update(
+                [AccessRule(id=pk, permissions=mask) for pk, mask in rules['update'].values()],
+                ['permissions'],
+                batch_size=batch_size,
+            )
+        if diff.parents['delete']:
+            hierarchy.RoleParents.objects.filter(id__in=diff.parents['delete'].values()).delete()
+        role_names = {role for role, _ in rules['create']} | {name for edge in diff.parents['create'] for name in edge}
+        if role_names:
+            role_ids = dict(Role.objects.filter(name__in=role_names).values_list('name', 'id'))
+        if diff.parents['create']:
+            hierarchy.RoleParents.objects.bulk_create(
+                [
+                    hierarchy.RoleParents(from_role_id=role_ids[role], to_role_id=role_ids[parent])
+                    for role, parent in diff.parents['create']
+                ],
+                batch_size=batch_size,
+            )
+        if rules['create']:
+            element_names = {element for _, element in rules['create']}
+            element_ids = dict(BusinessElement.objects.filter(name__in=element_names).values_list('name', 'id'))
+            AccessRule.objects.bulk_create(
+                [
+                    AccessRule(role_id=role_ids[role], element_id=element_ids[element], permissions=mask)
+                    for (role, element), mask in rules['create'].items()
+                ],
+                batch_size=batch_size,
+            )
+
+        # bulk-операции не шлют сигналы - сбрасываем кэши один раз после коммита
+        transaction.on_commit(permissions.bump_version)
+        if any(diff.roles.values()):
+            transaction.on_commit(principal_cache.clear)
+            transaction.on_commit(reset_default_role)
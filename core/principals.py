@@ -0,0 +1,121 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+EPOCH_CACHE_KEY = 'core:principals:epoch'
+GENERATION_CACHE_KEY = 'core:principals:gen:{}'
+
+
+class PrincipalCache:
+    """LRU-кэш пользователей (вместе с ролью) для JWT-аутентификации.
+
+    Запись живет не дольше ttl секунд. Поколения записей хранятся в общем кэше,
+    так что вытеснение в одном воркере видно всем остальным.
+    """
+
+    def __init__(self, ttl, max_size):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _stamp_keys(self, user_id):
+        return [EPOCH_CACHE_KEY, GENERATION_CACHE_KEY.format(user_id)]
+
+    def _queryset(self, user_id):
+        from core.models import User
+        return User.objects.select_related('role').filter(id=user_id, is_active=True)
+
+    def _lookup(self, user_id, stamps, now):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                user, expires_at, entry_stamps = entry
+                if expires_at > now and entry_stamps == stamps:
+                    self._entries.move_to_end(user_id)
+                    self.hits += 1
+                    return copy.deepcopy(user)
+                del self._entries[user_id]
+            self.misses += 1
+        return None
+
+    def _store(self, user_id, user, stamps, now):
+        with self._lock:
+            self._entries[user_id] = (user, now + self.ttl, stamps)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return copy.deepcopy(user)
+
+    def get(self, user_id):
+        if user_id is None:
+            return None
+
+        keys = self._stamp_keys(user_id)
+        values = cache.get_many(keys)
+        stamps = tuple(values.get(key, 0) for key in keys)
+        now = time.monotonic()
+        user = self._lookup(user_id, stamps, now)
+        if user is not None:
+            return user
+
+        user = self._queryset(user_id).first()
+        if user is None:
+            return None
+        return self._store(user_id, user, stamps, now)
+
+    async def aget(self, user_id):
+        if user_id is None:
+            return None
+
+        keys = self._stamp_keys(user_id)
+        values = await cache.aget_many(keys)
+        stamps = tuple(values.get(key, 0) for key in keys)
+        now = time.monotonic()
+        user = self._lookup(user_id, stamps, now)
+        if user is not None:
+            return user
+
+        user = await self._queryset(user_id).afirst()
+        if user is None:
+            return None
+        return self._store(user_id, user, stamps, now)
+
+    def evict(self, user_id):
+        with self._lock:
+            if self._entries.pop(user_id, None) is not None:
+                self.evictions += 1
+        key = GENERATION_CACHE_KEY.format(user_id)
+        cache.set(key, time.time_ns(), timeout=self.ttl * 2)
+
+    def clear(self):
+        with self._lock:
+            self.evictions += len(self._entries)
+            self._entries.clear()
+        cache.set(EPOCH_CACHE_KEY, time.time_ns(), timeout=None)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'ttl': self.ttl,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+
+principal_cache = PrincipalCache(
+    ttl=settings.PRINCIPAL_CACHE_TTL,
+    max_size=settings.PRINCIPAL_CACHE_MAX_SIZE,
+)
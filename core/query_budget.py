@@ -0,0 +1,83 @@
+import os
+import traceback
+from collections import Counter
+
+from django.conf import settings
+
+# Управление транзакциями не считается: на SQLite BEGIN идет отдельным запросом, на PostgreSQL - нет
+TRANSACTION_SQL = ('BEGIN', 'COMMIT', 'ROLLBACK', 'SAVEPOINT', 'RELEASE SAVEPOINT')
+
+
+class QueryBudget:
+    """Сколько SQL-запросов может сделать один вызов метода view.
+
+    Во view объявляется атрибутом класса по HTTP-методам:
+        query_budget = {'get': QueryBudget(2), 'put': QueryBudget(3, max_duplicates=1)}
+    Дубликат - повтор уже выполненного в этом запросе SQL (с любыми параметрами),
+    т.е. признак N+1. Проверяет manage.py check_query_budgets.
+    """
+
+    def __init__(self, max_queries, max_duplicates=0):
+        self.max_queries = max_queries
+        self.max_duplicates = max_duplicates
+
+    def __repr__(self):
+        return f'QueryBudget({self.max_queries}, max_duplicates={self.max_duplicates})'
+
+
+def get_budget(view_class, method):
+    return (getattr(view_class, 'query_budget', None) or {}).get(method.lower())
+
+
+def project_stack(skip_files=()):
+    # Только кадры кода проекта: без Django, DRF, manage.py и команд, которые гоняют проверку
+    base_dir = str(settings.BASE_DIR)
+    management_dir = os.sep + 'management' + os.sep
+    return [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and 'site-packages' not in frame.filename
+        and management_dir not in frame.filename
+        and os.path.basename(frame.filename) != 'manage.py'
+        and frame.filename not in skip_files
+    ]
+
+
+class QueryRecorder:
+    """execute_wrapper, который запоминает SQL и стек вызова каждого запроса."""
+
+    def __init__(self, skip_files=()):
+        self.skip_files = tuple(skip_files) + (__file__,)
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not sql.lstrip().upper().startswith(TRANSACTION_SQL):
+            self.queries.append((sql, project_stack(self.skip_files)))
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+    def duplicates(self):
+        # SQL с плейсхолдерами: одинаковый текст = тот же запрос с другими параметрами
+        counts = Counter(sql for sql, _ in self.queries)
+        return {sql: count for sql, count in counts.items() if count > 1}
+
+    def duplicate_count(self):
+        return sum(count - 1 for count in self.duplicates().values())
+
+    def stacks(self, sql):
+        # Разные места, откуда выполнялся один и тот же SQL
+        seen = []
+        for query_sql, stack in self.queries:
+            if query_sql == sql and stack not in seen:
+                seen.append(stack)
+        return seen
+
+    def check(self, budget):
+        errors = []
+        if len(self) > budget.max_queries:
+            errors.append(f'запросов {len(self)} при лимите {budget.max_queries}')
+        if self.duplicate_count() > budget.max_duplicates:
+            errors.append(f'дубликатов {self.duplicate_count()} при лимите {budget.max_duplicates}')
+        return errors
@@ -0,0 +1,50 @@
+from django.db import IntegrityError, transaction
+
+from core.models import Role, User
+
+DEFAULT_ROLE_NAME = 'user'
+DUPLICATE_EMAIL_ERROR = 'Пользователь с таким email уже существует'
+
+_default_role = None
+
+
+class DuplicateEmail(Exception):
+    pass
+
+
+def get_default_role():
+    # Роль по умолчанию кэшируется в процессе, сбрасывается сигналом при изменении Role
+    global _default_role
+    if _default_role is None:
+        _default_role, _ = Role.objects.get_or_create(name=DEFAULT_ROLE_NAME)
+    return _default_role
+
+
+def reset_default_role():
+    global _default_role
+    _default_role = None
+
+
+def email_taken(email):
+    # Дешевая проверка до хэширования пароля; гонки по-прежнему ловит уникальный индекс
+    return User.objects.filter(email=User.objects.normalize_email(email)).exists()
+
+
+def register_user(email, password_hash, **extra_fields):
+    """Один INSERT с уже назначенной ролью; дубликаты ловит уникальный индекс email."""
+    for attempt in range(2):
+        try:
+            with transaction.atomic():
+                return User.objects.create_user_with_hash(
+                    email=email,
+                    password_hash=password_hash,
+                    role=get_default_role(),
+                    **extra_fields
+                )
+        except IntegrityError:
+            if email_taken(email):
+                raise DuplicateEmail(email)
+            # Закэшированная роль могла быть удалена в другом процессе
+            reset_default_role()
+            if attempt:
+                raise
@@ -0,0 +1,166 @@
+import hashlib
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+SEQUENCE_CACHE_KEY = 'core:revocations:seq'
+ENTRY_CACHE_KEY = 'core:revocations:{}'
+SNAPSHOT_CACHE_KEY = 'core:revocations:snapshot'
+# Записи журнала живут не меньше, чтобы отстающий воркер не принял истекшую запись за пропуск
+MIN_ENTRY_TIMEOUT = 300
+
+
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.001):
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, key):
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class RevocationStore:
+    """Отозванные jti: локальный словарь jti -> exp с фильтром Блума перед ним.
+
+    Общий бэкенд - журнал в кэше Django: счетчик SEQUENCE_CACHE_KEY и записи
+    (jti, exp) под номерами, которые живут до истечения токена. Воркер сверяет
+    счетчик один раз на проверку и дочитывает только новые записи, так что в
+    обычном случае ("не отозван") нет ни запросов к БД, ни поиска по словарю.
+    Размер ограничен временем жизни токенов: записи удаляются после exp.
+
+    Номер записи выдается до ее записи, поэтому воркер не продвигается дальше
+    отсутствующей записи, пока она не пропадает дольше JWT_REVOCATION_GAP_TIMEOUT.
+    Каждые JWT_REVOCATION_SNAPSHOT_INTERVAL записей в кэш пишется снимок живых
+    отзывов, и новый воркер дочитывает журнал от него, а не с начала.
+    """
+
+    def __init__(self, capacity, gap_timeout=5, snapshot_interval=1000):
+        self.capacity = capacity
+        self.gap_timeout = gap_timeout
+        self.snapshot_interval = snapshot_interval
+        self._entries = {}
+        self._bloom = BloomFilter(capacity)
+        self._seq = 0
+        self._gaps = {}
+        self._lock = threading.Lock()
+
+    def _add(self, jti, exp):
+        self._entries[jti] = exp
+        self._bloom.add(jti)
+
+    def _prune(self, now):
+        # Фильтр Блума не умеет удалять, поэтому после чистки он строится заново
+        self._entries = {jti: exp for jti, exp in self._entries.items() if exp > now}
+        self._bloom = BloomFilter(max(self.capacity, len(self._entries) * 2))
+        for jti in self._entries:
+            self._bloom.add(jti)
+
+    def _needs_snapshot(self, seq):
+        # Новый воркер или счетчик в кэше пропал и начался заново
+        return self._seq == 0 or seq < self._seq
+
+    def _start(self, seq, snapshot):
+        start = self._seq if seq >= self._seq else 0
+        if snapshot is not None and start < snapshot[0] <= seq:
+            start = snapshot[0]
+        return start, [ENTRY_CACHE_KEY.format(n) for n in range(start + 1, seq + 1)]
+
+    def _apply(self, start, snapshot, records):
+        now = time.time()
+        with self._lock:
+            if snapshot is not None and start == snapshot[0]:
+                for record in snapshot[1].items():
+                    self._add(*record)
+            applied = start
+            blocked = False
+            for n, record in enumerate(records, start + 1):
+                if record is not None:
+                    self._add(*record)
+                elif now - self._gaps.setdefault(n, now) < self.gap_timeout:
+                    # Номер выдан, но запись еще не появилась - перечитаем ее на следующей проверке
+                    blocked = True
+                if not blocked:
+                    applied = n
+            self._seq = applied
+            self._gaps = {n: seen for n, seen in self._gaps.items() if n > applied}
+            if len(self._entries) > self.capacity:
+                self._prune(now)
+
+    def refresh(self):
+        seq = cache.get(SEQUENCE_CACHE_KEY, 0)
+        if seq != self._seq:
+            snapshot = cache.get(SNAPSHOT_CACHE_KEY) if self._needs_snapshot(seq) else None
+            start, keys = self._start(seq, snapshot)
+            records = cache.get_many(keys)
+            self._apply(start, snapshot, [records.get(key) for key in keys])
+
+    async def arefresh(self):
+        seq = await cache.aget(SEQUENCE_CACHE_KEY, 0)
+        if seq != self._seq:
+            snapshot = await cache.aget(SNAPSHOT_CACHE_KEY) if self._needs_snapshot(seq) else None
+            start, keys = self._start(seq, snapshot)
+            records = await cache.aget_many(keys)
+            self._apply(start, snapshot, [records.get(key) for key in keys])
+
+    def _check(self, jti):
+        if jti not in self._bloom:
+            return False
+        exp = self._entries.get(jti)
+        return exp is not None and exp > time.time()
+
+    def is_revoked(self, jti):
+        self.refresh()
+        return self._check(jti)
+
+    async def ais_revoked(self, jti):
+        await self.arefresh()
+        return self._check(jti)
+
+    def revoke(self, jti, exp):
+        timeout = max(MIN_ENTRY_TIMEOUT, int(exp - time.time()) + 1)
+        cache.add(SEQUENCE_CACHE_KEY, 0, timeout=None)
+        while True:
+            seq = cache.incr(SEQUENCE_CACHE_KEY)
+            # add не перезапишет чужую запись, если incr бэкенда не атомарен и выдал номер дважды
+            if cache.add(ENTRY_CACHE_KEY.format(seq), (jti, exp), timeout=timeout):
+                break
+        with self._lock:
+            self._add(jti, exp)
+        self.refresh()
+        if self.snapshot_interval and seq % self.snapshot_interval == 0:
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        now = time.time()
+        with self._lock:
+            entries = {jti: exp for jti, exp in self._entries.items() if exp > now}
+            snapshot = (self._seq, entries)
+        cache.set(SNAPSHOT_CACHE_KEY, snapshot, timeout=None)
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'capacity': self.capacity,
+            'sequence': self._seq,
+        }
+
+
+revocation_store = RevocationStore(
+    capacity=settings.JWT_REVOCATION_CAPACITY,
+    gap_timeout=settings.JWT_REVOCATION_GAP_TIMEOUT,
+    snapshot_interval=settings.JWT_REVOCATION_SNAPSHOT_INTERVAL,
+)
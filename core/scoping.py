@@ -0,0 +1,59 @@
+from core import permissions
+
+# Действие -> его вариант "на все записи"
+ALL_ACTIONS = {
+    'read': 'read_all',
+    'update': 'update_all',
+    'delete': 'delete_all',
+}
+
+
+def scope_for_mask(mask, action):
+    """Возвращает 'all', 'own' или None (нет доступа) для маски прав роли."""
+    all_action = ALL_ACTIONS.get(action)
+    if all_action and mask & permissions.PERMISSION_BITS[all_action]:
+        return 'all'
+    if mask & permissions.PERMISSION_BITS.get(action, 0):
+        return 'own' if all_action else 'all'
+    return None
+
+
+def apply_scope(queryset, user, scope, owner_field='owner'):
+    if scope == 'all':
+        return queryset
+    if scope == 'own':
+        return queryset.filter(**{f'{owner_field}_id': user.id})
+    return queryset.none()
+
+
+def get_scope(user, element_name, action, request=None):
+    if not user or not user.is_authenticated:
+        return None
+    if user.is_superuser:
+        return 'all'
+    if user.role_id is None:
+        return None
+    mask = permissions.get_matrix(request).get_mask(user.role_id, element_name)
+    return scope_for_mask(mask, action)
+
+
+async def aget_scope(user, element_name, action):
+    if not user or not user.is_authenticated:
+        return None
+    if user.is_superuser:
+        return 'all'
+    if user.role_id is None:
+        return None
+    mask = (await permissions.matrix.aensure_fresh()).get_mask(user.role_id, element_name)
+    return scope_for_mask(mask, action)
+
+
+def scope_queryset(queryset, user, element_name, action='read', request=None, owner_field='owner'):
+    """Фильтр по владельцу накладывается в SQL до выборки строк:
+    *_all - все записи, базовое право - только свои (owner_id = user.id), иначе пусто.
+    """
+    return apply_scope(queryset, user, get_scope(user, element_name, action, request), owner_field)
+
+
+async def ascope_queryset(queryset, user, element_name, action='read', owner_field='owner'):
+    return apply_scope(queryset, user, await aget_scope(user, element_name, action), owner_field)
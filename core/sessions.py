@@ -0,0 +1,111 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.base import UpdateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+
+AUTH_KEYS = (SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY)
+
+
+class SessionStore(CachedDBStore):
+    """Сессии в кэше (SESSION_CACHE_ALIAS) с отложенной записью в БД.
+
+    - данные не изменились и expire_date сдвинулся меньше чем на
+      SESSION_EXPIRY_REFRESH_INTERVAL - не пишется ничего;
+    - изменились - пишется кэш, а БД не чаще раза в SESSION_WRITE_BEHIND_INTERVAL;
+    - создание сессии, вход/выход (ключи auth) и удаление идут в БД сразу.
+    Несохраненные в БД изменения живут в кэше, поэтому при нескольких процессах
+    кэш должен быть общим (файловый, memcached, redis), а не locmem.
+    """
+
+    cache_key_prefix = 'core:session:'
+
+    def __init__(self, session_key=None):
+        self._entry = None
+        super().__init__(session_key)
+
+    def _digest(self, data):
+        return hashlib.blake2b(self.serializer().dumps(data), digest_size=16).hexdigest()
+
+    def _auth(self, data):
+        return tuple(data.get(key) for key in AUTH_KEYS)
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            # Некоторые бэкенды (memcached) падают на некорректных ключах - как в cached_db
+            entry = None
+
+        if entry is None:
+            s = self._get_session_from_db()
+            if not s:
+                self._entry = None
+                return {}
+            data = self.decode(s.session_data)
+            entry = self._make_entry(data, s.expire_date)
+            self._cache.set(self.cache_key, entry, self.get_expiry_age(expiry=s.expire_date))
+
+        self._entry = entry
+        return entry['session']
+
+    def _make_entry(self, data, expire_date):
+        digest = self._digest(data)
+        return {
+            'session': data,
+            'digest': digest,
+            'persisted_digest': digest,
+            'persisted_auth': self._auth(data),
+            'persisted_expire': expire_date,
+            'persisted_at': time.time(),
+        }
+
+    def _persist(self):
+        try:
+            DBStore.save(self)
+        except UpdateError:
+            # Строку удалил clearsessions по отстающему expire_date - создаем заново
+            DBStore.save(self, must_create=True)
+
+    def save(self, must_create=False):
+        data = self._get_session(no_load=must_create)
+        if self.session_key is None:
+            return self.create()
+
+        expire_date = self.get_expiry_date()
+        entry = None if must_create else self._entry
+        if entry is None:
+            # Новая сессия или ее не было ни в кэше, ни в БД - сразу в БД
+            DBStore.save(self, must_create=must_create)
+            entry = self._make_entry(data, expire_date)
+        else:
+            digest = self._digest(data)
+            changed = digest != entry['digest']
+            dirty = digest != entry['persisted_digest']
+            expiry_due = (
+                (expire_date - entry['persisted_expire']).total_seconds() >= settings.SESSION_EXPIRY_REFRESH_INTERVAL
+            )
+            persist = (
+                expiry_due
+                or self._auth(data) != entry['persisted_auth']
+                or (dirty and time.time() - entry['persisted_at'] >= settings.SESSION_WRITE_BEHIND_INTERVAL)
+            )
+            if not changed and not persist:
+                return
+
+            if persist:
+                self._persist()
+                entry = self._make_entry(data, expire_date)
+            else:
+                entry = dict(entry, session=data, digest=digest)
+
+        self._entry = entry
+        self._cache.set(self.cache_key, entry, self.get_expiry_age())
+
+    def delete(self, session_key=None):
+        super().delete(session_key)
+        if session_key is None or session_key == self.session_key:
+            self._entry = None
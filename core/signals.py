@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from core import db_connections, db_routing, hierarchy, instrumentation, page_cache, permissions
+from core.models import AccessRule, BusinessElement, Order, Product, Role, User
+from core.principals import principal_cache
+from core.registration import reset_default_role
+
+
+@receiver([post_save, post_delete], sender=AccessRule)
+@receiver([post_save, post_delete], sender=Role)
+@receiver([post_save, post_delete], sender=BusinessElement)
+@receiver(m2m_changed, sender=hierarchy.RoleParents)
+def invalidate_permission_matrix(sender, **kwargs):
+    # Штамп меняем только после коммита, иначе другие воркеры перечитают старые данные
+    transaction.on_commit(permissions.bump_version)
+
+
+@receiver([post_save, post_delete], sender=AccessRule)
+def refresh_rule_effective(sender, instance, **kwargs):
+    # Правило меняет итоговые права своей роли и ее потомков только на своем элементе.
+    # Перенесенное в другую роль или элемент правило меняет и права на прежнем месте.
+    target = (instance.role_id, instance.element_id)
+    loaded = getattr(instance, '_loaded_target', None) or target
+    hierarchy.refresh_effective({target[0], loaded[0]}, {target[1], loaded[1]})
+    instance._loaded_target = target
+
+
+@receiver(m2m_changed, sender=hierarchy.RoleParents)
+def refresh_hierarchy_effective(sender, instance, action, reverse, pk_set, **kwargs):
+    # reverse - изменили детей роли instance (role.children.add), иначе ее родителей
+    if action == 'pre_add':
+        pairs = [(child_id, {instance.pk}) for child_id in pk_set] if reverse else [(instance.pk, pk_set)]
+        for child_id, parent_ids in pairs:
+            if hierarchy.creates_cycle(child_id, parent_ids):
+                raise hierarchy.RoleCycleError('Роль не может наследовать сама от себя')
+    elif action == 'pre_clear' and reverse:
+        instance._cleared_children = set(instance.children.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        hierarchy.refresh_effective(pk_set if reverse else {instance.pk})
+    elif action == 'post_clear':
+        hierarchy.refresh_effective(getattr(instance, '_cleared_children', set()) if reverse else {instance.pk})
+
+
+@receiver(pre_delete, sender=Role)
+def remember_role_children(sender, instance, **kwargs):
+    # После удаления ребра иерархии пропадут - запоминаем, чьи права пересчитать
+    instance._children_ids = set(instance.children.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Role)
+def refresh_children_effective(sender, instance, **kwargs):
+    if instance._children_ids:
+        hierarchy.refresh_effective(instance._children_ids)
+
+
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Order)
+def invalidate_pages(sender, **kwargs):
+    # Закэшированные страницы товаров и заказов устаревают вместе со штампом данных
+    name = 'products' if sender is Product else 'orders'
+    transaction.on_commit(lambda: page_cache.bump_data_version(name))
+
+
+@receiver([post_save, post_delete], sender=User)
+def evict_principal(sender, instance, **kwargs):
+    # User.delete() - мягкое удаление через save(), оно тоже попадает сюда.
+    # Повторно вытесняем после коммита: параллельный запрос мог успеть закэшировать старую строку.
+    principal_cache.evict(instance.pk)
+    transaction.on_commit(lambda: principal_cache.evict(instance.pk))
+    # Регистрация идет анонимно: закрепляем за primary нового пользователя, а не автора запроса
+    transaction.on_commit(lambda: db_routing.pin_user(instance.pk))
+
+
+@receiver([post_save, post_delete], sender=Role)
+def evict_principals_for_role(sender, **kwargs):
+    # Роль закэширована вместе с пользователями, при ее изменении сбрасываем всех
+    transaction.on_commit(principal_cache.clear)
+    reset_default_role()
+
+
+@receiver(connection_created)
+def configure_connection(sender, connection, **kwargs):
+    db_connections.configure_connection(connection)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    # Обертка остается на соединении и после переподключения - не добавляем повторно
+    if settings.INSTRUMENTATION_ENABLED and instrumentation.sql_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(instrumentation.sql_timer)
@@ -0,0 +1,171 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import permissions
+from core.api.views.admin_views import validate_rule_deltas
+from core.api.views.auth_views import create_jwt_token
+from core.models import AccessRule, BusinessElement, EffectivePermission, Role, User
+from core.permissions import PERMISSION_BITS
+from core.principals import principal_cache
+
+READ = PERMISSION_BITS['read']
+UPDATE = PERMISSION_BITS['update']
+DELETE = PERMISSION_BITS['delete']
+
+
+class ValidateRuleDeltasTests(TestCase):
+    def test_mask_then_flags(self):
+        deltas, error = validate_rule_deltas({'rules': [
+            {'id': 1, 'read_permission': False, 'permissions': READ | UPDATE},
+            {'id': 2, 'delete_permission': True},
+            {'id': 1, 'delete_permission': True},
+        ]})
+        self.assertIsNone(error)
+        self.assertEqual(deltas, {
+            1: {'permissions': READ | UPDATE, 'read_permission': False, 'delete_permission': True},
+            2: {'delete_permission': True},
+        })
+        # Маска применяется первой
+        self.assertEqual(list(deltas[1])[0], 'permissions')
+
+    def test_invalid(self):
+        for data in (
+            [], {}, {'rules': 'x'}, [1], [{'read_permission': True}], [{'id': '1'}], [{'id': True}],
+            [{'id': 1, 'foo': True}], [{'id': 1, 'read_permission': 'false'}], [{'id': 1, 'read_permission': 0}],
+            [{'id': 1, 'permissions': 'abc'}], [{'id': 1, 'permissions': -1}],
+            [{'id': 1, 'permissions': permissions.ALL_PERMISSIONS + 1}], [{'id': 1, 'permissions': True}],
+        ):
+            with self.subTest(data=data):
+                deltas, error = validate_rule_deltas(data)
+                self.assertIsNone(deltas)
+                self.assertTrue(error)
+
+
+class AccessRuleTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        self.parent = Role.objects.create(name='parent')
+        self.child = Role.objects.create(name='child')
+        self.child.parents.add(self.parent)
+        products = BusinessElement.objects.create(name='products')
+        orders = BusinessElement.objects.create(name='orders')
+        self.products = AccessRule.objects.create(role=self.parent, element=products, read_permission=True)
+        self.orders = AccessRule.objects.create(role=self.parent, element=orders, permissions=READ | DELETE)
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.headers = {'Authorization': f'Bearer {create_jwt_token(admin)}'}
+
+    def patch(self, data, **headers):
+        return self.client.patch('/api/admin/access-rules/', data, content_type='application/json',
+                                 headers={**self.headers, **headers})
+
+    def masks(self):
+        return dict(AccessRule.objects.values_list('id', 'permissions'))
+
+    def effective(self, role, rule):
+        return EffectivePermission.objects.get(role=role, element_id=rule.element_id).mask
+
+
+class AccessRulePatchTests(AccessRuleTestCase):
+    def test_mask_and_flags(self):
+        response = self.patch([
+            {'id': self.products.pk, 'permissions': READ | UPDATE, 'read_permission': False},
+            {'id': self.orders.pk, 'delete_permission': False, 'update_permission': True},
+        ])
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(response.json()['updated'], 2)
+        self.assertEqual(self.masks(), {self.products.pk: UPDATE, self.orders.pk: READ | UPDATE})
+
+    def test_missing_ids_roll_back(self):
+        before = self.masks()
+        with mock.patch.object(permissions, 'bump_version', wraps=permissions.bump_version) as bump_version:
+            response = self.patch([
+                {'id': self.products.pk, 'permissions': 0},
+                {'id': 999, 'read_permission': True},
+                {'id': 998, 'read_permission': True},
+            ])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['ids'], [998, 999])
+        self.assertEqual(self.masks(), before)
+        bump_version.assert_not_called()
+
+    def test_one_version_bump_per_batch(self):
+        with mock.patch.object(permissions, 'bump_version', wraps=permissions.bump_version) as bump_version:
+            response = self.patch([
+                {'id': self.products.pk, 'update_permission': True},
+                {'id': self.orders.pk, 'update_permission': True},
+            ])
+        self.assertEqual(response.status_code, 200)
+        bump_version.assert_called_once()
+        self.assertEqual(response.json()['version'], permissions.current_version())
+        self.assertEqual(response['ETag'], f'"rules-{permissions.current_version()}"')
+
+    def test_effective_permissions_refreshed(self):
+        response = self.patch([{'id': self.products.pk, 'permissions': UPDATE}])
+        self.assertEqual(response.status_code, 200)
+        # bulk_update идет мимо сигналов, итоговые маски роли и ее наследника пересчитаны view
+        self.assertEqual(self.effective(self.parent, self.products), UPDATE)
+        self.assertEqual(self.effective(self.child, self.products), UPDATE)
+        self.assertTrue(permissions.get_matrix().check(self.child.pk, 'products', 'update'))
+        self.assertFalse(permissions.get_matrix().check(self.child.pk, 'products', 'read'))
+
+    def test_if_match(self):
+        etag = self.client.get('/api/admin/access-rules/', headers=self.headers)['ETag']
+        response = self.patch([{'id': self.products.pk, 'permissions': UPDATE}], **{'If-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        new_etag = response['ETag']
+        # ETag устарел после первого изменения
+        response = self.patch([{'id': self.products.pk, 'permissions': READ}], **{'If-Match': etag})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.masks()[self.products.pk], UPDATE)
+        response = self.patch([{'id': self.products.pk, 'permissions': READ}], **{'If-Match': new_etag})
+        self.assertEqual(response.status_code, 200)
+
+
+class AccessRulePutTests(AccessRuleTestCase):
+    def put(self, data, pk=None, content_type='application/json', **headers):
+        if content_type != 'application/json':
+            data = '&'.join(f'{key}={value}' for key, value in data.items())
+        return self.client.put(f'/api/admin/access-rules/{pk or self.products.pk}/', data,
+                               content_type=content_type, headers={**self.headers, **headers})
+
+    def test_flags_and_mask(self):
+        response = self.put({'update_permission': True, 'read_permission': False})
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.masks()[self.products.pk], UPDATE)
+        self.assertEqual(response['ETag'], f'"rules-{permissions.current_version()}"')
+        self.assertEqual(self.put({'permissions': READ | DELETE}).status_code, 200)
+        self.assertEqual(self.masks()[self.products.pk], READ | DELETE)
+        # Как у PATCH: итоговые права наследника пересчитаны
+        self.assertEqual(self.effective(self.child, self.products), READ | DELETE)
+
+    def test_string_values_rejected(self):
+        for data, content_type in (
+            ({'read_permission': 'false', 'delete_all_permission': '0'}, 'application/x-www-form-urlencoded'),
+            ({'read_permission': 'False'}, 'application/x-www-form-urlencoded'),
+            ({'read_permission': 'false'}, 'application/json'),
+            ({'read_permission': 0}, 'application/json'),
+            ({'permissions': 'abc'}, 'application/json'),
+            ({'permissions': 9999}, 'application/json'),
+            ({'permissions': -1}, 'application/json'),
+            ({'role': 'x'}, 'application/json'),
+            ({}, 'application/json'),
+        ):
+            with self.subTest(data=data, content_type=content_type):
+                response = self.put(data, content_type=content_type)
+                self.assertEqual(response.status_code, 400, response.content)
+                self.assertIn('error', response.json())
+        self.assertEqual(self.masks()[self.products.pk], READ)
+
+    def test_missing_rule(self):
+        response = self.put({'read_permission': True}, pk=999)
+        self.assertEqual(response.status_code, 404)
+
+    def test_if_match(self):
+        etag = self.client.get('/api/admin/access-rules/', headers=self.headers)['ETag']
+        self.patch([{'id': self.orders.pk, 'update_permission': True}])
+        response = self.put({'update_permission': True}, **{'If-Match': etag})
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual(self.masks()[self.products.pk], READ)
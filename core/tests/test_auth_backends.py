@@ -0,0 +1,17 @@
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.test import TestCase
+
+from core.models import User
+
+
+class LegacySessionTests(TestCase):
+    def test_session_created_by_model_backend_stays_logged_in(self):
+        # Сессии до RoleModelBackend хранят путь ModelBackend
+        user = User.objects.create_user('user@example.com', 'password')
+        session = self.client.session
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.save()
+        response = self.client.get('/profile/')
+        self.assertEqual(response.status_code, 200)
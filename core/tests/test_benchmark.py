@@ -0,0 +1,26 @@
+from unittest import mock
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+from core import benchmark
+
+
+class TestDatabaseTests(SimpleTestCase):
+    def test_sqlite_file_name_restored(self):
+        test_settings = connection.settings_dict['TEST']
+        old_name = test_settings.get('NAME')
+        with mock.patch.object(benchmark, 'setup_databases') as setup_databases, \
+                mock.patch.object(benchmark, 'teardown_databases'), \
+                mock.patch.object(benchmark, 'setup_test_environment'), \
+                mock.patch.object(benchmark, 'teardown_test_environment'):
+            with benchmark.test_database(sqlite_file='/tmp/benchmark.sqlite3'):
+                if connection.vendor == 'sqlite':
+                    self.assertEqual(test_settings['NAME'], '/tmp/benchmark.sqlite3')
+            self.assertEqual(test_settings.get('NAME'), old_name)
+
+            setup_databases.side_effect = RuntimeError
+            with self.assertRaises(RuntimeError):
+                with benchmark.test_database(sqlite_file='/tmp/benchmark.sqlite3'):
+                    pass
+            self.assertEqual(test_settings.get('NAME'), old_name)
@@ -0,0 +1,174 @@
+from contextlib import ExitStack
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import connections
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from core import db_routing, permissions
+from core.api.views.auth_views import create_jwt_token
+from core.models import AccessRule, BusinessElement, Product, ReplicaHeartbeat, Role, User
+from core.principals import principal_cache
+
+REPLICA = 'replica'
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA], DATABASE_REPLICA_MAX_LAG=2, DATABASE_PIN_SECONDS=5)
+class ReplicaRoutingTests(TransactionTestCase):
+    """Реплика - второе соединение с той же тестовой БД, так что данные на ней есть сразу."""
+
+    # Алиас реплики появляется только в setUpClass, '__all__' подхватывает его там
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        primary = connections['default'].settings_dict
+        connections.settings[REPLICA] = {**primary, 'TEST': {**primary['TEST'], 'MIRROR': 'default'}}
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        # Замеры в тестах делает check(), фоновый поток не нужен
+        patcher = mock.patch.object(db_routing.replica_lag, 'ensure_started')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(db_routing.replica_lag.lag.clear)
+        role = Role.objects.create(name='user')
+        AccessRule.objects.create(
+            role=role, element=BusinessElement.objects.create(name='products'),
+            read_permission=True, read_all_permission=True,
+        )
+        permissions.bump_version()
+        # Матрица прав всегда читается из primary, загружаем ее заранее, чтобы считать только запросы view
+        permissions.get_matrix()
+        self.user = User.objects.create_user('user@example.com', 'password', role=role,
+                                             first_name='A', last_name='B')
+        self.headers = {'Authorization': f'Bearer {create_jwt_token(self.user)}'}
+        cache.delete(db_routing.PIN_CACHE_KEY.format(self.user.pk))
+
+    def set_lag(self, lag):
+        with mock.patch.object(db_routing.replica_lag, 'measure', return_value=lag):
+            db_routing.replica_lag.check()
+
+    def capture(self):
+        stack = ExitStack()
+        captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in ('default', REPLICA)]
+        return stack, captured
+
+    def queries(self, path, status=200):
+        stack, (primary, replica) = self.capture()
+        with stack:
+            response = self.client.get(path, headers=self.headers)
+        self.assertEqual(response.status_code, status, response.content)
+        return [query['sql'] for query in primary], [query['sql'] for query in replica]
+
+    def get(self, path):
+        primary, replica = self.queries(path)
+        return len(primary), len(replica)
+
+    async def aget(self, path):
+        # Соединения привязаны к потоку: запросы view идут в потоке sync_to_async, там и считаем
+        stack, (primary, replica) = await sync_to_async(self.capture)()
+        try:
+            response = await self.async_client.get(path, headers=self.headers)
+        finally:
+            await sync_to_async(stack.close)()
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(primary), len(replica)
+
+    def test_check_writes_heartbeat_outside_requests(self):
+        db_routing.replica_lag.check()
+        self.assertEqual(db_routing.replica_lag.lag[REPLICA], 0.0)
+        self.assertTrue(ReplicaHeartbeat.objects.filter(alias=REPLICA).exists())
+        with mock.patch.object(db_routing.replica_lag, 'measure') as measure:
+            self.get('/api/products/')
+        measure.assert_not_called()
+
+    def test_reads_go_to_healthy_replica(self):
+        self.set_lag(0.0)
+        primary, replica = self.get('/api/products/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_lagging_or_unmeasured_replica_falls_back_to_primary(self):
+        self.assertEqual(self.get('/api/products/')[1], 0)
+        self.set_lag(10.0)
+        self.assertEqual(self.get('/api/products/')[1], 0)
+        self.set_lag(0.0)
+        with mock.patch('core.db_routing.time.monotonic', return_value=db_routing.time.monotonic() + 60):
+            self.assertEqual(self.get('/api/products/')[1], 0)
+
+    def test_writer_is_pinned_to_primary(self):
+        self.set_lag(0.0)
+        response = self.client.put('/api/profile/', {'email': self.user.email, 'first_name': 'Z', 'last_name': 'B'},
+                                   content_type='application/json', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        primary, replica = self.get('/api/products/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    async def test_asgi_reads_go_to_healthy_replica(self):
+        await sync_to_async(self.set_lag)(0.0)
+        primary, replica = await self.aget('/api/products/')
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    async def test_asgi_lag_check_does_not_touch_database(self):
+        # Раньше первый запрос замерял отставание синхронным ORM прямо в event loop
+        with mock.patch.object(db_routing.replica_lag, 'measure') as measure:
+            primary, replica = await self.aget('/api/products/')
+        measure.assert_not_called()
+        self.assertEqual(replica, 0)
+        await sync_to_async(self.set_lag)(10.0)
+        self.assertEqual((await self.aget('/api/products/'))[1], 0)
+
+    async def test_asgi_writer_is_pinned_to_primary(self):
+        await sync_to_async(self.set_lag)(0.0)
+        response = await self.async_client.put(
+            '/api/profile/', {'email': self.user.email, 'first_name': 'Z', 'last_name': 'B'},
+            content_type='application/json', headers=self.headers,
+        )
+        self.assertEqual(response.status_code, 200)
+        primary, replica = await self.aget('/api/products/')
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_matrix_reload_reads_primary_within_lag(self):
+        # Реплика в пределах допустимого отставания могла не получить отзыв права,
+        # а версия в кэше уже новая: матрица под ней строится из primary
+        self.set_lag(1.0)
+        rule = AccessRule.objects.get()
+        rule.read_permission = False
+        rule.read_all_permission = False
+        rule.save()
+        primary, replica = self.queries('/api/products/', status=403)
+        self.assertTrue(any('effective_permission' in sql for sql in primary))
+        self.assertFalse(any('effective_permission' in sql for sql in replica))
+        self.assertFalse(permissions.get_matrix().check(self.user.role_id, 'products', 'read'))
+
+    def test_page_cache_reads_primary_for_recent_versions(self):
+        self.client.force_login(self.user)
+        cache.delete(db_routing.PIN_CACHE_KEY.format(self.user.pk))
+        self.set_lag(1.0)
+        Product.objects.create(name='new', price=10, owner=self.user)
+        # Версия данных товаров только что сменилась: страница под ней собирается из primary
+        primary, replica = self.queries('/products/')
+        self.assertTrue(any('"product"' in sql for sql in primary))
+        self.assertFalse(any('"product"' in sql for sql in replica))
+
+        # Версии старше допустимого отставания реплика уже видит
+        later = db_routing.time.time_ns() + 10 * 10 ** 9
+        with mock.patch('core.db_routing.time.time_ns', return_value=later):
+            primary, replica = self.queries('/products/?sort=price')
+        self.assertFalse(any('"product"' in sql for sql in primary))
+        self.assertTrue(any('"product"' in sql for sql in replica))
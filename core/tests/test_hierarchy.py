@@ -0,0 +1,83 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import hierarchy, permissions
+from core.models import AccessRule, BusinessElement, EffectivePermission, Role, User
+from core.permissions import PERMISSION_BITS
+
+
+class RefreshEffectiveTests(TestCase):
+    def setUp(self):
+        self.element = BusinessElement.objects.create(name='products')
+        self.parent = Role.objects.create(name='parent')
+        self.child = Role.objects.create(name='child')
+        self.child.parents.add(self.parent)
+
+    def test_concurrent_insert_of_same_row(self):
+        AccessRule.objects.create(role=self.parent, element=self.element, read_permission=True)
+        EffectivePermission.objects.all().delete()
+        bulk_create = EffectivePermission.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Параллельный пересчет успел вставить те же строки после нашего чтения
+            bulk_create([EffectivePermission(role_id=obj.role_id, element_id=obj.element_id, mask=0) for obj in objs])
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(EffectivePermission.objects, 'bulk_create', racing_bulk_create):
+            hierarchy.refresh_effective({self.parent.pk})
+        masks = dict(EffectivePermission.objects.values_list('role_id', 'mask'))
+        self.assertEqual(masks, {self.parent.pk: PERMISSION_BITS['read'], self.child.pk: PERMISSION_BITS['read']})
+
+
+class MovedRuleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.orders = BusinessElement.objects.create(name='orders')
+        self.products = BusinessElement.objects.create(name='products')
+        self.a = Role.objects.create(name='a')
+        self.b = Role.objects.create(name='b')
+        self.child = Role.objects.create(name='child')
+        self.child.parents.add(self.a)
+        AccessRule.objects.create(role=self.a, element=self.orders, read_permission=True)
+
+    def masks(self):
+        return {
+            (role, element): mask
+            for role, element, mask in EffectivePermission.objects.values_list('role__name', 'element__name', 'mask')
+        }
+
+    def test_rule_moved_to_other_role(self):
+        rule = AccessRule.objects.get()
+        rule.role = self.b
+        with self.captureOnCommitCallbacks(execute=True):
+            rule.save()
+        self.assertEqual(self.masks(), {('b', 'orders'): PERMISSION_BITS['read']})
+        matrix = permissions.get_matrix()
+        self.assertFalse(matrix.check(self.a.pk, 'orders', 'read'))
+        self.assertFalse(matrix.check(self.child.pk, 'orders', 'read'))
+        self.assertTrue(matrix.check(self.b.pk, 'orders', 'read'))
+
+    def test_rule_moved_to_other_element(self):
+        rule = AccessRule.objects.get()
+        rule.element = self.products
+        rule.save()
+        self.assertEqual(self.masks(), {
+            ('a', 'products'): PERMISSION_BITS['read'], ('child', 'products'): PERMISSION_BITS['read'],
+        })
+        # Повторное сохранение сравнивает уже с новым местом
+        rule.role = self.b
+        rule.save()
+        self.assertEqual(self.masks(), {('b', 'products'): PERMISSION_BITS['read']})
+
+    def test_rule_moved_in_admin(self):
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.client.force_login(admin)
+        rule = AccessRule.objects.get()
+        response = self.client.post(f'/admin/core/accessrule/{rule.pk}/change/', {
+            'role': self.b.pk, 'element': self.orders.pk, 'permissions': PERMISSION_BITS['read'],
+            'read_permission': 'on',
+        })
+        self.assertEqual(response.status_code, 302, response.content[:2000])
+        self.assertEqual(self.masks(), {('b', 'orders'): PERMISSION_BITS['read']})
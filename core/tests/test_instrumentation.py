@@ -0,0 +1,34 @@
+from django.test import TestCase, override_settings
+
+from core.instrumentation import registry
+
+
+class InstrumentationTests(TestCase):
+    @override_settings(SERVER_TIMING=False)
+    def test_server_timing_is_off_by_default_outside_debug(self):
+        response = self.client.post('/api/login/', {'email': 'nobody@example.com', 'password': 'x'},
+                                    content_type='application/json')
+        self.assertNotIn('Server-Timing', response)
+
+    @override_settings(SERVER_TIMING=True)
+    def test_server_timing_when_enabled(self):
+        response = self.client.get('/api/')
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+    @override_settings(METRICS_TOKEN='', DEBUG=False)
+    def test_metrics_closed_without_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_with_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 403)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_unknown_methods_share_one_label(self):
+        self.client.generic('FOOBAR', '/api/')
+        text = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').content.decode()
+        self.assertIn('route="/api/",method="OTHER"', text)
+        self.assertNotIn('FOOBAR', text)
+        self.assertNotIn(('/api/', 'FOOBAR'), registry.durations)
@@ -0,0 +1,54 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.test import TestCase
+
+from core.api.views.auth_views import create_jwt_token
+from core.models import Product, User
+from core.principals import principal_cache
+
+
+def make_cursor(payload):
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip('=')
+
+
+class CursorTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.headers = {'Authorization': f'Bearer {create_jwt_token(admin)}'}
+        for price in (10, 20, 30):
+            Product.objects.create(name=f'p{price}', price=price)
+
+    def get(self, **params):
+        return self.client.get('/api/products/', params, headers=self.headers)
+
+    def test_next_page(self):
+        response = self.get(sort='price', limit=2)
+        self.assertEqual([item['price'] for item in response.json()], [10, 20])
+        cursor = response['Link'].split('cursor=')[1].split('>')[0]
+        response = self.get(sort='price', limit=2, cursor=cursor)
+        self.assertEqual([item['price'] for item in response.json()], [30])
+
+    def test_crafted_cursors_are_rejected(self):
+        cursors = [
+            ['id', 0, 'abc'],
+            ['id', 0, 1.5],
+            ['id', 0, True],
+            ['price', {'a': 1}, 1],
+            ['price', [1], 1],
+            ['price', None, 1],
+            ['price', 'abc', 1],
+            ['created_at', 'abc', 1],
+        ]
+        for payload in cursors:
+            with self.subTest(payload=payload):
+                response = self.get(sort=payload[0], cursor=make_cursor(payload))
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.json(), {'error': 'Некорректный курсор'})
+
+    def test_garbage_cursor(self):
+        self.assertEqual(self.get(cursor='!!!').status_code, 400)
+        self.assertEqual(self.get(cursor=make_cursor({'a': 1})).status_code, 400)
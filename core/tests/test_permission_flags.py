@@ -0,0 +1,68 @@
+from django.core.exceptions import ValidationError
+from django.forms import modelform_factory
+from django.test import TestCase
+
+from core.models import AccessRule, BusinessElement, Role
+from core.permissions import PERMISSION_BITS
+
+
+class PermissionFlagTests(TestCase):
+    def setUp(self):
+        self.role = Role.objects.create(name='user')
+        self.element = BusinessElement.objects.create(name='orders')
+
+    def test_constructor_flags_set_mask_bits(self):
+        rule = AccessRule.objects.create(role=self.role, element=self.element,
+                                         read_permission=True, update_permission=True)
+        rule = AccessRule.objects.get(pk=rule.pk)
+        self.assertEqual(rule.permissions, PERMISSION_BITS['read'] | PERMISSION_BITS['update'])
+        self.assertTrue(rule.read_permission)
+        self.assertTrue(rule.update_permission)
+        self.assertFalse(rule.delete_permission)
+
+    def test_flags_combine_with_mask(self):
+        rule = AccessRule(role=self.role, element=self.element, permissions=PERMISSION_BITS['read'],
+                          delete_permission=True)
+        self.assertEqual(rule.permissions, PERMISSION_BITS['read'] | PERMISSION_BITS['delete'])
+
+    def test_clearing_flag_clears_only_its_bit(self):
+        rule = AccessRule.objects.create(role=self.role, element=self.element,
+                                         read_permission=True, read_all_permission=True)
+        rule.read_all_permission = False
+        rule.save()
+        self.assertEqual(AccessRule.objects.get(pk=rule.pk).permissions, PERMISSION_BITS['read'])
+
+    def test_flags_have_no_columns(self):
+        AccessRule.objects.create(role=self.role, element=self.element, update_permission=True)
+        row = AccessRule.objects.values().get()
+        self.assertNotIn('update_permission', row)
+        self.assertEqual(row['permissions'], PERMISSION_BITS['update'])
+        self.assertTrue(AccessRule.objects.filter(permissions__has_bits=PERMISSION_BITS['update']).exists())
+        self.assertFalse(AccessRule.objects.filter(permissions__has_bits=PERMISSION_BITS['read']).exists())
+
+    def test_model_form(self):
+        Form = modelform_factory(AccessRule, fields=['role', 'element', 'read_permission', 'create_permission'])
+        form = Form({'role': self.role.pk, 'element': self.element.pk, 'read_permission': 'on'})
+        self.assertTrue(form.is_valid(), form.errors)
+        rule = form.save()
+        self.assertEqual(rule.permissions, PERMISSION_BITS['read'])
+        form = Form({'role': self.role.pk, 'element': self.element.pk, 'create_permission': 'on'}, instance=rule)
+        self.assertTrue(form.is_valid(), form.errors)
+        self.assertEqual(form.save().permissions, PERMISSION_BITS['create'])
+
+    def test_values_converted_like_boolean_field(self):
+        rule = AccessRule(role=self.role, element=self.element, permissions=PERMISSION_BITS['read'])
+        for value in (False, 0, '0', 'False', 'f'):
+            with self.subTest(value=value):
+                rule.read_permission = True
+                rule.read_permission = value
+                self.assertEqual(rule.permissions, 0)
+        for value in (True, 1, '1', 'True', 't'):
+            with self.subTest(value=value):
+                rule.read_permission = value
+                self.assertEqual(rule.permissions, PERMISSION_BITS['read'])
+        for value in ('false', 'abc', 2):
+            with self.subTest(value=value):
+                with self.assertRaises(ValidationError):
+                    rule.delete_all_permission = value
+        self.assertEqual(rule.permissions, PERMISSION_BITS['read'])
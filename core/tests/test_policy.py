@@ -0,0 +1,190 @@
+import io
+import json
+import os
+import tempfile
+
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from core import permissions
+from core.models import AccessRule, BusinessElement, EffectivePermission, Role
+from core.permissions import PERMISSION_BITS, actions_mask
+from core.policy import PolicyError, apply_diff, diff_policy, parse_policy
+
+ELEMENTS = {'products': 'Товары', 'orders': 'Заказы'}
+
+
+def policy(roles, elements=ELEMENTS):
+    return {'elements': elements, 'roles': roles}
+
+
+class SyncPermissionsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def sync(self, data, *args):
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8') as source:
+            json.dump(data, source)
+        self.addCleanup(os.unlink, source.name)
+        out = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('sync_permissions', source.name, *args, stdout=out)
+        return out.getvalue()
+
+    def rules(self):
+        return {
+            (role, element): mask
+            for role, element, mask in AccessRule.objects.values_list('role__name', 'element__name', 'permissions')
+        }
+
+    def parents(self):
+        return {(role.name, parent.name) for role in Role.objects.all() for parent in role.parents.all()}
+
+    def effective(self):
+        return {
+            (role, element): mask
+            for role, element, mask in EffectivePermission.objects.values_list('role__name', 'element__name', 'mask')
+        }
+
+    def test_creates_everything(self):
+        version = permissions.current_version()
+        self.sync(policy({
+            'user': {'description': 'Пользователь', 'rules': {'products': ['read']}},
+            'manager': {'parents': ['user'], 'rules': {'orders': ['read', 'read_all']}},
+            'admin': {'rules': {'products': '*'}},
+        }))
+        self.assertEqual(dict(BusinessElement.objects.values_list('name', 'description')), ELEMENTS)
+        self.assertEqual(Role.objects.get(name='user').description, 'Пользователь')
+        self.assertEqual(self.parents(), {('manager', 'user')})
+        self.assertEqual(self.rules(), {
+            ('user', 'products'): PERMISSION_BITS['read'],
+            ('manager', 'orders'): actions_mask(['read', 'read_all']),
+            ('admin', 'products'): permissions.ALL_PERMISSIONS,
+        })
+        # Пересчет после deferred_refresh учитывает наследование
+        self.assertEqual(self.effective(), {
+            ('user', 'products'): PERMISSION_BITS['read'],
+            ('manager', 'products'): PERMISSION_BITS['read'],
+            ('manager', 'orders'): actions_mask(['read', 'read_all']),
+            ('admin', 'products'): permissions.ALL_PERMISSIONS,
+        })
+        self.assertNotEqual(permissions.current_version(), version)
+        self.assertIn('Права совпадают с политикой', self.sync(policy({
+            'user': {'description': 'Пользователь', 'rules': {'products': ['read']}},
+            'manager': {'parents': ['user'], 'rules': {'orders': ['read', 'read_all']}},
+            'admin': {'rules': {'products': '*'}},
+        })))
+
+    def test_updates_and_deletes_rules_and_parents(self):
+        self.sync(policy({
+            'base': {'rules': {'products': ['read']}},
+            'extra': {'rules': {'orders': ['read']}},
+            'user': {'parents': ['base'], 'rules': {'products': ['read'], 'orders': ['read']}},
+        }))
+        out = self.sync(policy({
+            'base': {'description': 'Базовая', 'rules': {'products': ['read']}},
+            'extra': {'rules': {'orders': ['read']}},
+            'user': {'parents': ['extra'], 'rules': {'products': ['read', 'update']}},
+        }))
+        self.assertIn('ролей +0 ~1 -0', out)
+        self.assertIn('наследований +1 -1', out)
+        self.assertIn('правил +0 ~1 -1', out)
+        self.assertEqual(Role.objects.get(name='base').description, 'Базовая')
+        self.assertEqual(self.parents(), {('user', 'extra')})
+        self.assertEqual(self.rules(), {
+            ('base', 'products'): PERMISSION_BITS['read'],
+            ('extra', 'orders'): PERMISSION_BITS['read'],
+            ('user', 'products'): actions_mask(['read', 'update']),
+        })
+        self.assertEqual(self.effective(), {
+            ('base', 'products'): PERMISSION_BITS['read'],
+            ('extra', 'orders'): PERMISSION_BITS['read'],
+            ('user', 'products'): actions_mask(['read', 'update']),
+            ('user', 'orders'): PERMISSION_BITS['read'],
+        })
+
+    def test_roles_outside_policy_kept_without_prune(self):
+        old = Role.objects.create(name='old')
+        legacy = BusinessElement.objects.create(name='users')
+        AccessRule.objects.create(role=old, element=legacy, read_permission=True)
+        self.sync(policy({'user': {'rules': {'products': ['read']}}}))
+        self.assertTrue(Role.objects.filter(name='old').exists())
+        self.assertIn(('old', 'users'), self.rules())
+
+    def test_prune_cascades(self):
+        self.sync(policy({
+            'old': {'rules': {'products': ['read', 'update'], 'orders': ['read']}},
+            'user': {'parents': ['old'], 'rules': {'products': ['read']}},
+        }))
+        self.assertEqual(self.effective()[('user', 'orders')], PERMISSION_BITS['read'])
+        out = self.sync(policy({'user': {'rules': {'products': ['read']}}}, {'products': 'Товары'}), '--prune')
+        self.assertIn('- роль old (вместе с правилами)', out)
+        self.assertIn('- элемент orders (вместе с правилами)', out)
+        self.assertEqual(list(Role.objects.values_list('name', flat=True)), ['user'])
+        self.assertEqual(list(BusinessElement.objects.values_list('name', flat=True)), ['products'])
+        self.assertEqual(self.parents(), set())
+        self.assertEqual(self.rules(), {('user', 'products'): PERMISSION_BITS['read']})
+        self.assertEqual(self.effective(), {('user', 'products'): PERMISSION_BITS['read']})
+
+    def test_dry_run_writes_nothing(self):
+        Role.objects.create(name='old')
+        version = permissions.current_version()
+        out = self.sync(policy({
+            'user': {'rules': {'products': ['read']}},
+            'manager': {'parents': ['user']},
+        }), '--dry-run', '--prune')
+        self.assertIn('+ правило user/products: read', out)
+        self.assertIn('- роль old', out)
+        self.assertIn('--dry-run', out)
+        self.assertEqual(list(Role.objects.values_list('name', flat=True)), ['old'])
+        self.assertFalse(BusinessElement.objects.exists())
+        self.assertFalse(AccessRule.objects.exists())
+        self.assertFalse(EffectivePermission.objects.exists())
+        self.assertEqual(permissions.current_version(), version)
+
+    def test_cycles_rejected(self):
+        self.sync(policy({'a': {}, 'b': {'parents': ['a']}}))
+        for roles in (
+            {'a': {'parents': ['b']}, 'b': {'parents': ['a']}},
+            {'a': {'parents': ['a']}, 'b': {'parents': ['a']}},
+            {'a': {'parents': ['c']}, 'b': {'parents': ['a']}, 'c': {'parents': ['b']}},
+        ):
+            with self.subTest(roles=roles):
+                with self.assertRaisesMessage(CommandError, 'наследует сама от себя'):
+                    self.sync(policy(roles))
+        self.assertEqual(self.parents(), {('b', 'a')})
+
+    def test_invalid_policies(self):
+        for data in (
+            [],
+            {'roles': {}, 'extra': {}},
+            {'roles': ['user']},
+            {'elements': {'products': 1}},
+            {'roles': {'user': ['admin']}},
+            {'roles': {'user': {'rules': ['products']}}},
+            {'roles': {'user': {'rules': 'products'}}},
+            {'roles': {'user': {'parents': 'admin'}}},
+            {'roles': {'user': {'parents': [1]}}},
+            {'roles': {'user': {'parents': ['admin']}}},
+            {'roles': {'user': {'rules': {'orders': ['read']}}}},
+            {'elements': ELEMENTS, 'roles': {'user': {'rules': {'orders': ['fly']}}}},
+        ):
+            with self.subTest(data=data):
+                with self.assertRaises(PolicyError):
+                    parse_policy(data)
+
+    def test_diff_and_apply(self):
+        role = Role.objects.create(name='user')
+        element = BusinessElement.objects.create(name='products', description='Товары')
+        AccessRule.objects.create(role=role, element=element, read_permission=True)
+        diff = diff_policy(*parse_policy(policy({'user': {'rules': {'orders': ['read']}}})))
+        self.assertEqual(set(diff.elements['create']), {'orders'})
+        self.assertEqual(set(diff.rules['create']), {('user', 'orders')})
+        self.assertEqual(set(diff.rules['delete']), {('user', 'products')})
+        self.assertFalse(diff.rules['update'])
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_diff(diff)
+        self.assertEqual(self.rules(), {('user', 'orders'): PERMISSION_BITS['read']})
+        self.assertEqual(self.effective(), {('user', 'orders'): PERMISSION_BITS['read']})
+        self.assertFalse(diff_policy(*parse_policy(policy({'user': {'rules': {'orders': ['read']}}}))))
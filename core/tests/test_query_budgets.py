@@ -0,0 +1,40 @@
+import io
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+
+from core.api.views import MockProductsView
+from core.benchmark import BENCHMARK_METRICS_TOKEN, SCENARIOS, build_dataset
+from core.management.commands.check_query_budgets import Command
+from core.principals import principal_cache
+from core.query_budget import QueryBudget
+
+
+@override_settings(METRICS_TOKEN=BENCHMARK_METRICS_TOKEN)
+class QueryBudgetTests(TransactionTestCase):
+    """Сценарии check_query_budgets в тестовой БД: превышение бюджета любой view роняет тесты."""
+
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        self.dataset = build_dataset(users=5, products=30, orders=30)
+        self.command = Command(stdout=io.StringIO(), stderr=io.StringIO())
+
+    def check(self, url_set, scenarios=SCENARIOS):
+        failures, _, checked = self.command.check_budgets(scenarios, self.dataset, 3, [url_set])
+        self.assertTrue(checked)
+        return failures
+
+    def test_sync_views(self):
+        self.assertEqual(self.check('sync'), [])
+
+    def test_async_views(self):
+        self.assertEqual(self.check('async'), [])
+
+    def test_exceeded_budget_fails(self):
+        scenarios = [scenario for scenario in SCENARIOS if scenario.name == 'api_products']
+        with mock.patch.object(MockProductsView, 'query_budget', {'get': QueryBudget(0)}):
+            failures = self.check('sync', scenarios)
+        self.assertEqual(len(failures), 1)
+        self.assertIn('MockProductsView.get', failures[0])
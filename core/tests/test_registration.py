@@ -0,0 +1,63 @@
+import io
+import os
+import tempfile
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core import hashing
+from core.models import Role, User
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class DuplicateEmailTests(TestCase):
+    def setUp(self):
+        User.objects.create_user('taken@example.com', 'password')
+
+    def test_api_register_checks_email_before_hashing(self):
+        data = {
+            'email': 'taken@EXAMPLE.com', 'first_name': 'A', 'last_name': 'B',
+            'password': 'pw', 'password_confirm': 'pw',
+        }
+        with mock.patch.object(hashing, 'make_password') as make_password:
+            response = self.client.post('/api/register/', data, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        make_password.assert_not_called()
+
+    def test_web_register_checks_email_before_hashing(self):
+        data = {
+            'email': 'taken@example.com', 'first_name': 'A', 'last_name': 'B',
+            'password': 'pw', 'password_confirm': 'pw',
+        }
+        with mock.patch.object(hashing, 'make_password') as make_password:
+            response = self.client.post('/register/', data)
+        self.assertEqual(response.status_code, 200)
+        make_password.assert_not_called()
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class ImportUsersTests(TestCase):
+    def setUp(self):
+        Role.objects.create(name='user')
+        User.objects.create_user('old@example.com', 'password')
+
+    def import_csv(self, text):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False, encoding='utf-8') as source:
+            source.write(text)
+        self.addCleanup(os.unlink, source.name)
+        out = io.StringIO()
+        call_command('import_users', source.name, stdout=out, stderr=io.StringIO())
+        return out.getvalue()
+
+    def test_reports_inserted_rows(self):
+        out = self.import_csv(
+            'email,password\n'
+            'old@example.com,pw\n'
+            'new@example.com,pw\n'
+            'new@example.com,pw\n'
+            ',pw\n'
+        )
+        self.assertIn('добавлено 1, уже были 2, пропущено 1', out)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertTrue(User.objects.get(email='old@example.com').check_password('password'))
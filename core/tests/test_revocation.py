@@ -0,0 +1,110 @@
+import threading
+import time
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+
+from core.api.views.auth_views import create_jwt_token
+from core.models import User
+from core.revocation import ENTRY_CACHE_KEY, SEQUENCE_CACHE_KEY, RevocationStore
+
+
+def exp_in(seconds):
+    return time.time() + seconds
+
+
+class RevocationStoreTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_revocation_reaches_other_worker(self):
+        writer, reader = RevocationStore(1000), RevocationStore(1000)
+        self.assertFalse(reader.is_revoked('a'))
+        writer.revoke('a', exp_in(60))
+        self.assertTrue(reader.is_revoked('a'))
+        self.assertFalse(reader.is_revoked('b'))
+
+    def test_reader_waits_for_entry_written_after_sequence(self):
+        # Номер уже выдан, а запись еще не записана: читатель не должен проскочить ее
+        reader = RevocationStore(1000)
+        cache.set(SEQUENCE_CACHE_KEY, 1, timeout=None)
+        self.assertFalse(reader.is_revoked('a'))
+        self.assertEqual(reader.stats()['sequence'], 0)
+        cache.set(ENTRY_CACHE_KEY.format(1), ('a', exp_in(60)))
+        self.assertTrue(reader.is_revoked('a'))
+        self.assertEqual(reader.stats()['sequence'], 1)
+
+    def test_missing_entry_is_skipped_after_gap_timeout(self):
+        reader = RevocationStore(1000, gap_timeout=5)
+        cache.set(SEQUENCE_CACHE_KEY, 2, timeout=None)
+        cache.set(ENTRY_CACHE_KEY.format(2), ('b', exp_in(60)))
+        self.assertTrue(reader.is_revoked('b'))
+        self.assertEqual(reader.stats()['sequence'], 0)
+        with mock.patch('core.revocation.time.time', return_value=time.time() + 10):
+            reader.refresh()
+        self.assertEqual(reader.stats()['sequence'], 2)
+
+    def test_duplicate_sequence_does_not_overwrite_entry(self):
+        # Неатомарный incr (FileBasedCache) выдает двум отзывам один номер
+        writer, reader = RevocationStore(1000), RevocationStore(1000)
+        incr = cache.incr
+        racy = iter([1, 1])
+
+        def racy_incr(key, delta=1):
+            # Оба отзыва прочитали 0 и записали 1
+            seq = next(racy, None)
+            if seq is None:
+                return incr(key, delta)
+            cache.set(key, seq, timeout=None)
+            return seq
+
+        with mock.patch.object(cache, 'incr', racy_incr):
+            writer.revoke('a', exp_in(60))
+            writer.revoke('b', exp_in(60))
+        self.assertTrue(reader.is_revoked('a'))
+        self.assertTrue(reader.is_revoked('b'))
+
+    def test_concurrent_revocations(self):
+        writers = [RevocationStore(1000) for _ in range(8)]
+        barrier = threading.Barrier(len(writers))
+
+        def revoke(n, store):
+            barrier.wait()
+            for i in range(25):
+                store.revoke(f'{n}-{i}', exp_in(60))
+
+        threads = [threading.Thread(target=revoke, args=(n, store)) for n, store in enumerate(writers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        reader = RevocationStore(1000)
+        self.assertTrue(all(reader.is_revoked(f'{n}-{i}') for n in range(8) for i in range(25)))
+        self.assertEqual(reader.stats()['sequence'], 200)
+
+    def test_new_worker_starts_from_snapshot(self):
+        writer = RevocationStore(1000, snapshot_interval=10)
+        for i in range(25):
+            writer.revoke(str(i), exp_in(60))
+        reader = RevocationStore(1000, snapshot_interval=10)
+        with mock.patch.object(cache, 'get_many', wraps=cache.get_many) as get_many:
+            self.assertTrue(all(reader.is_revoked(str(i)) for i in range(25)))
+        self.assertEqual(len(get_many.call_args_list[0].args[0]), 5)
+
+
+class LogoutRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_logout_revokes_token_on_every_worker(self):
+        user = User.objects.create_user('user@example.com', 'password')
+        token = create_jwt_token(user)
+        headers = {'HTTP_AUTHORIZATION': f'Bearer {token}'}
+        self.assertEqual(self.client.get('/api/profile/', **headers).status_code, 200)
+        self.client.post('/api/logout/', **headers)
+        jti = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])['jti']
+        self.assertTrue(RevocationStore(1000).is_revoked(jti))
+        self.assertEqual(self.client.get('/api/products/', **headers).status_code, 403)
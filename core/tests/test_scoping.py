@@ -0,0 +1,120 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from core import permissions
+from core.api.views.auth_views import create_jwt_token
+from core.benchmark import url_set
+from core.models import AccessRule, BusinessElement, Order, Product, Role, User
+from core.principals import principal_cache
+from core.scoping import scope_queryset
+
+
+class ReadScopeTests(TestCase):
+    """read - только свои записи, read_all - все, суперпользователь - все, без роли - ничего."""
+
+    def setUp(self):
+        cache.clear()
+        principal_cache.clear()
+        own = Role.objects.create(name='own')
+        everything = Role.objects.create(name='all')
+        for name in ('products', 'orders'):
+            element = BusinessElement.objects.create(name=name)
+            AccessRule.objects.create(role=own, element=element, read_permission=True)
+            AccessRule.objects.create(role=everything, element=element, read_permission=True,
+                                      read_all_permission=True)
+        permissions.bump_version()
+
+        self.owner = User.objects.create_user('owner@example.com', 'password', role=own)
+        self.other = User.objects.create_user('other@example.com', 'password', role=own)
+        self.reader = User.objects.create_user('reader@example.com', 'password', role=everything)
+        self.admin = User.objects.create_superuser('admin@example.com', 'password')
+        self.nobody = User.objects.create_user('nobody@example.com', 'password')
+
+        self.products = {
+            'owner': [Product.objects.create(name=f'owner-{i}', price=10, owner=self.owner).pk for i in range(2)],
+            'other': [Product.objects.create(name='other-0', price=10, owner=self.other).pk],
+            'none': [Product.objects.create(name='none-0', price=10).pk],
+        }
+        product = Product.objects.get(pk=self.products['none'][0])
+        self.orders = {
+            'owner': [Order.objects.create(product=product, amount=1, owner=self.owner).pk for _ in range(2)],
+            'other': [Order.objects.create(product=product, amount=1, owner=self.other).pk],
+            'none': [Order.objects.create(product=product, amount=1).pk],
+        }
+
+    def expected(self, user):
+        if user in (self.reader, self.admin):
+            owners = ('owner', 'other', 'none')
+        else:
+            owners = ('owner',) if user == self.owner else ('other',)
+        return (
+            sorted(pk for owner in owners for pk in self.products[owner]),
+            sorted(pk for owner in owners for pk in self.orders[owner]),
+        )
+
+    def headers(self, user):
+        return {'Authorization': f'Bearer {create_jwt_token(user)}'}
+
+    def api_ids(self, response):
+        self.assertEqual(response.status_code, 200, response.content)
+        return sorted(item['id'] for item in response.json())
+
+    def test_scope_queryset(self):
+        for user in (self.owner, self.other, self.reader, self.admin):
+            with self.subTest(user=user.email):
+                self.assertEqual(
+                    (sorted(scope_queryset(Product.objects.all(), user, 'products').values_list('pk', flat=True)),
+                     sorted(scope_queryset(Order.objects.all(), user, 'orders').values_list('pk', flat=True))),
+                    self.expected(user),
+                )
+        self.assertFalse(scope_queryset(Product.objects.all(), self.nobody, 'products').exists())
+        self.assertFalse(scope_queryset(Order.objects.all(), self.nobody, 'orders').exists())
+
+    def test_api(self):
+        for user in (self.owner, self.other, self.reader, self.admin):
+            with self.subTest(user=user.email):
+                headers = self.headers(user)
+                self.assertEqual(
+                    (self.api_ids(self.client.get('/api/products/', headers=headers)),
+                     self.api_ids(self.client.get('/api/orders/', headers=headers))),
+                    self.expected(user),
+                )
+        headers = self.headers(self.nobody)
+        self.assertEqual(self.client.get('/api/products/', headers=headers).status_code, 403)
+        self.assertEqual(self.client.get('/api/orders/', headers=headers).status_code, 403)
+
+    async def test_async_api(self):
+        with url_set(True):
+            for user in (self.owner, self.other, self.reader, self.admin):
+                with self.subTest(user=user.email):
+                    headers = self.headers(user)
+                    self.assertEqual(
+                        (self.api_ids(await self.async_client.get('/api/products/', headers=headers)),
+                         self.api_ids(await self.async_client.get('/api/orders/', headers=headers))),
+                        self.expected(user),
+                    )
+            headers = self.headers(self.nobody)
+            self.assertEqual((await self.async_client.get('/api/products/', headers=headers)).status_code, 403)
+            self.assertEqual((await self.async_client.get('/api/orders/', headers=headers)).status_code, 403)
+
+    def test_web_pages(self):
+        names = {pk: name for pk, name in Product.objects.values_list('pk', 'name')}
+        for user in (self.owner, self.other, self.reader, self.admin):
+            with self.subTest(user=user.email):
+                self.client.force_login(user)
+                product_ids, order_ids = self.expected(user)
+                response = self.client.get('/products/')
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                for pk, name in names.items():
+                    self.assertEqual(name in content, pk in product_ids, name)
+                response = self.client.get('/orders/')
+                self.assertEqual(response.status_code, 200)
+                content = response.content.decode()
+                for owner_orders in self.orders.values():
+                    for pk in owner_orders:
+                        self.assertEqual(f'Заказ #{pk}<' in content, pk in order_ids, pk)
+
+        self.client.force_login(self.nobody)
+        self.assertRedirects(self.client.get('/products/'), '/profile/', fetch_redirect_response=False)
+        self.assertRedirects(self.client.get('/orders/'), '/profile/', fetch_redirect_response=False)
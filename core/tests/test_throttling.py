@@ -0,0 +1,127 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from core import hashing
+from core.benchmark import url_set
+from core.models import User
+from core.throttling import client_ip, login_throttle
+
+RATES = {
+    'api_login': {'email': '2/min', 'ip': '4/min'},
+    'simple_login': {'email': '2/min', 'ip': '4/min'},
+}
+
+
+@override_settings(
+    LOGIN_THROTTLE_RATES=RATES, LOGIN_THROTTLE_NUM_PROXIES=0,
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class LoginThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Корзины в памяти процесса живут между тестами, каждому - свои
+        patcher = mock.patch.object(login_throttle, '_stores', {})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        User.objects.create_user('user@example.com', 'password')
+
+    def api_login(self, email='user@example.com', ip='10.0.0.1', **headers):
+        return self.client.post('/api/login/', {'email': email, 'password': 'wrong'},
+                                content_type='application/json', REMOTE_ADDR=ip, headers=headers)
+
+    def web_login(self, email='user@example.com', ip='10.0.0.1'):
+        return self.client.post('/login/', {'email': email, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    def assertThrottled(self, response):
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+
+    def test_api_login(self):
+        for _ in range(2):
+            self.assertEqual(self.api_login().status_code, 401)
+        response = self.api_login()
+        self.assertThrottled(response)
+        self.assertIn('error', response.json())
+
+    def test_web_login(self):
+        for _ in range(2):
+            self.assertEqual(self.web_login().status_code, 200)
+        self.assertThrottled(self.web_login())
+
+    async def test_async_api_login(self):
+        with url_set(True):
+            for _ in range(2):
+                response = await self.async_client.post(
+                    '/api/login/', {'email': 'user@example.com', 'password': 'wrong'},
+                    content_type='application/json', REMOTE_ADDR='10.0.0.1',
+                )
+                self.assertEqual(response.status_code, 401)
+            response = await self.async_client.post(
+                '/api/login/', {'email': 'user@example.com', 'password': 'wrong'},
+                content_type='application/json', REMOTE_ADDR='10.0.0.1',
+            )
+        self.assertThrottled(response)
+
+    def test_routes_have_separate_buckets(self):
+        for _ in range(2):
+            self.api_login()
+        self.assertThrottled(self.api_login())
+        self.assertEqual(self.web_login().status_code, 200)
+
+    def test_no_hashing_once_throttled(self):
+        with mock.patch.object(hashing, 'check_password', return_value=False) as check_password:
+            for _ in range(2):
+                self.api_login()
+                self.web_login()
+            self.assertEqual(check_password.call_count, 4)
+            with self.assertNumQueries(0):
+                self.assertThrottled(self.api_login())
+            self.assertThrottled(self.web_login())
+        self.assertEqual(check_password.call_count, 4)
+
+    def test_email_bucket_is_per_email(self):
+        for _ in range(2):
+            self.api_login()
+        self.assertThrottled(self.api_login())
+        # Регистр и пробелы email не дают обойти лимит
+        self.assertThrottled(self.api_login(email=' USER@example.com'))
+        # Тот же email с другого IP тоже упирается в лимит email
+        self.assertThrottled(self.api_login(ip='10.0.0.2'))
+        self.assertEqual(self.api_login(email='other@example.com', ip='10.0.0.3').status_code, 401)
+
+    def test_ip_bucket_covers_all_emails(self):
+        # Перебор email с одного адреса упирается в лимит IP
+        for n in range(4):
+            self.assertEqual(self.api_login(email=f'user{n}@example.com').status_code, 401)
+        self.assertThrottled(self.api_login(email='user9@example.com'))
+        self.assertEqual(self.api_login(email='user9@example.com', ip='10.0.0.2').status_code, 401)
+
+    def test_forwarded_for_ignored_without_proxies(self):
+        # Без прокси X-Forwarded-For подделывает сам клиент
+        for n in range(4):
+            self.api_login(email=f'user{n}@example.com', **{'X-Forwarded-For': f'192.0.2.{n}'})
+        self.assertThrottled(self.api_login(email='user9@example.com', **{'X-Forwarded-For': '192.0.2.9'}))
+
+    @override_settings(LOGIN_THROTTLE_NUM_PROXIES=1)
+    def test_forwarded_for_behind_proxy(self):
+        # Прокси дописывает адрес клиента в конец; подставленное клиентом начало не помогает
+        for n in range(4):
+            self.api_login(email=f'user{n}@example.com', ip='10.0.0.100',
+                           **{'X-Forwarded-For': f'192.0.2.{n}, 203.0.113.5'})
+        self.assertThrottled(self.api_login(email='user9@example.com', ip='10.0.0.100',
+                                            **{'X-Forwarded-For': '192.0.2.9, 203.0.113.5'}))
+        # Другой клиент за тем же прокси
+        self.assertEqual(self.api_login(email='user9@example.com', ip='10.0.0.100',
+                                        **{'X-Forwarded-For': '203.0.113.6'}).status_code, 401)
+
+    def test_client_ip(self):
+        request = RequestFactory().get('/', REMOTE_ADDR='10.0.0.100',
+                                       HTTP_X_FORWARDED_FOR='192.0.2.1, 203.0.113.5, 198.51.100.7')
+        for num_proxies, expected in ((0, '10.0.0.100'), (1, '198.51.100.7'), (2, '203.0.113.5'),
+                                      (3, '192.0.2.1'), (5, '192.0.2.1')):
+            with self.subTest(num_proxies=num_proxies), override_settings(LOGIN_THROTTLE_NUM_PROXIES=num_proxies):
+                self.assertEqual(client_ip(request), expected)
+        with override_settings(LOGIN_THROTTLE_NUM_PROXIES=1):
+            self.assertEqual(client_ip(RequestFactory().get('/', REMOTE_ADDR='10.0.0.100')), '10.0.0.100')
@@ -0,0 +1,105 @@
+import io
+import json
+from unittest import mock
+
+import jwt
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from core import permissions
+from core.api.views.auth_views import create_jwt_token
+from core.models import AccessRule, BusinessElement, Role, User
+from core.token_verifier import (
+    InvalidToken, MissingSnapshot, StaleSnapshot, TokenVerifier, VersionPoller, VersionUnavailable
+)
+
+
+@override_settings(JWT_PERMISSION_CLAIMS=True, PERMISSION_VERSION_TOKEN='feed')
+class TokenVerifierTests(TestCase):
+    def setUp(self):
+        self.user_role = Role.objects.create(name='user')
+        self.other_role = Role.objects.create(name='other')
+        orders = BusinessElement.objects.create(name='orders')
+        AccessRule.objects.create(role=self.user_role, element=orders, read_permission=True, update_permission=True)
+        permissions.bump_version()
+        self.alice = User.objects.create_user('alice@example.com', 'password', role=self.user_role)
+        self.bob = User.objects.create_user('bob@example.com', 'password', role=self.user_role)
+
+    def versions(self):
+        response = self.client.get('/api/permissions/version', HTTP_AUTHORIZATION='Bearer feed')
+        data = response.json()
+        users = {int(user_id): stamp for user_id, stamp in data['users'].items()}
+        return TokenVerifier(
+            settings.JWT_SECRET_KEY,
+            current_version=data['version'],
+            user_version=lambda user_id: users.get(user_id, 0),
+        )
+
+    def test_snapshot_allows_by_masks(self):
+        claims = self.versions().verify(create_jwt_token(self.alice))
+        self.assertEqual(claims.role, 'user')
+        self.assertTrue(claims.allows('orders', 'update'))
+        self.assertFalse(claims.allows('orders', 'delete'))
+        with self.assertRaises(InvalidToken):
+            TokenVerifier('wrong', current_version=0).verify(create_jwt_token(self.alice))
+
+    def test_role_change_expires_only_that_users_tokens(self):
+        alice_token, bob_token = create_jwt_token(self.alice), create_jwt_token(self.bob)
+        version = self.versions().current_version
+        alice = User.objects.get(pk=self.alice.pk)
+        alice.role = self.other_role
+        with self.captureOnCommitCallbacks(execute=True):
+            alice.save(update_fields=['role'])
+
+        verifier = self.versions()
+        self.assertEqual(verifier.current_version, version)
+        with self.assertRaises(StaleSnapshot):
+            verifier.verify(alice_token)
+        verifier.verify(bob_token)
+        claims = verifier.verify(create_jwt_token(User.objects.get(pk=self.alice.pk)))
+        self.assertEqual(claims.role, 'other')
+
+    def test_save_without_role_change_keeps_tokens(self):
+        token = create_jwt_token(self.alice)
+        alice = User.objects.get(pk=self.alice.pk)
+        alice.first_name = 'Alice'
+        alice.save()
+        self.versions().verify(token)
+
+    def test_unknown_version_is_rejected_by_default(self):
+        token = create_jwt_token(self.alice)
+        with self.assertRaises(VersionUnavailable):
+            TokenVerifier(settings.JWT_SECRET_KEY).verify(token)
+        with self.assertRaises(VersionUnavailable):
+            TokenVerifier(settings.JWT_SECRET_KEY, current_version=0, user_version=lambda user_id: None).verify(token)
+        TokenVerifier(settings.JWT_SECRET_KEY, allow_unknown_version=True).verify(token)
+
+    @override_settings(DEBUG=False)
+    def test_user_versions_need_feed_token(self):
+        response = self.client.get('/api/permissions/version')
+        self.assertIn('version', response.json())
+        self.assertNotIn('users', response.json())
+
+    @override_settings(JWT_PERMISSION_CLAIMS=False)
+    def test_token_without_snapshot(self):
+        token = create_jwt_token(self.alice)
+        self.assertNotIn('perm', jwt.decode(token, options={'verify_signature': False}))
+        with self.assertRaises(MissingSnapshot):
+            TokenVerifier(settings.JWT_SECRET_KEY, current_version=0).verify(token)
+
+
+class VersionPollerTests(TestCase):
+    def test_poller_reads_user_versions(self):
+        body = json.dumps({'version': 5, 'users': {'7': 11}}).encode()
+        poller = VersionPoller('http://auth.local/api/permissions/version', token='feed')
+        with mock.patch('core.token_verifier.urlopen', return_value=io.BytesIO(body)) as urlopen:
+            self.assertEqual(poller(), 5)
+        self.assertEqual(urlopen.call_args.args[0].get_header('Authorization'), 'Bearer feed')
+        self.assertEqual(poller.user_version(7), 11)
+        self.assertEqual(poller.user_version(8), 0)
+
+    def test_poller_without_answer_knows_nothing(self):
+        poller = VersionPoller('http://auth.local/api/permissions/version')
+        with mock.patch('core.token_verifier.urlopen', side_effect=OSError):
+            self.assertIsNone(poller())
+            self.assertIsNone(poller.user_version(7))
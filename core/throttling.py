@@ -0,0 +1,140 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+
+BUCKET_CACHE_KEY = 'core:throttle:{}'
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    # '5/min' -> 5 попыток подряд, дальше по одной каждые 60/5 секунд
+    count, period = rate.split('/')
+    return int(count), int(count) / PERIODS[period]
+
+
+def take_token(state, capacity, rate, now):
+    """Шаг token bucket: (новое состояние, сколько ждать до следующего токена или 0)."""
+    tokens, updated = state if state else (capacity, now)
+    tokens = min(capacity, tokens + max(0, now - updated) * rate)
+    if tokens >= 1:
+        return (tokens - 1, now), 0
+    return (tokens, now), (1 - tokens) / rate
+
+
+class LocalBucketStore:
+    """Корзины в памяти процесса, LRU на max_size ключей.
+
+    Вытесняются давно не трогавшиеся ключи, а корзина атакующего IP трогается
+    на каждой попытке, поэтому перебором email ее не вытеснить.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            state, retry_after = take_token(self._buckets.pop(key, None), capacity, rate, now)
+            self._buckets[key] = state
+            while len(self._buckets) > self.max_size:
+                self._buckets.popitem(last=False)
+        return retry_after
+
+    async def atake(self, key, capacity, rate):
+        return self.take(key, capacity, rate)
+
+
+class CacheBucketStore:
+    """Корзины в общем кэше Django (CACHES), одни на все воркеры.
+
+    get + set не атомарны: при одновременных попытках из разных воркеров
+    может пройти лишняя, для защиты CPU этого достаточно.
+    """
+
+    def _timeout(self, capacity, rate):
+        # Полная корзина ничем не отличается от отсутствующей
+        return math.ceil(capacity / rate) + 1
+
+    def take(self, key, capacity, rate):
+        cache_key = BUCKET_CACHE_KEY.format(key)
+        state, retry_after = take_token(cache.get(cache_key), capacity, rate, time.time())
+        cache.set(cache_key, state, timeout=self._timeout(capacity, rate))
+        return retry_after
+
+    async def atake(self, key, capacity, rate):
+        cache_key = BUCKET_CACHE_KEY.format(key)
+        state, retry_after = take_token(await cache.aget(cache_key), capacity, rate, time.time())
+        await cache.aset(cache_key, state, timeout=self._timeout(capacity, rate))
+        return retry_after
+
+
+def client_ip(request):
+    # За балансировщиком адрес клиента - в X-Forwarded-For, LOGIN_THROTTLE_NUM_PROXIES от конца
+    num_proxies = settings.LOGIN_THROTTLE_NUM_PROXIES
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR')
+    if num_proxies and forwarded:
+        addresses = [address.strip() for address in forwarded.split(',')]
+        return addresses[-min(num_proxies, len(addresses))]
+    return request.META.get('REMOTE_ADDR', '')
+
+
+class LoginThrottle:
+    """Token bucket на попытки входа по email и по IP, проверяется до поиска пользователя и хэширования.
+
+    Лимиты - settings.LOGIN_THROTTLE_RATES по имени маршрута:
+        {'api_login': {'email': '5/min', 'ip': '30/min'}}
+    Маршрута нет в настройке - ограничений нет.
+    """
+
+    def __init__(self):
+        self._stores = {}
+        self._lock = threading.Lock()
+
+    def store(self):
+        backend = settings.LOGIN_THROTTLE_BACKEND
+        with self._lock:
+            if backend not in self._stores:
+                if backend == 'cache':
+                    self._stores[backend] = CacheBucketStore()
+                else:
+                    self._stores[backend] = LocalBucketStore(settings.LOGIN_THROTTLE_MAX_KEYS)
+            return self._stores[backend]
+
+    def buckets(self, route, request, email):
+        idents = {
+            'email': (email or '').strip().lower(),
+            'ip': client_ip(request),
+        }
+        for scope, rate in (settings.LOGIN_THROTTLE_RATES.get(route) or {}).items():
+            capacity, refill = parse_rate(rate)
+            # В ключ идет хэш: email может содержать что угодно, а ключи кэша ограничены
+            ident = hashlib.blake2b(idents[scope].encode(), digest_size=16).hexdigest()
+            yield f'{route}:{scope}:{ident}', capacity, refill
+
+    def check(self, route, request, email):
+        """None, если попытка разрешена, иначе сколько секунд ждать (для Retry-After)."""
+        store = self.store()
+        # Токен снимается со всех корзин, даже если первая уже пуста
+        waits = [store.take(key, capacity, refill) for key, capacity, refill in self.buckets(route, request, email)]
+        retry_after = max(waits, default=0)
+        return math.ceil(retry_after) if retry_after else None
+
+    async def acheck(self, route, request, email):
+        store = self.store()
+        waits = [
+            await store.atake(key, capacity, refill)
+            for key, capacity, refill in self.buckets(route, request, email)
+        ]
+        retry_after = max(waits, default=0)
+        return math.ceil(retry_after) if retry_after else None
+
+
+login_throttle = LoginThrottle()
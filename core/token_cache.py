@@ -0,0 +1,73 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import jwt
+from django.conf import settings
+
+
+class VerifiedTokenCache:
+    """LRU уже проверенных JWT: sha256(токен) -> (claims, exp).
+
+    Повторный запрос с тем же токеном не проверяет подпись и не разбирает JSON заново.
+    Запись считается промахом после exp токена. Неверные токены не кэшируются.
+    """
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.decode_count = 0
+        self.decode_seconds = 0.0
+        self.decode_seconds_max = 0.0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, token):
+        key = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                payload, exp = entry
+                if exp > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return dict(payload)
+                del self._entries[key]
+            self.misses += 1
+
+        started = time.perf_counter()
+        try:
+            payload = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.decode_count += 1
+                self.decode_seconds += elapsed
+                self.decode_seconds_max = max(self.decode_seconds_max, elapsed)
+
+        with self._lock:
+            self._entries[key] = (payload, payload.get('exp', math.inf))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dict(payload)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'max_size': self.max_size,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'decode_count': self.decode_count,
+            'decode_avg_ms': self.decode_seconds / self.decode_count * 1000 if self.decode_count else 0.0,
+            'decode_max_ms': self.decode_seconds_max * 1000,
+        }
+
+
+token_cache = VerifiedTokenCache(max_size=settings.JWT_TOKEN_CACHE_SIZE)
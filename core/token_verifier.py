@@ -0,0 +1,169 @@
+"""Проверка JWT со снимком прав (JWT_PERMISSION_CLAIMS) в соседних сервисах.
+
+Модуль не зависит от Django, нужен только PyJWT; его можно скопировать отдельным файлом.
+Подпись, срок действия, версия снимка и права проверяются локально:
+
+    versions = VersionPoller('http://auth.local/api/permissions/version', interval=5,
+                             token=PERMISSION_VERSION_TOKEN)
+    verifier = TokenVerifier(JWT_SECRET_KEY, current_version=versions, user_version=versions.user_version)
+    try:
+        claims = verifier.verify(token)
+    except StaleSnapshot:
+        ...  # 401, клиент получает новый токен через POST /api/token/refresh/
+    except VersionUnavailable:
+        ...  # 503, версия прав еще не получена
+    if not claims.allows('orders', 'update'):
+        ...  # 403
+
+Отзыв токенов (выход, удаление аккаунта) снимок не отражает - токен действует до exp.
+"""
+import json
+import threading
+import time
+from urllib.request import Request, urlopen
+
+import jwt
+
+# Совпадает с core.permissions.PERMISSION_BITS
+PERMISSION_BITS = {
+    'read': 1 << 0,
+    'read_all': 1 << 1,
+    'create': 1 << 2,
+    'update': 1 << 3,
+    'update_all': 1 << 4,
+    'delete': 1 << 5,
+    'delete_all': 1 << 6,
+}
+
+SNAPSHOT_CLAIM = 'perm'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+class MissingSnapshot(InvalidToken):
+    pass
+
+
+class StaleSnapshot(InvalidToken):
+    """Права изменились после выдачи токена, нужен новый токен."""
+
+
+class VersionUnavailable(InvalidToken):
+    """Текущая версия прав неизвестна (поллер еще не получил ответ), проверить снимок нельзя."""
+
+
+class TokenClaims:
+    def __init__(self, payload):
+        snapshot = payload[SNAPSHOT_CLAIM]
+        self.payload = payload
+        self.user_id = payload.get('user_id')
+        self.email = payload.get('email')
+        self.version = snapshot['v']
+        self.user_version = snapshot.get('u', 0)
+        self.role = snapshot.get('role')
+        self.superuser = bool(snapshot.get('su'))
+        self.masks = snapshot.get('m') or {}
+
+    def mask(self, element_name):
+        return self.masks.get(element_name, 0)
+
+    def allows(self, element_name, action):
+        if self.superuser:
+            return True
+        return bool(self.mask(element_name) & PERMISSION_BITS[action])
+
+
+class TokenVerifier:
+    """current_version - число или функция без аргументов, возвращающая текущую версию матрицы прав.
+
+    user_version - функция user_id -> штамп последней смены роли пользователя (0 - не менялась).
+    Токен со снимком старше любой из версий отклоняется (StaleSnapshot). Если версия
+    неизвестна (None), токен отклоняется (VersionUnavailable); allow_unknown_version=True
+    пропускает такие токены без проверки версии.
+    """
+
+    def __init__(self, secret, algorithm='HS256', current_version=None, leeway=0, user_version=None,
+                 allow_unknown_version=False):
+        self.secret = secret
+        self.algorithm = algorithm
+        self.current_version = current_version
+        self.user_version = user_version
+        self.leeway = leeway
+        self.allow_unknown_version = allow_unknown_version
+
+    def verify(self, token):
+        try:
+            payload = jwt.decode(token, self.secret, algorithms=[self.algorithm], leeway=self.leeway)
+        except jwt.InvalidTokenError as exc:
+            raise InvalidToken(str(exc)) from exc
+
+        snapshot = payload.get(SNAPSHOT_CLAIM)
+        if not isinstance(snapshot, dict) or not isinstance(snapshot.get('v'), int):
+            raise MissingSnapshot('В токене нет снимка прав')
+
+        claims = TokenClaims(payload)
+        current = self.current_version() if callable(self.current_version) else self.current_version
+        self.check(claims.version, current)
+        if self.user_version is not None:
+            self.check(claims.user_version, self.user_version(claims.user_id))
+        return claims
+
+    def check(self, version, current):
+        if current is None:
+            if not self.allow_unknown_version:
+                raise VersionUnavailable('Текущая версия прав неизвестна')
+        elif version < current:
+            raise StaleSnapshot('Снимок прав устарел, обновите токен')
+
+    def has_permission(self, token, element_name, action):
+        return self.verify(token).allows(element_name, action)
+
+
+class VersionPoller:
+    """Текущая версия прав с GET /api/permissions/version не чаще раза в interval секунд.
+
+    Запрос делает только первый обратившийся после истечения интервала; при ошибке
+    остаются прежние значения, до первого успешного ответа - None (TokenVerifier
+    отклоняет токены). token - PERMISSION_VERSION_TOKEN сервера: без него сервер
+    не отдает смены ролей пользователей и user_version возвращает None.
+    """
+
+    def __init__(self, url, interval=5, timeout=2, token=None):
+        self.url = url
+        self.interval = interval
+        self.timeout = timeout
+        self.token = token
+        self.version = None
+        self.users = None
+        self._checked_at = float('-inf')
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        with urlopen(Request(self.url, headers=headers), timeout=self.timeout) as response:
+            data = json.load(response)
+        users = data.get('users')
+        return data['version'], None if users is None else {int(user_id): stamp for user_id, stamp in users.items()}
+
+    def poll(self):
+        now = time.monotonic()
+        if now - self._checked_at >= self.interval and self._lock.acquire(blocking=False):
+            try:
+                self._checked_at = now
+                self.version, self.users = self.fetch()
+            except (OSError, ValueError, KeyError, AttributeError):
+                pass
+            finally:
+                self._lock.release()
+
+    def __call__(self):
+        self.poll()
+        return self.version
+
+    def user_version(self, user_id):
+        self.poll()
+        if self.users is None:
+            return None
+        return self.users.get(user_id, 0)
@@ -1,3 +1,4 @@
 from .home_views import SimpleHomeView
 from .auth_views import SimpleLoginView, SimpleRegisterView, SimpleProfileView, SimpleLogoutView
-from .business_views import SimpleProductsView, SimpleOrdersView
\ No newline at end of file
+from .business_views import SimpleProductsView, SimpleOrdersView
+from .metrics_views import MetricsView
\ No newline at end of file
@@ -5,10 +5,18 @@ from django.contrib import messages
 from django.utils.decorators import method_decorator
 from django.views.decorators.csrf import csrf_exempt
 
-from core.models import User, Role
+from core import hashing
+from core.hashing import POOL_SATURATED_ERROR
+from core.models import User
+from core.registration import DUPLICATE_EMAIL_ERROR, DuplicateEmail, email_taken, register_user
+from core.throttling import login_throttle
+from core.query_budget import QueryBudget
+
+THROTTLED_ERROR = 'Слишком много попыток входа, повторите позже'
 
 @method_decorator(csrf_exempt, name='dispatch')
 class SimpleLoginView(TemplateView):
+    query_budget = {'get': QueryBudget(2), 'post': QueryBudget(6)}
     template_name = 'login.html'
     
     def get(self, request, *args, **kwargs):
@@ -20,10 +28,18 @@ class SimpleLoginView(TemplateView):
         email = request.POST.get('email')
         password = request.POST.get('password')
         
+        # До поиска пользователя и PBKDF2
+        retry_after = login_throttle.check(request.resolver_match.url_name, request, email)
+        if retry_after:
+            messages.error(request, THROTTLED_ERROR)
+            response = render(request, self.template_name, status=429)
+            response['Retry-After'] = str(retry_after)
+            return response
+        
         try:
             user = User.objects.get(email=email, is_active=True)
-            if user.check_password(password):
-                user.backend = 'django.contrib.auth.backends.ModelBackend'
+            if hashing.check_password(user, password):
+                user.backend = 'core.backends.RoleModelBackend'
                 login(request, user)
                 messages.success(request, f'Добро пожаловать, {user.first_name}!')
                 return redirect('simple_profile')
@@ -31,10 +47,14 @@ class SimpleLoginView(TemplateView):
                 messages.error(request, 'Неверный пароль')
         except User.DoesNotExist:
             messages.error(request, 'Пользователь с таким email не найден')
+        except hashing.HashingPoolSaturated:
+            messages.error(request, POOL_SATURATED_ERROR)
+            return render(request, self.template_name, status=503)
         
         return render(request, self.template_name)
 
 class SimpleLogoutView(TemplateView):
+    query_budget = {'get': QueryBudget(4)}
     def get(self, request, *args, **kwargs):
         if request.user.is_authenticated:
             logout(request)
@@ -43,6 +63,8 @@ class SimpleLogoutView(TemplateView):
 
 @method_decorator(csrf_exempt, name='dispatch')
 class SimpleRegisterView(TemplateView):
+    # Регистрация из уже открытой сессии: login() перечитывает сессию при смене ключа
+    query_budget = {'get': QueryBudget(2), 'post': QueryBudget(8, max_duplicates=1)}
     template_name = 'register.html'
     
     def get(self, request, *args, **kwargs):
@@ -66,33 +88,39 @@ class SimpleRegisterView(TemplateView):
             messages.error(request, 'Пароли не совпадают')
             return render(request, self.template_name)
         
-        if User.objects.filter(email=email).exists():
-            messages.error(request, 'Пользователь с таким email уже существует')
+        if email_taken(email):
+            messages.error(request, DUPLICATE_EMAIL_ERROR)
             return render(request, self.template_name)
         
         try:
-            user = User.objects.create_user(
+            password_hash = hashing.make_password(password)
+        except hashing.HashingPoolSaturated:
+            messages.error(request, POOL_SATURATED_ERROR)
+            return render(request, self.template_name, status=503)
+        
+        try:
+            user = register_user(
                 email=email,
                 first_name=first_name,
                 last_name=last_name,
                 patronymic=patronymic,
-                password=password
+                password_hash=password_hash
             )
             
-            user_role, _ = Role.objects.get_or_create(name='user')
-            user.role = user_role
-            user.save()
-            
-            user.backend = 'django.contrib.auth.backends.ModelBackend'
+            user.backend = 'core.backends.RoleModelBackend'
             login(request, user)
             messages.success(request, f'Регистрация успешна! Добро пожаловать, {user.first_name}!')
             return redirect('simple_profile')
             
+        except DuplicateEmail:
+            messages.error(request, DUPLICATE_EMAIL_ERROR)
+            return render(request, self.template_name)
         except Exception as e:
             messages.error(request, f'Ошибка при регистрации: {str(e)}')
             return render(request, self.template_name)
 
 class SimpleProfileView(TemplateView):
+    query_budget = {'get': QueryBudget(3)}
     template_name = 'profile.html'
     
     def get(self, request, *args, **kwargs):
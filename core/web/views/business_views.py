@@ -2,7 +2,15 @@ from django.shortcuts import render, redirect
 from django.views.generic import TemplateView
 from django.contrib import messages
 
+from core.api.listing import InvalidListParams, next_url
+from core.api.views.business_views import ORDER_LISTING, PRODUCT_LISTING
+from core.models import Order, Product
+from core.page_cache import USER_HEADER_SLOT, cached_page
+from core.query_budget import QueryBudget
+from core.scoping import get_scope, scope_queryset
+
 class SimpleProductsView(TemplateView):
+    query_budget = {'get': QueryBudget(4)}
     template_name = 'products.html'
     
     def get(self, request, *args, **kwargs):
@@ -10,24 +18,34 @@ class SimpleProductsView(TemplateView):
             messages.warning(request, 'Для просмотра товаров необходимо войти в систему')
             return redirect('simple_login')
         
-        from core.api.views.business_views import HasPermission
-        if not HasPermission('products', 'read').has_permission(request, self):
+        scope = get_scope(request.user, 'products', 'read', request)
+        if scope is None:
             messages.error(request, 'У вас нет прав для просмотра товаров')
             return redirect('simple_profile')
         
-        mock_products = [
-            {'id': 1, 'name': 'Ноутбук игровой', 'price': 85000, 'description': 'Мощный ноутбук для игр и работы', 'category': 'Электроника'},
-            {'id': 2, 'name': 'Смартфон', 'price': 45000, 'description': 'Флагманский смартфон', 'category': 'Электроника'},
-        ]
+        return cached_page(request, 'products', scope, ('products',), lambda: self.render_page(request))
+    
+    def render_page(self, request):
+        from core.api.views.business_views import HasPermission
+        try:
+            products, next_cursor = PRODUCT_LISTING.page(
+                scope_queryset(Product.objects.all(), request.user, 'products', request=request),
+                request.GET
+            )
+        except InvalidListParams as exc:
+            messages.error(request, str(exc))
+            return redirect('simple_products')
         
         context = {
-            'products': mock_products,
-            'user': request.user,
+            'products': products,
+            'next_url': next_url(request, next_cursor),
+            'user_header': USER_HEADER_SLOT,
             'can_edit': HasPermission('products', 'update').has_permission(request, self)
         }
         return render(request, self.template_name, context)
 
 class SimpleOrdersView(TemplateView):
+    query_budget = {'get': QueryBudget(4)}
     template_name = 'orders.html'
     
     def get(self, request, *args, **kwargs):
@@ -35,19 +53,33 @@ class SimpleOrdersView(TemplateView):
             messages.warning(request, 'Для просмотра заказов необходимо войти в систему')
             return redirect('simple_login')
         
-        from core.api.views.business_views import HasPermission
-        if not HasPermission('orders', 'read').has_permission(request, self):
+        scope = get_scope(request.user, 'orders', 'read', request)
+        if scope is None:
             messages.error(request, 'У вас нет прав для просмотра заказов')
             return redirect('simple_profile')
         
-        mock_orders = [
-            {'id': 1, 'product': 'Ноутбук игровой', 'status': 'доставлен', 'date': '2024-01-15', 'amount': 85000},
-            {'id': 2, 'product': 'Смартфон', 'status': 'в обработке', 'date': '2024-01-16', 'amount': 45000},
-        ]
+        # В заказах выводятся названия товаров
+        return cached_page(request, 'orders', scope, ('orders', 'products'), lambda: self.render_page(request))
+    
+    def render_page(self, request):
+        from core.api.views.business_views import HasPermission
+        try:
+            orders, next_cursor = ORDER_LISTING.page(
+                scope_queryset(Order.objects.all(), request.user, 'orders', request=request),
+                request.GET
+            )
+        except InvalidListParams as exc:
+            messages.error(request, str(exc))
+            return redirect('simple_orders')
+        
+        statuses = dict(Order.STATUS_CHOICES)
+        for order in orders:
+            order['status_display'] = statuses.get(order['status'], order['status'])
         
         context = {
-            'orders': mock_orders,
-            'user': request.user,
+            'orders': orders,
+            'next_url': next_url(request, next_cursor),
+            'user_header': USER_HEADER_SLOT,
             'can_manage': HasPermission('orders', 'update').has_permission(request, self)
         }
         return render(request, self.template_name, context)
\ No newline at end of file
@@ -1,7 +1,10 @@
 from django.shortcuts import render
 from django.views.generic import TemplateView
 
+from core.query_budget import QueryBudget
+
 class SimpleHomeView(TemplateView):
+    query_budget = {'get': QueryBudget(2)}
     template_name = 'home.html'
     
     def get(self, request, *args, **kwargs):
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+
+from core.instrumentation import registry
+from core.query_budget import QueryBudget
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class MetricsView(View):
+    query_budget = {'get': QueryBudget(0)}
+    
+    def get(self, request):
+        # Сборщик присылает METRICS_TOKEN в Authorization: Bearer; без токена метрики открыты только в DEBUG
+        token = settings.METRICS_TOKEN
+        if token:
+            allowed = constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+        else:
+            allowed = settings.DEBUG
+        if not allowed:
+            return HttpResponse('Forbidden', status=403, content_type='text/plain')
+        return HttpResponse(registry.render(), content_type=PROMETHEUS_CONTENT_TYPE)